@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import gc
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import logging
+
+from window_backend import SimulatedBackend, SIMULATED_APPS
+from monitor_topology import MonitorTopology
+from rule_engine import RuleEngine
+from layouts import load_layouts
+from config_loader import DEFAULT_CONFIG, compile_config
+
+# Simulated per-call latencies (seconds): a UIA property read is a cross-process
+# COM round trip, a user32 query on a top-level window is an in-process call
+DEFAULT_LATENCY = {
+    'uia_call': 0.0005,
+    'win32_call': 0.00001,
+}
+
+
+def timed(func, repeat=3):
+    """Run func repeat times and return (best wall time, last result)
+
+    The garbage collector is paused while timing, as timeit does, so a
+    collection triggered by earlier allocations does not land in one run.
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+# Enumeration paths compared by bench_enumeration: name -> SimulatedBackend options
+ENUMERATION_PATHS = {
+    'uia': {'enumeration': 'uia'},
+    'uia_parallel': {'enumeration': 'uia', 'fetch_workers': 8},
+    'win32': {'enumeration': 'win32'},
+}
+
+
+def bench_enumeration(window_count=150, monitor_count=2, latency=None, repeat=3, seed=0, workers=8):
+    """Compare the EnumWindows, serial UIA and parallel UIA enumeration paths on the simulated backend"""
+    results = {}
+    reference = None
+    for name, options in ENUMERATION_PATHS.items():
+        options = dict(options)
+        if 'fetch_workers' in options:
+            options['fetch_workers'] = workers
+        backend = SimulatedBackend.generate(window_count, monitor_count, seed=seed,
+                                            latency=latency or DEFAULT_LATENCY, **options)
+        elapsed, windows = timed(backend.list_windows, repeat)
+        # All paths must produce the same window records in the same order
+        records = [(w.hwnd, w.title, w.class_name, w.rect) for w in windows]
+        if reference is None:
+            reference = records
+        elif records != reference:
+            raise AssertionError(f"Enumeration path '{name}' returned different windows")
+        results[name] = {
+            'seconds': elapsed,
+            'windows': len(windows),
+            'calls_per_run': sum(backend.call_counts.values()) // repeat
+        }
+    results['speedup'] = results['uia']['seconds'] / results['win32']['seconds']
+    results['parallel_speedup'] = results['uia']['seconds'] / results['uia_parallel']['seconds']
+    return results
+
+
+# Layout profiles used by bench_layouts: fixed grids with slot rules, and tiles for everything
+BENCH_LAYOUTS = {
+    "work": {
+        "monitors": {"1": {"type": "columns", "weights": [2, 1]},
+                     "2": {"type": "grid", "rows": 2, "columns": 3, "gap": 8},
+                     "3": {"type": "rows", "count": 3}},
+        "slots": [{"pattern": "opera", "monitor": 1, "slot": 1},
+                  {"pattern": "process:Code.exe", "monitor": 2, "slot": 1},
+                  {"pattern": "class:XLMAIN", "monitor": 3},
+                  {"pattern": "glob:*Outlook*", "monitor": 2, "slot": 6}],
+        "unmatched": "fill"
+    },
+    "tiles": {
+        "monitors": {str(n): {"type": "tiles", "margin": 4} for n in range(1, 7)},
+        "unmatched": "fill"
+    }
+}
+
+
+def bench_layouts(window_count=500, monitor_count=3, repeat=3, seed=0):
+    """Time layout planning with and without the per-topology geometry cache"""
+    backend = SimulatedBackend.generate(window_count, monitor_count, seed=seed)
+    windows = backend.list_windows()
+    topology = MonitorTopology.from_backend(backend)
+    layouts = load_layouts({"layouts": BENCH_LAYOUTS, "classification_cache_size": 4096})
+    default_target = lambda window: 2
+    process_name = lambda window: backend.get_process_name(window.hwnd)
+
+    results = {}
+    for name, layout in layouts.items():
+        def cold():
+            layout._cells.clear()
+            layout.rule_engine._cache.clear()
+            return layout.plan(windows, topology, default_target, process_name)
+
+        def warm():
+            return layout.plan(windows, topology, default_target, process_name)
+
+        cold_seconds, cold_plan = timed(cold, repeat)
+        warm()  # Fill the caches
+        warm_seconds, warm_plan = timed(warm, repeat)
+        if [(w.hwnd, m, r) for w, m, r in cold_plan] != [(w.hwnd, m, r) for w, m, r in warm_plan]:
+            raise AssertionError(f"Cached plan for layout '{name}' differs from a fresh plan")
+        results[name] = {
+            'cold_seconds': cold_seconds,
+            'warm_seconds': warm_seconds,
+            'placements': len(warm_plan),
+            'speedup': cold_seconds / warm_seconds
+        }
+    results['windows'] = len(windows)
+    return results
+
+
+# Suite scenarios: (windows, monitors, rules)
+SUITE_SCENARIOS = [(windows, monitors, rules)
+                   for windows in (10, 100, 1000, 5000)
+                   for monitors, rules in ((1, 10), (2, 100), (6, 500))]
+
+# Stages timed by bench_suite, in report order
+SUITE_STAGES = ('enumeration', 'classification', 'monitor_lookup', 'move_planning', 'arrange', 'arrange_repeat')
+
+# Default regression threshold (fractional slowdown) and noise floor (seconds) for compare_results
+REGRESSION_THRESHOLD = 0.25
+NOISE_FLOOR = 0.0005
+
+
+def generate_rules(rule_count, monitor_count, seed=0):
+    """Build a config "rules" list: one matching rule per simulated app, the rest never match
+
+    The non-matching rules cycle through every rule type so each one
+    exercises its own part of the rule engine.
+    """
+    rng = random.Random(seed)
+    rules = []
+    for i in range(rule_count):
+        monitor = rng.randint(1, monitor_count)
+        if i < len(SIMULATED_APPS):
+            title, class_name, process_name = SIMULATED_APPS[i]
+            rule_type, pattern = [('substring', title.split()[0]), ('class', class_name),
+                                  ('process', process_name)][i % 3]
+        else:
+            rule_type, pattern = [('substring', f"tool{i}"), ('glob', f"*Report {i} -*"),
+                                  ('regex', rf"^Build \d+ of project{i}$"), ('class', f"Class{i}"),
+                                  ('process', f"tool{i}.exe"), ('title', f"Dashboard {i}")][i % 6]
+        rules.append({'type': rule_type, 'pattern': pattern, 'monitor': monitor, 'priority': rng.randint(0, 3)})
+    return rules
+
+
+def make_arranger(backend, rules):
+    """WindowArranger on a simulated backend with the given rules and quiet logging"""
+    from window_arranger import WindowArranger
+    arranger = WindowArranger(backend=backend)
+    arranger.apply_config(compile_config({**DEFAULT_CONFIG, 'rules': rules}))
+    return arranger
+
+
+def timed_with_setup(setup, func, repeat=3):
+    """Like timed(), but call setup() untimed before each run and pass its result to func"""
+    best = None
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func(state)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_scenario(window_count, monitor_count, rule_count, repeat=3, seed=0):
+    """Time each pipeline stage alone, then a full arrangement, on one simulated desktop"""
+    rules = generate_rules(rule_count, monitor_count, seed)
+    config = {**DEFAULT_CONFIG, 'rules': rules}
+    generate = lambda: SimulatedBackend.generate(window_count, monitor_count, seed=seed)
+
+    backend = generate()
+    windows = backend.list_windows()
+    topology = MonitorTopology.from_backend(backend)
+    identities = [(w.title, w.class_name, backend.get_process_name(w.hwnd)) for w in windows]
+    results = {}
+
+    results['enumeration'], _ = timed(backend.list_windows, repeat)
+
+    def classify(engine):
+        return [engine.classify(*identity)[0] for identity in identities]
+    results['classification'] = timed_with_setup(lambda: RuleEngine.from_config(config), classify, repeat)
+
+    results['monitor_lookup'], _ = timed(lambda: [topology.monitor_for_rect(w.rect) for w in windows], repeat)
+
+    arranger = make_arranger(backend, rules)
+    targets = classify(RuleEngine.from_config(config))
+    assignments = [(w, topology.resolve(target).number) for w, target in zip(windows, targets)
+                   if topology.monitor_for_rect(w.rect).number != topology.resolve(target).number]
+    results['move_planning'], plan = timed(lambda: arranger.plan_moves(assignments), repeat)
+
+    # End to end: a fresh desktop each time, then a second press with nothing changed
+    results['arrange'] = timed_with_setup(lambda: make_arranger(generate(), rules),
+                                          lambda a: a.arrange_windows(), repeat)
+    arranger = make_arranger(generate(), rules)
+    arranger.arrange_windows()
+    results['arrange_repeat'], _ = timed(arranger.arrange_windows, repeat)
+
+    results['windows'] = len(windows)
+    results['moves'] = len(plan)
+    return results
+
+
+def scenario_key(window_count, monitor_count, rule_count):
+    return f"w{window_count}-m{monitor_count}-r{rule_count}"
+
+
+def bench_suite(scenarios=None, repeat=3, seed=0, progress=None):
+    """Run every scenario, return a machine-readable result document"""
+    logging.disable(logging.INFO)  # Per-window log lines would dominate the timings
+    try:
+        results = {}
+        for window_count, monitor_count, rule_count in scenarios or SUITE_SCENARIOS:
+            key = scenario_key(window_count, monitor_count, rule_count)
+            results[key] = bench_scenario(window_count, monitor_count, rule_count, repeat, seed)
+            if progress is not None:
+                progress(key, results[key])
+    finally:
+        logging.disable(logging.NOTSET)
+    return {
+        'meta': {'time': time.time(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'repeat': repeat, 'seed': seed},
+        'results': results
+    }
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD, noise_floor=NOISE_FLOOR):
+    """Compare two bench_suite documents, return a list of (scenario, stage, old, new, ratio) regressions
+
+    A stage regresses when it is more than `threshold` slower than the
+    baseline and the difference is above `noise_floor` seconds.
+    """
+    regressions = []
+    for key, stages in current['results'].items():
+        old_stages = baseline['results'].get(key)
+        if old_stages is None:
+            continue
+        for stage in SUITE_STAGES:
+            old, new = old_stages.get(stage), stages.get(stage)
+            if old is None or new is None or old <= 0:
+                continue
+            if new > old * (1 + threshold) and new - old > noise_floor:
+                regressions.append((key, stage, old, new, new / old))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Window Arranger benchmarks (simulated desktop)")
+    parser.add_argument('benchmark', choices=['enumeration', 'layouts', 'suite'], help="benchmark to run")
+    parser.add_argument('--windows', type=int, default=150, help="number of simulated windows")
+    parser.add_argument('--monitors', type=int, default=2, help="number of simulated monitors")
+    parser.add_argument('--repeat', type=int, default=3, help="repetitions (best time is reported)")
+    parser.add_argument('--workers', type=int, default=8, help="worker threads for parallel UIA fetch")
+    parser.add_argument('--output', help="suite: write results as JSON to this file")
+    parser.add_argument('--baseline', help="suite: compare against a previous --output file")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="suite: fractional slowdown counted as a regression (default 0.25)")
+    parser.add_argument('--max-windows', type=int, default=None, help="suite: skip larger scenarios")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.benchmark == 'enumeration':
+        results = bench_enumeration(args.windows, args.monitors, repeat=args.repeat, workers=args.workers)
+        for name in ENUMERATION_PATHS:
+            r = results[name]
+            print(f"{name:>12}: {r['seconds'] * 1000:9.2f} ms  "
+                  f"({r['windows']} windows, {r['calls_per_run']} backend calls)")
+        print(f"EnumWindows speedup: {results['speedup']:.1f}x")
+        print(f"Parallel UIA speedup: {results['parallel_speedup']:.1f}x")
+    elif args.benchmark == 'layouts':
+        results = bench_layouts(args.windows, args.monitors, repeat=args.repeat)
+        for name in BENCH_LAYOUTS:
+            r = results[name]
+            print(f"{name:>12}: first plan {r['cold_seconds'] * 1000:8.2f} ms, cached {r['warm_seconds'] * 1000:8.2f} ms "
+                  f"({r['placements']} of {results['windows']} windows placed, {r['speedup']:.1f}x)")
+    elif args.benchmark == 'suite':
+        scenarios = [s for s in SUITE_SCENARIOS if args.max_windows is None or s[0] <= args.max_windows]
+        print(f"{'scenario':>16} " + ' '.join(f"{stage:>15}" for stage in SUITE_STAGES) + "  (ms)")
+
+        def progress(key, r):
+            print(f"{key:>16} " + ' '.join(f"{r[stage] * 1000:15.2f}" for stage in SUITE_STAGES))
+
+        document = bench_suite(scenarios, repeat=args.repeat, progress=progress)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=1)
+            print(f"Results written to {args.output}")
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare_results(baseline, document, args.threshold)
+            for key, stage, old, new, ratio in regressions:
+                print(f"REGRESSION {key} {stage}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms ({ratio:.2f}x)")
+            if regressions:
+                return 1
+            print(f"No regressions above {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
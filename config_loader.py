@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import time
+import threading
+import logging
+
+from rule_engine import RuleEngine
+from layouts import load_layouts
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = "config.json"
+
+DEFAULT_CONFIG = {
+    "hotkey": "ctrl+alt+i",
+    "exit_hotkey": "ctrl+alt+q",
+    "monitor_1_apps": ["opera", "RD Tabs"],
+    "monitor_2_apps": ["*"],
+    "hotkey_test_interval": 1800,
+    "log_level": "INFO",
+    "window_enumeration": "win32",
+    "batch_moves": True,
+    "move_settle_timeout": 0.5,
+    "incremental": True,
+    "daemon_mode": False,
+    "auto_arrange": False
+}
+
+NUMBER = (int, float)
+OPTIONAL_STRING = (str, type(None))
+
+# Expected type of each known config key; unknown keys are allowed (and logged)
+CONFIG_SCHEMA = {
+    "hotkey": str,
+    "exit_hotkey": str,
+    "reload_hotkey": str,
+    "snapshot_hotkey": OPTIONAL_STRING,
+    "restore_hotkey": OPTIONAL_STRING,
+    "hotkey_test_interval": NUMBER,
+    "enable_auto_restart": bool,
+    "max_restart_attempts": int,
+    "log_level": str,
+    "log_file": OPTIONAL_STRING,
+    "log_file_max_bytes": int,
+    "log_file_backups": int,
+    "log_rate_limit": NUMBER,
+    "window_enumeration": str,
+    "fetch_workers": int,
+    "window_fetch_timeout": NUMBER,
+    "batch_moves": bool,
+    "move_settle_timeout": NUMBER,
+    "incremental": bool,
+    "classification_cache_size": int,
+    "process_cache_size": int,
+    "rules": list,
+    "layouts": dict,
+    "daemon_mode": bool,
+    "auto_arrange": bool,
+    "event_debounce": NUMBER,
+    "event_max_delay": NUMBER,
+    "enable_auto_recovery": bool,
+    "auto_recovery_timeout": NUMBER,
+    "auto_recovery_backoff": NUMBER,
+    "auto_recovery_max_backoff": NUMBER,
+    "session_settle_delay": NUMBER,
+    "snapshot_file": str,
+    "config_watch": bool,
+    "config_reload_debounce": NUMBER,
+    "metrics_file": OPTIONAL_STRING,
+    "metrics_port": (int, type(None)),
+    "control_port": (int, type(None)),
+    "control_token": OPTIONAL_STRING,
+}
+
+# Allowed values of string keys
+CONFIG_CHOICES = {
+    "log_level": ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"),
+    "window_enumeration": ("win32", "uia"),
+}
+
+# Keys that only take effect on restart
+RESTART_KEYS = ("window_enumeration", "fetch_workers", "window_fetch_timeout", "daemon_mode", "config_watch",
+                "metrics_port", "control_port", "control_token")
+
+APPS_KEY = re.compile(r"monitor_\d+_apps")
+
+HOTKEY_KEYS = ("hotkey", "exit_hotkey", "reload_hotkey", "snapshot_hotkey", "restore_hotkey")
+
+
+class ConfigError(ValueError):
+    """Config file that cannot be used; errors lists every problem found"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def read_config(path=CONFIG_FILE):
+    """Read the config file merged over the defaults (raises if it cannot be read or parsed)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ConfigError(["top level must be an object"])
+    return {**DEFAULT_CONFIG, **config}  # Merge default config and user config
+
+
+def validate_config(config):
+    """Check config against CONFIG_SCHEMA, return a list of error messages"""
+    errors = []
+    for key, value in config.items():
+        if APPS_KEY.fullmatch(key):
+            if not isinstance(value, list) or not all(isinstance(app, str) for app in value):
+                errors.append(f"'{key}' must be a list of strings")
+            continue
+        expected = CONFIG_SCHEMA.get(key)
+        if expected is None:
+            logger.debug(f"Unknown config key '{key}' ignored")
+            continue
+        # bool is an int subclass, so only accept it where a bool is expected
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            errors.append(f"'{key}' has invalid value {value!r}")
+        elif key in CONFIG_CHOICES and value.upper() not in CONFIG_CHOICES[key] \
+                and value.lower() not in CONFIG_CHOICES[key]:
+            errors.append(f"'{key}' must be one of {', '.join(CONFIG_CHOICES[key])}")
+    return errors
+
+
+class CompiledConfig:
+    """Validated config together with the structures compiled from it"""
+    __slots__ = ('config', 'rule_engine', 'layouts')
+
+    def __init__(self, config, rule_engine, layouts):
+        self.config = config
+        self.rule_engine = rule_engine
+        self.layouts = layouts
+
+
+def validate_hotkeys(config, layouts):
+    """Check that every configured hotkey parses, return a list of error messages
+
+    Without the keyboard module nothing can be registered, so nothing is checked.
+    """
+    try:
+        import keyboard
+    except ImportError:
+        return []
+    hotkeys = [(key, config.get(key)) for key in HOTKEY_KEYS]
+    hotkeys += [(f"layout '{name}' hotkey", layout.hotkey) for name, layout in layouts.items()]
+    errors = []
+    for where, hotkey in hotkeys:
+        if hotkey is None:
+            continue
+        if not isinstance(hotkey, str) or not hotkey.strip():
+            errors.append(f"{where}: expected a hotkey string, got {hotkey!r}")
+            continue
+        try:
+            keyboard.parse_hotkey(hotkey)
+        except ValueError as e:
+            errors.append(f"{where}: invalid hotkey {hotkey!r}: {e}")
+    return errors
+
+
+def compile_config(config):
+    """Validate config and compile its rules and layouts, raise ConfigError if anything is invalid"""
+    errors = validate_config(config)
+    if errors:
+        raise ConfigError(errors)
+
+    rule_engine = RuleEngine.from_config(config)
+    # Invalid rules are logged and dropped by the compiler; count them to reject the config
+    expected = len(config.get("rules", [])) + sum(
+        sum(1 for app in value if app != "*") for key, value in config.items() if APPS_KEY.fullmatch(key))
+    if len(rule_engine.rules) != expected:
+        errors.append(f"{expected - len(rule_engine.rules)} invalid rules")
+
+    layouts = load_layouts(config)
+    if len(layouts) != len(config.get("layouts") or {}):
+        errors.append(f"{len(config.get('layouts') or {}) - len(layouts)} invalid layouts")
+    # A layout is kept when only some of its monitors or slots are invalid; the reload must not be
+    for name, layout in layouts.items():
+        if layout.dropped:
+            errors.append(f"layout '{name}': {layout.dropped} invalid monitors, slots or settings")
+    errors += validate_hotkeys(config, layouts)
+    if errors:
+        raise ConfigError(errors)
+    return CompiledConfig(config, rule_engine, layouts)
+
+
+class ConfigWatcher:
+    """Call on_change() once the config file has been modified and stayed unchanged for `debounce` seconds
+
+    On Windows the containing directory is watched with a change
+    notification handle, waited on together with a stop event, so edits
+    are seen at once and the thread never wakes up otherwise; elsewhere
+    (or if that fails) the file is polled every `poll_interval` seconds
+    with os.stat().
+    """
+
+    def __init__(self, path, on_change, debounce=0.3, poll_interval=1.0):
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.running = False
+        self.changes = 0
+        self._stop = threading.Event()
+        self._stop_handle = None  # Win32 event that wakes the change notification wait
+        self._thread = None
+
+    def file_signature(self):
+        """(modification time, size) of the file, or None if it does not exist"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self):
+        """Start watching on a background thread"""
+        self.running = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ConfigWatcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching config file {self.path} for changes")
+
+    def stop(self):
+        """Stop watching"""
+        self.running = False
+        self._stop.set()
+        stop_handle = self._stop_handle
+        if stop_handle is not None:
+            import win32event
+            win32event.SetEvent(stop_handle)
+
+    def _run(self):
+        waiter = self._notification_waiter()
+        if waiter is None:
+            self._watch(lambda: self._stop.wait(self.poll_interval))
+            return
+        wait, close = waiter
+        try:
+            self._watch(wait)
+        finally:
+            close()
+
+    def _watch(self, wait):
+        signature = self.file_signature()
+        while self.running:
+            wait()
+            if not self.running:
+                return
+            current = self.file_signature()
+            if current == signature:
+                continue
+            # Editors often write a file in several steps: wait until it stops changing
+            while self.running:
+                self._stop.wait(self.debounce)
+                settled = self.file_signature()
+                if settled == current:
+                    break
+                current = settled
+            signature = current
+            if current is None or not self.running:
+                continue
+            self.changes += 1
+            try:
+                self.on_change()
+            except Exception as e:
+                logger.error(f"Config change handler failed: {e}")
+
+    def _notification_waiter(self):
+        """Return (wait, close) functions for the config directory change notification, or None if unsupported
+
+        wait() blocks until the directory changes or stop() is called.
+        """
+        try:
+            import win32file
+            import win32event
+            import win32con
+        except ImportError:
+            return None
+        try:
+            handle = win32file.FindFirstChangeNotification(
+                os.path.dirname(self.path), False,
+                win32con.FILE_NOTIFY_CHANGE_LAST_WRITE | win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
+                win32con.FILE_NOTIFY_CHANGE_SIZE)
+        except Exception as e:
+            logger.warning(f"Config change notifications unavailable, polling instead: {e}")
+            return None
+        stop_handle = win32event.CreateEvent(None, True, False, None)  # Manual reset, set by stop()
+        self._stop_handle = stop_handle
+        if not self.running:
+            win32event.SetEvent(stop_handle)
+
+        def wait():
+            if win32event.WaitForMultipleObjects([handle, stop_handle], False,
+                                                 win32event.INFINITE) == win32event.WAIT_OBJECT_0:
+                win32file.FindNextChangeNotification(handle)
+
+        def close():
+            # The stop event is closed when the last reference (possibly held by stop()) goes away
+            self._stop_handle = None
+            win32file.FindCloseChangeNotification(handle)
+        return wait, close
+
+
+def load_config_file(path=CONFIG_FILE):
+    """Read and validate the config file at startup, falling back to the defaults if it is unusable"""
+    start = time.perf_counter()
+    if not os.path.exists(path):
+        logger.info(f"Config file {path} not found, using default config")
+        return dict(DEFAULT_CONFIG)
+    try:
+        config = read_config(path)
+        errors = validate_config(config)
+        if errors:
+            raise ConfigError(errors)
+    except Exception as e:
+        logger.error(f"Failed to load config file: {e}, using default config")
+        return dict(DEFAULT_CONFIG)
+    logger.info(f"Successfully loaded config file: {path} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return config
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import socket
+import secrets
+import argparse
+import tempfile
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+
+def send_commands(requests, port=DEFAULT_PORT, host='127.0.0.1', timeout=60.0):
+    """Send request dicts over one connection and return their responses, in order"""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(b''.join(json.dumps(request).encode('utf-8') + b'\n' for request in requests))
+        responses = []
+        with sock.makefile('rb') as f:
+            for _ in requests:
+                line = f.readline()
+                if not line:
+                    raise ConnectionError("control API closed the connection")
+                responses.append(json.loads(line))
+        return responses
+
+
+def send(command, token, port=DEFAULT_PORT, host='127.0.0.1', **args):
+    """Send one command and return its response"""
+    return send_commands([{'id': 1, 'command': command, 'token': token, **args}], port, host)[0]
+
+
+def parse_value(text):
+    """Command line argument value: JSON if it parses (numbers, true, null), else the plain string"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def describe(response):
+    timing = response.get('timing', {})
+    outcome = 'ok' if response.get('ok') else f"error: {response.get('error')}"
+    return (f"#{response.get('id')} {outcome} - queued {timing.get('queue_ms', 0):.1f} ms, "
+            f"ran {timing.get('run_ms', 0):.1f} ms, total {timing.get('total_ms', 0):.1f} ms"
+            f"{' (coalesced)' if response.get('coalesced') else ''}")
+
+
+def simulate(window_count=150, monitor_count=2, clients=8, seed=0):
+    """Exercise the control API against an arranger on the simulated desktop"""
+    from window_backend import SimulatedBackend
+    from window_arranger import WindowArranger
+    from control_server import ControlServer
+
+    # A few milliseconds per move batch keeps runs long enough for requests to pile up behind them
+    backend = SimulatedBackend.generate(window_count, monitor_count, seed=seed,
+                                        latency={'move_windows': 0.005, 'get_window_rect': 0.0001})
+    arranger = WindowArranger(backend=backend)
+    snapshot_dir = tempfile.mkdtemp(prefix='control_client_')
+    arranger.snapshot_file = os.path.join(snapshot_dir, 'window_snapshot.jsonl')
+    snapshot_file = os.path.join(snapshot_dir, 'snapshot.jsonl')
+    token = secrets.token_hex(16)
+    server = ControlServer(arranger, 0, token)
+    server.start()
+    port = server.address[1]
+    try:
+        print(f"Simulated desktop: {window_count} windows on {monitor_count} monitors, control API on port {port}")
+        print(send('ping', token, port)['result'])
+
+        # Concurrent identical requests while the first runs: the waiting ones merge into one follow-up run
+        responses = [None] * clients
+
+        def client(i):
+            responses[i] = send('arrange', token, port, id=i)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"{clients} concurrent arrange requests:")
+        for response in responses:
+            print(f"  {describe(response)}")
+
+        # A scripted batch on one connection: answered in order, each with its own timing
+        batch = [
+            {'id': 'rule', 'command': 'arrange-by-rule', 'type': 'substring', 'pattern': 'Chrome', 'monitor': 1},
+            {'id': 'snapshot', 'command': 'snapshot', 'path': os.path.basename(snapshot_file)},
+            {'id': 'restore', 'command': 'restore', 'path': os.path.basename(snapshot_file)},
+            {'id': 'arrange', 'command': 'arrange'},
+            {'id': 'bad', 'command': 'arrange-by-rule', 'pattern': 'x', 'monitor': 'left'},
+            {'id': 'outside', 'command': 'snapshot', 'path': os.path.join('..', 'snapshot.jsonl')},
+            {'id': 'stats', 'command': 'stats'},
+        ]
+        print("Batch on one connection:")
+        for response in send_commands([dict(request, token=token) for request in batch], port):
+            print(f"  {describe(response)}")
+            if response['id'] == 'stats':
+                control = response['result']['control']
+                print(f"  control: {control['requests']} requests, {control['runs']} runs, "
+                      f"{control['coalesced']} coalesced, {control['errors']} errors")
+    finally:
+        server.stop()
+        for name in os.listdir(snapshot_dir):
+            os.remove(os.path.join(snapshot_dir, name))
+        os.rmdir(snapshot_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send commands to the Window Arranger control API",
+                                     epilog="example: control_client.py arrange-by-rule pattern=Chrome monitor=1")
+    parser.add_argument('command', nargs='?', help="arrange, arrange-by-rule, apply-layout, snapshot, restore, "
+                                                   "reload-config, stats or ping")
+    parser.add_argument('args', nargs='*', metavar='KEY=VALUE', help="command arguments")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="control_port of the arranger")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--token', default=os.environ.get('WINDOW_ARRANGER_TOKEN'),
+                        help="control_token of the arranger (default: $WINDOW_ARRANGER_TOKEN)")
+    parser.add_argument('--simulate', action='store_true',
+                        help="start an arranger on a simulated desktop and exercise the API against it")
+    parser.add_argument('--windows', type=int, default=150, help="--simulate: number of simulated windows")
+    parser.add_argument('--clients', type=int, default=8, help="--simulate: concurrent arrange requests")
+    args = parser.parse_args(argv)
+
+    if args.simulate:
+        logging.basicConfig(level=logging.WARNING)
+        simulate(args.windows, clients=args.clients)
+        return 0
+    if not args.command:
+        parser.error("a command is required unless --simulate is given")
+    if not args.token:
+        parser.error("--token (or WINDOW_ARRANGER_TOKEN) is required")
+
+    request = {'id': 1, 'command': args.command}
+    for item in args.args:
+        key, separator, value = item.partition('=')
+        if not separator:
+            parser.error(f"expected KEY=VALUE, got {item!r}")
+        request[key] = parse_value(value)
+    request['token'] = args.token
+    try:
+        response = send_commands([request], args.port, args.host)[0]
+    except OSError as e:
+        print(f"Cannot reach the control API on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(response, indent=1))
+    return 0 if response.get('ok') else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
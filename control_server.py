@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import hmac
+import json
+import time
+import threading
+import logging
+from work_queue import CommandQueue
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUEST_BYTES = 64 * 1024
+RELOAD_TIMEOUT = 30.0  # Max wait for the main loop to run a reload-config command
+
+# Commands that place windows or change state run one at a time on the command queue;
+# identical commands waiting there are merged. stats and ping are answered immediately.
+#   arrange         - arrange all windows by the configured rules
+#   arrange-by-rule - move windows matching {"type", "pattern"} to {"monitor"}
+#   apply-layout    - apply the layout {"name"}
+#   snapshot        - save a window snapshot (optional {"path"}, inside the snapshot_file directory)
+#   restore         - restore a window snapshot (optional {"path"}, inside the snapshot_file directory)
+#   reload-config   - reload the config file (on the main loop, like the config watcher)
+#   stats           - run metrics, queue and cache counters, per-rule hits, session state
+#   ping            - liveness check
+QUEUED_COMMANDS = ('arrange', 'arrange-by-rule', 'apply-layout', 'snapshot', 'restore', 'reload-config')
+COMMANDS = QUEUED_COMMANDS + ('stats', 'ping')
+
+
+class ControlServer:
+    """Line-delimited JSON command API on a localhost TCP port
+
+    Each request line is an object {"id", "command", ...arguments}; each
+    response line carries the same id, "ok", "result" or "error", and
+    "timing" (queue, run and total milliseconds). Requests on one connection
+    are answered in order; open several connections to pipeline commands.
+    Every request must carry the token as "token": any local user can
+    connect to a localhost port, and on a shared (RDP) host that includes
+    other people.
+    """
+
+    def __init__(self, arranger, port, token, host='127.0.0.1'):
+        if not token:
+            raise ValueError("the control API needs a control_token")
+        # socketserver is only needed when the API is enabled
+        import socketserver
+        self.arranger = arranger
+        self.token = token
+        self.queue = CommandQueue(name="ControlCommands")
+        self.requests = 0
+        self.errors = 0
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    line = self.rfile.readline(MAX_REQUEST_BYTES)
+                    if not line:
+                        return
+                    if not line.strip():
+                        continue
+                    response = server.handle_line(line)
+                    try:
+                        self.wfile.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b'\n')
+                    except OSError:
+                        return
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="ControlServer", daemon=True)
+        self._thread.start()
+        host, port = self.address
+        logger.info(f"Control API listening on {host}:{port}")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.queue.stop()
+
+    def handle_line(self, line):
+        """Parse, run and answer one request line"""
+        received = time.perf_counter()
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            self.errors += 1
+            return {'id': None, 'ok': False, 'error': f"invalid request: {e}"}
+        response = self.handle(request, received)
+        if not response['ok']:
+            self.errors += 1
+        logger.debug(f"Control command {request.get('command')!r}: {response.get('error') or 'ok'} "
+                     f"in {response['timing']['total_ms']:.1f} ms")
+        return response
+
+    def handle(self, request, received=None):
+        """Run one request dict and return its response dict"""
+        received = received if received is not None else time.perf_counter()
+        response = {'id': request.get('id'), 'ok': False}
+        command = request.get('command')
+        token = request.get('token')
+        if not isinstance(token, str) or not hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8')):
+            response['error'] = "invalid token"
+        elif command not in COMMANDS:
+            response['error'] = f"unknown command {command!r}, expected one of {', '.join(COMMANDS)}"
+        elif command == 'ping':
+            response.update(ok=True, result='pong')
+        elif command == 'stats':
+            response.update(ok=True, result=self.stats())
+        else:
+            try:
+                function, args = self.resolve(command, request)
+            except (KeyError, TypeError, ValueError) as e:
+                response['error'] = f"invalid arguments for {command}: {e}"
+            else:
+                key = json.dumps([command, args])
+                pending = self.queue.submit(key, self.run_command, command, function, args)
+                if not request.get('wait', True):
+                    response.update(ok=True, result='queued')
+                    response['timing'] = {'queue_ms': 0.0, 'run_ms': 0.0,
+                                          'total_ms': (time.perf_counter() - received) * 1000}
+                    return response
+                pending.done.wait()
+                if pending.error is not None:
+                    response['error'] = pending.error
+                else:
+                    ok, result = pending.result
+                    response['ok'] = ok
+                    response['result' if ok else 'error'] = result
+                response['coalesced'] = pending.requests > 1
+                # A request merged into a waiting job waited from its own arrival, not the job's
+                started = pending.started_at if pending.started_at is not None else time.perf_counter()
+                finished = pending.finished_at if pending.finished_at is not None else started
+                response['timing'] = {'queue_ms': max(started - received, 0.0) * 1000,
+                                      'run_ms': (finished - started) * 1000,
+                                      'total_ms': (time.perf_counter() - received) * 1000}
+                return response
+        response['timing'] = {'queue_ms': 0.0, 'run_ms': 0.0,
+                              'total_ms': (time.perf_counter() - received) * 1000}
+        return response
+
+    def resolve(self, command, request):
+        """Map a queued command to (arranger method, argument list), raising on bad arguments"""
+        arranger = self.arranger
+        if command == 'arrange':
+            return arranger.arrange_windows, []
+        if command == 'arrange-by-rule':
+            monitor = request['monitor']
+            if not isinstance(monitor, int) or isinstance(monitor, bool):
+                raise ValueError(f"monitor must be an integer, not {monitor!r}")
+            return arranger.arrange_by_rule, [request.get('type', 'substring'), str(request['pattern']), monitor]
+        if command == 'apply-layout':
+            name = request['name']
+            if name not in arranger.layouts:
+                raise ValueError(f"unknown layout {name!r}")
+            return arranger.apply_layout, [name]
+        if command == 'snapshot':
+            return arranger.save_snapshot, [self.snapshot_path(request.get('path'))]
+        if command == 'restore':
+            return arranger.restore_snapshot, [self.snapshot_path(request.get('path'))]
+        return self.reload_config, []
+
+    def snapshot_path(self, path):
+        """Resolve a client snapshot path, which must stay in the directory of snapshot_file
+
+        Relative paths are taken from that directory. Clients cannot point the
+        arranger at arbitrary files it can write (or read) on their behalf.
+        """
+        if path is None:
+            return None
+        if not isinstance(path, str) or not path:
+            raise ValueError(f"path must be a file name, not {path!r}")
+        directory = os.path.realpath(os.path.dirname(os.path.abspath(self.arranger.snapshot_file)))
+        resolved = os.path.realpath(os.path.join(directory, path))
+        if os.path.dirname(resolved) != directory:
+            raise ValueError(f"path {path!r} is outside the snapshot directory {directory}")
+        return resolved
+
+    def reload_config(self):
+        """Reload the config on the main loop and return its result
+
+        The config watcher and reload hotkey reload on the scheduler thread;
+        running the reload (and hotkey re-registration) there as well keeps
+        two reloads from interleaving.
+        """
+        arranger = self.arranger
+        if arranger.scheduler is None:
+            return arranger.reload_config()
+        done = threading.Event()
+        result = []
+
+        def reload():
+            try:
+                result.append(arranger.reload_config())
+            finally:
+                done.set()
+
+        arranger.scheduler.call_soon(reload)
+        if not done.wait(RELOAD_TIMEOUT):
+            logger.error(f"Config reload did not run on the main loop within {RELOAD_TIMEOUT:.0f}s")
+            return False
+        return bool(result) and result[0]
+
+    def run_command(self, command, function, args):
+        """Command queue job: return (ok, result) of one arranger call"""
+        started = time.time()
+        outcome = function(*args)
+        if command == 'snapshot':
+            if outcome is None:
+                return False, "snapshot failed, see the log"
+            return True, {'windows': len(outcome.entries), 'path': args[0] or self.arranger.snapshot_file}
+        if outcome is False:
+            return False, f"{command} failed, see the log"
+        # Metrics of the run this call made (if another run has finished since, there is nothing to report)
+        run = self.arranger.metrics.last_run
+        if run is not None and run.thread is threading.current_thread() and run.started >= started:
+            return True, run.to_dict()
+        return True, {}
+
+    def stats(self):
+        """Metrics totals plus API, worker, per-rule hit and session counters"""
+        arranger = self.arranger
+        return {
+            'metrics': arranger.metrics.snapshot(),
+            'control': {'requests': self.requests, 'errors': self.errors, 'runs': self.queue.runs,
+                        'coalesced': self.queue.coalesced, 'queued': self.queue.depth()},
+            'arranging': arranger.worker.is_busy() or arranger.placement_worker.is_busy(),
+            'tracked_windows': len(arranger.tracker.windows()) if arranger.tracker is not None else None,
+            'classification_cache': {'hits': arranger.rule_engine.cache_hits,
+                                     'misses': arranger.rule_engine.cache_misses},
+            'rules': arranger.rule_engine.stats(),
+            'process_cache': arranger.process_cache.stats(),
+            'config_reloads': arranger.config_reloads,
+            'session': arranger.session.describe(),
+        }
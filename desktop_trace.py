@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import gzip
+import json
+import time
+import atexit
+import random
+import argparse
+import platform
+import statistics
+import threading
+import logging
+from collections import deque
+
+from window_backend import (WindowBackend, SimulatedBackend, SimulatedWindow, WindowRecord, Rect,
+                            SW_SHOWMAXIMIZED, SW_SHOWNORMAL, SW_RESTORE, SW_MAXIMIZE)
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+# Trace file: one JSON value per line (gzip-compressed if the name ends in .gz)
+#   {"trace": 1, "started": ..., "platform": ..., "backend": ...}  header
+#   ["call", t, op, args, result, seconds]    backend call and its wall-clock latency
+#   ["error", t, op, args, message, seconds]  backend call that raised
+#   ["mark", t, event, fields]                arranger event: 'config', 'run', 'run_end'
+# t is seconds since the trace started. Rects are [left, top, right, bottom], windows
+# [hwnd, title, class, left, top, right, bottom, show state].
+
+# Runs the replay tool can re-run, by RunMetrics kind (snapshot files are not in the trace)
+REPLAYABLE_RUNS = ('arrange', 'rule', 'layout')
+
+
+def open_trace(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def encode(value):
+    """json.dumps default: Rects and WindowRecords as plain lists"""
+    if isinstance(value, Rect):
+        return value.as_tuple()
+    if isinstance(value, WindowRecord):
+        return (value.hwnd, value.title, value.class_name) + value.rect.as_tuple() + (value.placement,)
+    raise TypeError(f"Cannot write {type(value).__name__} to a trace")
+
+
+def decode_window(item):
+    hwnd, title, class_name, left, top, right, bottom, placement = item
+    return WindowRecord(hwnd, title, class_name, Rect(left, top, right, bottom), placement)
+
+
+def decode_monitors(items):
+    return [{'device': m['device'], 'monitor': Rect(*m['monitor']), 'work': Rect(*m['work']),
+             'primary': m['primary']} for m in items]
+
+
+class TracingBackend(WindowBackend):
+    """Wrap a backend and record every call with its arguments, result and latency
+
+    Only the wrapped call is timed, the trace write is not. Arranger events
+    (config loads, run start and end) are recorded through mark(). The
+    trace is flushed after every run and closed at exit.
+    """
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.calls = 0
+        self._file = open_trace(path, 'w')
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._write({'trace': TRACE_VERSION, 'started': time.time(), 'platform': platform.platform(),
+                     'backend': type(backend).__name__})
+        atexit.register(self.close)
+        logger.info(f"Recording backend calls to {path}")
+
+    def __getattr__(self, name):
+        # Backend-specific attributes (enumeration, call_counts, ...) come from the wrapped backend
+        return getattr(self.backend, name)
+
+    def _write(self, entry):
+        line = json.dumps(entry, default=encode, separators=(',', ':'), ensure_ascii=False)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + '\n')
+
+    def _traced(self, op, function, *args):
+        start = time.perf_counter()
+        try:
+            result = function(*args)
+        except Exception as e:
+            now = time.perf_counter()
+            self._write(['error', round(start - self._start, 6), op, args, str(e), round(now - start, 6)])
+            raise
+        now = time.perf_counter()
+        self.calls += 1
+        self._write(['call', round(start - self._start, 6), op, args, result, round(now - start, 6)])
+        return result
+
+    def mark(self, event, **fields):
+        self._write(['mark', round(time.perf_counter() - self._start, 6), event, fields])
+        if event == 'run_end':
+            with self._lock:
+                if self._file is not None:
+                    self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        logger.info(f"Trace of {self.calls} backend calls written to {self.path}")
+
+    def list_windows(self):
+        return self._traced('list_windows', self.backend.list_windows)
+
+    def get_show_state(self, hwnd):
+        return self._traced('get_show_state', self.backend.get_show_state, hwnd)
+
+    def show_window(self, hwnd, command):
+        return self._traced('show_window', self.backend.show_window, hwnd, command)
+
+    def move_window(self, hwnd, x, y, width, height):
+        return self._traced('move_window', self.backend.move_window, hwnd, x, y, width, height)
+
+    def move_windows(self, moves):
+        return self._traced('move_windows', self.backend.move_windows, [tuple(move) for move in moves])
+
+    def get_window_rect(self, hwnd):
+        return self._traced('get_window_rect', self.backend.get_window_rect, hwnd)
+
+    def get_normal_rect(self, hwnd):
+        return self._traced('get_normal_rect', self.backend.get_normal_rect, hwnd)
+
+    def get_window_pid(self, hwnd):
+        return self._traced('get_window_pid', self.backend.get_window_pid, hwnd)
+
+    def get_process_image(self, pid):
+        return self._traced('get_process_image', self.backend.get_process_image, pid)
+
+    def get_window_info(self, hwnd):
+        return self._traced('get_window_info', self.backend.get_window_info, hwnd)
+
+    def get_screen_metrics(self):
+        return self._traced('get_screen_metrics', self.backend.get_screen_metrics)
+
+    def get_monitors(self):
+        return self._traced('get_monitors', self.backend.get_monitors)
+
+    def sleep(self, seconds):
+        return self._traced('sleep', self.backend.sleep, seconds)
+
+    def watch_window_events(self, callback):
+        return self.backend.watch_window_events(callback)
+
+    def watch_display_changes(self, callback):
+        return self.backend.watch_display_changes(callback)
+
+    def watch_session_changes(self, callback):
+        return self.backend.watch_session_changes(callback)
+
+
+class TracedRun:
+    """One recorded arranger run and the desktop it started from"""
+
+    def __init__(self, number, kind, details, config):
+        self.number = number
+        self.kind = kind
+        self.details = details  # Arguments of the run (rule or layout name)
+        self.config = config
+        self.windows = None  # hwnd -> WindowRecord before the run changed anything
+        self.monitors = None
+        self.pids = {}  # hwnd -> pid, for windows whose process was looked up
+        self.images = {}  # pid -> executable name
+        self.normal_rects = {}  # hwnd -> restored Rect, for maximized windows whose placement was read
+        self.seconds = None
+        self.calls = []  # (op, args, result, seconds, error)
+        self.settle_polls = {}  # hwnd -> show state polls a restore took to land
+
+    def latencies(self):
+        """op -> recorded call latencies, in call order"""
+        latencies = {}
+        for op, _, _, seconds, _ in self.calls:
+            if op != 'sleep':
+                latencies.setdefault(op, []).append(seconds)
+        return latencies
+
+    def freeze(self, windows, monitors):
+        """Take the desktop the run started from: the model just before its first window change"""
+        if self.windows is None:
+            self.windows = {hwnd: WindowRecord(w.hwnd, w.title, w.class_name, w.rect, w.placement)
+                            for hwnd, w in windows.items()}
+            self.monitors = monitors
+
+    def backend_seconds(self):
+        return sum(seconds for op, _, _, seconds, _ in self.calls if op != 'sleep')
+
+    def actions(self):
+        """Window changes made during the run, as comparable tuples"""
+        actions = []
+        for op, args, _, _, error in self.calls:
+            if error is not None:
+                continue
+            if op == 'move_window':
+                actions.append(('move',) + tuple(args))
+            elif op == 'move_windows':
+                actions.extend(('move',) + tuple(move) for move in args[0])
+            elif op == 'show_window':
+                actions.append(('show',) + tuple(args))
+        return sorted(actions)
+
+
+def load_trace(path):
+    """Read a trace, return (header, list of TracedRun)
+
+    The desktop is followed through the whole trace (enumerations, window
+    reads, moves, process lookups). A run's desktop is the model just before
+    its first window change, so it includes the run's own enumeration and
+    reads, and its processes are every process looked up by the run's end.
+    """
+    windows = {}
+    monitors = None
+    pids = {}
+    images = {}
+    normal_rects = {}
+    config = None
+    runs = []
+    current = None
+    restoring = {}  # hwnd -> maximized polls seen since SW_RESTORE, in the current run
+    with open_trace(path, 'r') as f:
+        header = json.loads(f.readline())
+        if header.get('trace') != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} trace")
+        for line in f:
+            entry = json.loads(line)
+            if entry[0] == 'mark':
+                _, _, event, fields = entry
+                if event == 'config':
+                    config = fields['config']
+                elif event == 'run':
+                    details = {key: value for key, value in fields.items() if key != 'kind'}
+                    current = TracedRun(len(runs) + 1, fields['kind'], details, config)
+                    restoring = {}
+                    runs.append(current)
+                elif event == 'run_end' and current is not None:
+                    current.freeze(windows, monitors)
+                    current.pids, current.images, current.normal_rects = dict(pids), dict(images), dict(normal_rects)
+                    current.seconds = fields.get('seconds')
+                    current = None
+                continue
+
+            kind, _, op, args, result, seconds = entry
+            error = result if kind == 'error' else None
+            if current is not None and op in ('move_window', 'move_windows', 'show_window'):
+                current.freeze(windows, monitors)
+            if error is None:
+                result = follow(op, args, result, windows, pids, images, normal_rects)
+                if op == 'get_monitors':
+                    monitors = result
+            if current is None:
+                continue
+            current.calls.append((op, args, result, seconds, error))
+            if error is not None:
+                continue
+            if op == 'show_window' and args[1] == SW_RESTORE:
+                restoring[args[0]] = 0
+            elif op == 'get_show_state' and args[0] in restoring:
+                if result == SW_SHOWMAXIMIZED:
+                    restoring[args[0]] += 1
+                else:
+                    current.settle_polls[args[0]] = restoring.pop(args[0])
+    if current is not None:
+        # The trace ends inside a run (the arranger was stopped)
+        current.freeze(windows, monitors)
+        current.pids, current.images, current.normal_rects = dict(pids), dict(images), dict(normal_rects)
+    return header, runs
+
+
+def follow(op, args, result, windows, pids, images, normal_rects):
+    """Update the desktop model with one successful call, return the decoded result"""
+    if op == 'list_windows':
+        result = [decode_window(item) for item in result]
+        windows.clear()
+        windows.update((w.hwnd, w) for w in result)
+    elif op == 'get_window_info':
+        if result is None:
+            windows.pop(args[0], None)
+        else:
+            result = decode_window(result)
+            windows[result.hwnd] = result
+    elif op == 'get_window_rect':
+        result = Rect(*result)
+        if args[0] in windows:
+            windows[args[0]].rect = result
+    elif op == 'get_normal_rect':
+        result = Rect(*result)
+        normal_rects[args[0]] = result
+    elif op == 'get_show_state':
+        if args[0] in windows:
+            windows[args[0]].placement = result
+    elif op in ('move_window', 'move_windows'):
+        for hwnd, x, y, width, height in ([args] if op == 'move_window' else args[0]):
+            if hwnd in windows:
+                windows[hwnd].rect = Rect(x, y, x + width, y + height)
+    elif op == 'show_window':
+        if args[0] in windows:
+            windows[args[0]].placement = SW_SHOWMAXIMIZED if args[1] == SW_MAXIMIZE else SW_SHOWNORMAL
+    elif op == 'get_window_pid':
+        if result:
+            pids[args[0]] = result
+    elif op == 'get_process_image':
+        images[args[0]] = result
+    elif op == 'get_monitors':
+        result = decode_monitors(result)
+    return result
+
+
+class ReplayBackend(SimulatedBackend):
+    """Simulated desktop that answers with a traced run's windows and latencies
+
+    Each backend call sleeps the latency recorded for the same call in the
+    run (latency_scale times, in recorded order; the median of all recorded
+    calls of that kind once a run makes more calls than were recorded), and
+    a restored window reports maximized for as many polls as it did live.
+    """
+
+    def __init__(self, medians=None, latency_scale=1.0):
+        super().__init__(sleep_scale=latency_scale)
+        self.medians = medians or {}  # op -> median latency over the whole trace
+        self.latency_scale = latency_scale
+        self.replay_latencies = {}
+        self.settle_polls = {}
+        self.restoring = {}
+        self.actions = []
+        self.backend_seconds = 0.0
+
+    def load(self, run):
+        """Reset the desktop to the state at the start of a traced run"""
+        with self._lock:
+            self.windows = {}
+            self.processes = dict(run.images)
+            for hwnd, w in run.windows.items():
+                window = SimulatedWindow(hwnd, w.title, w.class_name, Rect(*w.rect.as_tuple()),
+                                         pid=run.pids.get(hwnd, 0))
+                window.show_state = w.placement if w.placement is not None else SW_SHOWNORMAL
+                if hwnd in run.normal_rects:
+                    window.restore_rect = Rect(*run.normal_rects[hwnd].as_tuple())
+                self.windows[hwnd] = window
+            self.replay_latencies = {op: deque(values) for op, values in run.latencies().items()}
+            self.settle_polls = dict(run.settle_polls)
+            self.restoring = {}
+            self.actions = []
+            self.backend_seconds = 0.0
+        if run.monitors is not None and run.monitors != self.monitors:
+            self.set_monitors(run.monitors)
+
+    def _call(self, name):
+        with self._lock:
+            self.call_counts[name] += 1
+            recorded = self.replay_latencies.get(name)
+            delay = recorded.popleft() if recorded else self.medians.get(name, 0.0)
+            self.backend_seconds += delay
+        if delay and self.latency_scale:
+            time.sleep(delay * self.latency_scale)
+
+    def get_show_state(self, hwnd):
+        with self._lock:
+            polls = self.restoring.get(hwnd)
+            if polls:
+                self.restoring[hwnd] = polls - 1
+                self._call('get_show_state')
+                return SW_SHOWMAXIMIZED
+        return super().get_show_state(hwnd)
+
+    def show_window(self, hwnd, command):
+        super().show_window(hwnd, command)
+        with self._lock:
+            self.actions.append(('show', hwnd, command))
+            if command == SW_RESTORE:
+                self.restoring[hwnd] = self.settle_polls.get(hwnd, 0)
+
+    def move_window(self, hwnd, x, y, width, height):
+        super().move_window(hwnd, x, y, width, height)
+        with self._lock:
+            self.actions.append(('move', hwnd, x, y, width, height))
+
+    def move_windows(self, moves):
+        super().move_windows(moves)
+        with self._lock:
+            self.actions.extend(('move',) + tuple(move) for move in moves)
+
+
+def median_latencies(runs):
+    """op -> median recorded latency across all runs"""
+    latencies = {}
+    for run in runs:
+        for op, values in run.latencies().items():
+            latencies.setdefault(op, []).extend(values)
+    return {op: statistics.median(values) for op, values in latencies.items()}
+
+
+def replay(runs, latency_scale=1.0, config=None, report=print):
+    """Re-run traced runs through a WindowArranger on a ReplayBackend, return per-run results
+
+    config replaces the recorded config, to see what a rule change would have done.
+    """
+    from window_arranger import WindowArranger
+    from config_loader import compile_config
+
+    backend = ReplayBackend(median_latencies(runs), latency_scale)
+    arranger = WindowArranger(backend=backend)
+    applied = None
+    results = []
+    for run in runs:
+        if run.kind not in REPLAYABLE_RUNS:
+            report(f"run {run.number} {run.kind}: skipped, not replayable")
+            continue
+        run_config = config if config is not None else run.config
+        if run_config is not None and run_config is not applied:
+            arranger.apply_config(compile_config(run_config))
+            applied = run_config
+        backend.load(run)
+        start = time.perf_counter()
+        if run.kind == 'arrange':
+            arranger.arrange_windows()
+        elif run.kind == 'rule':
+            arranger.arrange_by_rule(run.details['rule_type'], run.details['pattern'], run.details['monitor'])
+        else:
+            arranger.apply_layout(run.details['name'])
+        seconds = time.perf_counter() - start
+        recorded, replayed = run.actions(), sorted(backend.actions)
+        result = {'run': run.number, 'kind': run.kind, 'windows': len(run.windows),
+                  'recorded_seconds': run.seconds, 'replayed_seconds': seconds,
+                  'recorded_backend_seconds': run.backend_seconds(),
+                  'replayed_backend_seconds': backend.backend_seconds,
+                  'actions': len(recorded), 'match': recorded == replayed,
+                  'missing': [a for a in recorded if a not in replayed],
+                  'extra': [a for a in replayed if a not in recorded]}
+        results.append(result)
+        recorded_ms = f"{run.seconds * 1000:.1f} ms" if run.seconds is not None else "unfinished"
+        outcome = f"decisions match ({len(recorded)} window changes)" if result['match'] else \
+            f"decisions differ ({len(result['missing'])} recorded changes not made, {len(result['extra'])} new)"
+        report(f"run {run.number} {run.kind}: {len(run.windows)} windows, recorded {recorded_ms} "
+               f"(backend {result['recorded_backend_seconds'] * 1000:.1f} ms), replayed {seconds * 1000:.1f} ms "
+               f"(backend {backend.backend_seconds * 1000:.1f} ms); {outcome}")
+    return results
+
+
+def summarize(header, runs):
+    """Print what a trace holds"""
+    print(f"Trace of {header.get('backend')} on {header.get('platform')}, "
+          f"started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(header.get('started', 0)))}")
+    totals = {}
+    for run in runs:
+        for op, _, _, seconds, _ in run.calls:
+            count, total = totals.get(op, (0, 0.0))
+            totals[op] = (count + 1, total + seconds)
+        recorded_ms = f"{run.seconds * 1000:.1f} ms" if run.seconds is not None else "unfinished"
+        print(f"run {run.number} {run.kind}: {len(run.windows)} windows, {len(run.calls)} backend calls, "
+              f"{len(run.actions())} window changes, {recorded_ms}")
+    print("Backend calls during runs:")
+    for op, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f"  {op:>18}: {count:6d} calls, {total * 1000:9.2f} ms total, {total / count * 1e6:9.1f} us mean")
+
+
+def record_simulated(path, window_count=150, monitor_count=2, runs=3, seed=0):
+    """Record a trace of arrangements on a simulated desktop with Win32-like latencies"""
+    from window_arranger import WindowArranger
+    latency = {'list_windows': 0.002, 'get_show_state': 0.00002, 'show_window': 0.0005,
+               'move_windows': 0.004, 'get_window_rect': 0.00002, 'get_window_pid': 0.00001,
+               'get_process_image': 0.0002, 'get_monitors': 0.0003}
+    simulated = SimulatedBackend.generate(window_count, monitor_count, seed=seed, latency=latency)
+    backend = TracingBackend(simulated, path)
+    arranger = WindowArranger(backend=backend)
+    rng = random.Random(seed)
+    for _ in range(runs):
+        # Scatter some windows between presses so every run has work to do
+        for window in rng.sample(list(simulated.windows.values()), max(1, window_count // 10)):
+            work = simulated.monitors[rng.randrange(len(simulated.monitors))]['work']
+            width, height = window.rect.width(), window.rect.height()
+            window.rect = Rect(work.left, work.top, work.left + width, work.top + height)
+        arranger.arrange_windows()
+    backend.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and replay desktop traces (window_arranger.py --trace)")
+    sub = parser.add_subparsers(dest='action', required=True)
+    p = sub.add_parser('summary', help="list the runs and backend call costs in a trace")
+    p.add_argument('trace')
+    p = sub.add_parser('replay', help="re-run the traced runs on a simulated desktop with the recorded latencies")
+    p.add_argument('trace')
+    p.add_argument('--latency-scale', type=float, default=1.0,
+                   help="multiply recorded latencies (0 replays decisions only, as fast as possible)")
+    p.add_argument('--config', help="replay with this config file instead of the recorded config")
+    p.add_argument('--profile', metavar='FILE', help="replay under cProfile and write the stats to FILE")
+    p = sub.add_parser('record-simulated', help="record a trace of a simulated desktop (to try the tools)")
+    p.add_argument('trace')
+    p.add_argument('--windows', type=int, default=150)
+    p.add_argument('--monitors', type=int, default=2)
+    p.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.action == 'record-simulated':
+        record_simulated(args.trace, args.windows, args.monitors, args.runs)
+        print(f"Trace written to {args.trace}")
+        return 0
+    header, runs = load_trace(args.trace)
+    if args.action == 'summary':
+        summarize(header, runs)
+        return 0
+
+    config = None
+    if args.config:
+        from config_loader import read_config
+        config = read_config(args.config)
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        results = profiler.runcall(replay, runs, args.latency_scale, config)
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    else:
+        results = replay(runs, args.latency_scale, config)
+    if config is None and not all(result['match'] for result in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
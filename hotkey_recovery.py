@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Scan codes (set 1) that the console reports after a b'\x00' prefix for Alt+letter
+LETTER_SCAN_CODES = {}
+for _row, _first in (("qwertyuiop", 0x10), ("asdfghjkl", 0x1E), ("zxcvbnm", 0x2C)):
+    for _offset, _letter in enumerate(_row):
+        LETTER_SCAN_CODES[_letter] = _first + _offset
+
+# Extended key sequences returned by msvcrt.getch() for function keys
+FUNCTION_KEY_SEQUENCES = {f"f{n}": b'\x00' + bytes([0x3A + n]) for n in range(1, 11)}
+FUNCTION_KEY_SEQUENCES.update({'f11': b'\xe0\x85', 'f12': b'\xe0\x86'})
+
+
+class KeyHistory:
+    """Fixed-size ring buffer of (key, timestamp) console key presses"""
+
+    def __init__(self, size=32):
+        self._keys = deque(maxlen=size)
+
+    def add(self, key, timestamp):
+        self._keys.append((key, timestamp))
+
+    def recent(self, now, window):
+        """Drop keys older than window seconds and return the remaining keys"""
+        keys = self._keys
+        while keys and now - keys[0][1] >= window:
+            keys.popleft()
+        return [key for key, _ in keys]
+
+    def clear(self):
+        self._keys.clear()
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def console_sequences(combo):
+    """Return the byte sequences msvcrt.getch() may produce when combo is typed in the console
+
+    When a global hotkey is lost, the keys reach the focused console window
+    instead: Ctrl+letter arrives as a control character, Alt+letter as
+    b'\\x00' plus the scan code and function keys as two-byte sequences.
+    """
+    parts = [part.strip().lower() for part in combo.split('+') if part.strip()]
+    if not parts:
+        return []
+    key = parts[-1]
+    modifiers = set(parts[:-1])
+    ctrl = bool(modifiers & {'ctrl', 'control'})
+    alt = bool(modifiers & {'alt', 'alt gr'})
+
+    if key in FUNCTION_KEY_SEQUENCES:
+        return [FUNCTION_KEY_SEQUENCES[key]]
+    if len(key) != 1:
+        return []  # Named keys other than F1-F12 do not reach msvcrt.getch() reliably
+    sequences = []
+    if ctrl and key.isalpha():
+        sequences.append(bytes([ord(key) & 0x1F]))
+    if alt and not ctrl and key in LETTER_SCAN_CODES:
+        sequences.append(b'\x00' + bytes([LETTER_SCAN_CODES[key]]))
+    if not modifiers or (ctrl and not key.isalpha()):
+        # Unmodified keys, and Ctrl+digit/punctuation which the console delivers as the bare character
+        sequences.append(key.encode('ascii', 'ignore'))
+    return [sequence for sequence in sequences if sequence]
+
+
+def unconfirmed_modifiers(combo, sequence):
+    """Return the modifiers of combo that sequence carries no trace of
+
+    Ctrl+letter arrives as a control character and Ctrl+digit as the bare
+    digit, which plain keys produce too (Ctrl+Alt+I is a Tab), so such a
+    sequence only means the hotkey if its modifiers are actually held.
+    """
+    modifiers = [part.strip().lower() for part in combo.split('+') if part.strip()][:-1]
+    if not modifiers or len(sequence) != 1:
+        return ()
+    return tuple('ctrl' if modifier == 'control' else modifier for modifier in modifiers)
+
+
+class HotkeySequenceMatcher:
+    """Match recent console keys against the configured hotkey combos"""
+
+    def __init__(self, combos):
+        self.sequences = []  # (byte sequence, combo, modifiers to check with is_pressed)
+        for combo in combos:
+            if not combo:
+                continue
+            for sequence in console_sequences(combo):
+                self.sequences.append((sequence, combo, unconfirmed_modifiers(combo, sequence)))
+        # Try longer sequences first so b'\x00;' wins over a bare ';'
+        self.sequences.sort(key=lambda item: -len(item[0]))
+        self.max_length = max((len(sequence) for sequence, _, _ in self.sequences), default=0)
+
+    def match(self, keys, is_pressed=None):
+        """Return the hotkey combo whose console sequence ends the key history, or None
+
+        is_pressed(modifier) (keyboard.is_pressed) confirms the modifiers of
+        single-byte sequences; without it those sequences never match.
+        """
+        if not self.sequences or not keys:
+            return None
+        tail = b''.join(keys[-self.max_length:])
+        for sequence, combo, modifiers in self.sequences:
+            if not tail.endswith(sequence):
+                continue
+            if modifiers and (is_pressed is None or not all(is_pressed(modifier) for modifier in modifiers)):
+                continue
+            return combo
+        return None
+
+
+class BackoffLimiter:
+    """Allow an action at most once per interval, doubling the interval after each use
+
+    The interval falls back to its minimum once the action has not been
+    attempted for max_interval seconds.
+    """
+
+    def __init__(self, min_interval, max_interval):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.interval = min_interval
+        self.suppressed = 0
+        self._next_allowed = None
+        self._last_attempt = None
+
+    def allow(self, now):
+        """Return True if the action may run now, and account for it"""
+        if self._last_attempt is not None and now - self._last_attempt >= self.max_interval:
+            self.interval = self.min_interval
+        self._last_attempt = now
+        if self._next_allowed is not None and now < self._next_allowed:
+            self.suppressed += 1
+            return False
+        self._next_allowed = now + self.interval
+        self.interval = min(self.interval * 2, self.max_interval)
+        return True
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+import logging
+
+from window_backend import Rect
+from rule_engine import RuleEngine, parse_app_entry, DEFAULT_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Monitor layout types:
+#   grid    - fixed rows x columns cells
+#   columns - side-by-side cells across the work area
+#   rows    - stacked cells down the work area
+#   tiles   - grid sized to the number of windows placed on the monitor
+LAYOUT_TYPES = ('grid', 'columns', 'rows', 'tiles')
+
+# What a layout does with windows no slot rule matches:
+#   keep - leave them where they are
+#   fill - put them in the free cells of the monitor their normal rule assigns
+UNMATCHED_MODES = ('keep', 'fill')
+
+# Cached cell geometries per layout (one entry per topology/monitor/window count)
+MAX_CACHED_GEOMETRIES = 64
+
+
+def split(start, length, weights, gap):
+    """Split [start, start + length) into spans proportional to weights, gap pixels apart"""
+    total = sum(weights)
+    usable = length - gap * (len(weights) - 1)
+    spans = []
+    offset = 0
+    for weight in weights:
+        begin = start + int(usable * offset // total) + gap * len(spans)
+        offset += weight
+        end = start + int(usable * offset // total) + gap * len(spans)
+        spans.append((begin, end))
+    return spans
+
+
+def compute_cells(spec, work, count=None):
+    """Return the cell rectangles of a monitor layout inside a work area, row-major"""
+    gap = spec.get('gap', 0)
+    margin = spec.get('margin', 0)
+    left, top = work.left + margin, work.top + margin
+    width, height = work.width() - 2 * margin, work.height() - 2 * margin
+
+    layout_type = spec['type']
+    if layout_type == 'columns':
+        rows, columns = [1], spec.get('weights') or [1] * spec['count']
+    elif layout_type == 'rows':
+        rows, columns = spec.get('weights') or [1] * spec['count'], [1]
+    elif layout_type == 'grid':
+        rows, columns = [1] * spec['rows'], [1] * spec['columns']
+    else:
+        count = max(count or 1, 1)
+        column_count = math.ceil(math.sqrt(count))
+        rows, columns = [1] * math.ceil(count / column_count), [1] * column_count
+
+    return [Rect(x0, y0, x1, y1)
+            for y0, y1 in split(top, height, rows, gap)
+            for x0, x1 in split(left, width, columns, gap)]
+
+
+def validate_monitor_spec(name, monitor, spec):
+    """Return an error message for an invalid monitor layout spec, or None"""
+    if not isinstance(spec, dict):
+        return f"layout '{name}' monitor {monitor}: expected an object"
+    layout_type = spec.get('type')
+    if layout_type not in LAYOUT_TYPES:
+        return f"layout '{name}' monitor {monitor}: unknown type {layout_type!r}"
+    positive = ('count',) if layout_type in ('columns', 'rows') and 'weights' not in spec else ()
+    if layout_type == 'grid':
+        positive = ('rows', 'columns')
+    for key in positive:
+        value = spec.get(key)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            return f"layout '{name}' monitor {monitor}: '{key}' must be a positive integer"
+    weights = spec.get('weights')
+    if weights is not None and (not isinstance(weights, list) or not weights or
+                                not all(isinstance(w, (int, float)) and w > 0 for w in weights)):
+        return f"layout '{name}' monitor {monitor}: 'weights' must be a list of positive numbers"
+    for key in ('gap', 'margin'):
+        value = spec.get(key, 0)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            return f"layout '{name}' monitor {monitor}: '{key}' must be a non-negative integer"
+    return None
+
+
+class SlotRule:
+    """Where windows matched by one slot rule go: monitor and optional 1-based slot"""
+    __slots__ = ('monitor', 'slot')
+
+    def __init__(self, monitor, slot=None):
+        self.monitor = monitor
+        self.slot = slot
+
+
+class LayoutProfile:
+    """Named layout: per-monitor cell geometry plus rules assigning windows to cells
+
+    Cell rectangles depend only on the monitor topology (and, for tiles, on
+    the number of windows on the monitor), so they are computed once per
+    topology and reused; applying a layout again, or switching between
+    layouts, only classifies the windows and looks up their cells.
+    """
+
+    def __init__(self, name, monitors, slot_rules, rule_engine, hotkey=None, unmatched='keep'):
+        self.name = name
+        self.monitors = monitors  # monitor number -> spec dict
+        self.slot_rules = slot_rules  # Parallel to rule_engine.rules (by Rule.index)
+        self.rule_engine = rule_engine
+        self.hotkey = hotkey
+        self.unmatched = unmatched
+        self.dropped = 0  # Invalid monitor specs, slots and settings skipped by from_config
+        self.geometry_hits = 0
+        self.geometry_misses = 0
+        self._cells = {}  # (topology signature, monitor, window count or None) -> [Rect]
+
+    @classmethod
+    def from_config(cls, name, entry, cache_size):
+        """Compile one "layouts" entry, return None (and log) if it is invalid
+
+        Invalid monitor specs and slots are logged and skipped; the returned
+        layout counts them in `dropped` so a config reload can reject them.
+        """
+        if not isinstance(entry, dict):
+            logger.error(f"Invalid layout '{name}': expected an object, layout ignored")
+            return None
+        dropped = 0
+        monitors = {}
+        for key, spec in (entry.get('monitors') or {}).items():
+            try:
+                monitor = int(key)
+            except (TypeError, ValueError):
+                monitor = 0
+            if monitor < 1:
+                logger.error(f"Invalid monitor {key!r} in layout '{name}', monitor ignored")
+                dropped += 1
+                continue
+            error = validate_monitor_spec(name, monitor, spec)
+            if error is not None:
+                logger.error(f"Invalid {error}, monitor ignored")
+                dropped += 1
+                continue
+            monitors[monitor] = spec
+        if not monitors:
+            logger.error(f"Layout '{name}' has no valid monitors, layout ignored")
+            return None
+
+        unmatched = entry.get('unmatched', 'keep')
+        if unmatched not in UNMATCHED_MODES:
+            logger.error(f"Invalid unmatched mode {unmatched!r} in layout '{name}', using 'keep'")
+            unmatched = 'keep'
+            dropped += 1
+
+        rules = []
+        slot_rules = []
+        for slot_entry in entry.get('slots') or []:
+            if not isinstance(slot_entry, dict):
+                logger.error(f"Invalid slot {slot_entry!r} in layout '{name}': expected an object")
+                dropped += 1
+                continue
+            if 'type' in slot_entry:
+                rule_type, pattern = slot_entry['type'], slot_entry.get('pattern', '')
+            else:
+                rule_type, pattern = parse_app_entry(slot_entry.get('pattern', ''))
+            slot = slot_entry.get('slot')
+            if slot is not None and (not isinstance(slot, int) or isinstance(slot, bool) or slot < 1):
+                logger.error(f"Invalid slot {slot!r} for '{pattern}' in layout '{name}', rule ignored")
+                dropped += 1
+                continue
+            rule = RuleEngine.compile_rule(len(rules), rule_type, pattern, slot_entry.get('monitor'),
+                                           slot_entry.get('priority', 0))
+            if rule is None:
+                dropped += 1
+                continue
+            rules.append(rule)
+            slot_rules.append(SlotRule(rule.monitor, slot))
+
+        layout = cls(name, monitors, slot_rules, RuleEngine(rules, cache_size=cache_size),
+                     entry.get('hotkey'), unmatched)
+        layout.dropped = dropped
+        logger.info(f"Compiled layout '{name}': {len(monitors)} monitors, {len(rules)} slot rules")
+        return layout
+
+    def cells(self, topology, monitor, count=None):
+        """Cell rectangles for a monitor of the topology, computed once per topology"""
+        spec = self.monitors[monitor]
+        if spec['type'] != 'tiles':
+            count = None
+        key = (topology.signature(), monitor, count)
+        cells = self._cells.get(key)
+        if cells is not None:
+            self.geometry_hits += 1
+            return cells
+        self.geometry_misses += 1
+        if len(self._cells) >= MAX_CACHED_GEOMETRIES:
+            self._cells.clear()
+        cells = compute_cells(spec, topology.get(monitor).work, count)
+        self._cells[key] = cells
+        return cells
+
+    def precompute(self, topology):
+        """Compute the fixed cell geometry of every monitor present in the topology"""
+        for monitor, spec in self.monitors.items():
+            if spec['type'] != 'tiles' and topology.get(monitor) is not None:
+                self.cells(topology, monitor)
+
+    def plan(self, windows, topology, default_target=None, process_name=None, process_id=None):
+        """Assign windows to cells, return a list of (WindowRecord, monitor number, Rect)
+
+        default_target(window_info) gives the monitor for windows no slot rule
+        matches (used in 'fill' mode); process_name(window_info) and
+        process_id(window_info) are only called when a slot rule matches on
+        process name or id.
+        """
+        by_monitor = {}
+        rule_engine = self.rule_engine
+        for window in windows:
+            process = process_name(window) if process_name and rule_engine.uses_process else None
+            pid = process_id(window) if process_id and rule_engine.uses_pid else None
+            _, rule = rule_engine.classify(window.title, window.class_name, process, pid)
+            if rule is not None:
+                slot_rule = self.slot_rules[rule.index]
+                monitor, slot = slot_rule.monitor, slot_rule.slot
+            elif self.unmatched == 'fill' and default_target is not None:
+                monitor, slot = default_target(window), None
+            else:
+                continue
+            monitor = topology.resolve(monitor).number
+            if monitor not in self.monitors:
+                logger.debug(f"Layout '{self.name}' has no cells on monitor {monitor}, "
+                             f"leaving '{window.title}' in place")
+                continue
+            by_monitor.setdefault(monitor, []).append((window, slot))
+
+        placements = []
+        for monitor, entries in by_monitor.items():
+            cells = self.cells(topology, monitor, len(entries))
+            taken = {slot for _, slot in entries if slot is not None and slot <= len(cells)}
+            free = [index for index in range(1, len(cells) + 1) if index not in taken]
+            next_free = 0
+            for window, slot in entries:
+                if slot is None or slot > len(cells):
+                    if next_free < len(free):
+                        slot = free[next_free]
+                    else:
+                        # More windows than cells: overflow wraps around and shares cells
+                        slot = (next_free - len(free)) % len(cells) + 1
+                    next_free += 1
+                placements.append((window, monitor, cells[slot - 1]))
+        return placements
+
+
+def load_layouts(config):
+    """Compile the "layouts" config section into {name: LayoutProfile}"""
+    layouts = {}
+    section = config.get("layouts") or {}
+    if not isinstance(section, dict):
+        logger.error("Invalid \"layouts\" section: expected an object, layouts ignored")
+        return layouts
+    cache_size = config.get("classification_cache_size", DEFAULT_CACHE_SIZE)
+    for name, entry in section.items():
+        layout = LayoutProfile.from_config(name, entry, cache_size)
+        if layout is not None:
+            layouts[name] = layout
+    return layouts
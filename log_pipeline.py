@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+DEFAULT_RATE_LIMIT = 20  # Records per second from one logging call site
+DEFAULT_LOG_FILE_MAX_BYTES = 1024 * 1024
+DEFAULT_LOG_FILE_BACKUPS = 3
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most `rate` records per second through from each logging call site
+
+    Records at ERROR and above always pass. The number of records dropped
+    at a call site is appended to the next record let through from it.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT):
+        super().__init__()
+        self.rate = rate  # 0 disables the limit
+        self.suppressed = 0
+        self._sites = {}  # (pathname, lineno) -> [second started, records passed, records dropped]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or record.created - site[0] >= 1.0:
+                dropped = site[2] if site is not None else 0
+                self._sites[key] = [record.created, 1, 0]
+                if dropped:
+                    record.msg = f"{record.msg} ({dropped} similar messages suppressed)"
+                return True
+            if site[1] < self.rate:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class LogPipeline:
+    """Root logging through a queue: callers only enqueue records, a listener thread formats and writes them
+
+    Console writes (and the optional rotating log file) happen on the
+    listener thread, so an arrangement never waits for terminal output.
+    """
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.rate_filter = RateLimitFilter()
+        self.queue_handler = QueueHandler(self.queue)
+        self.queue_handler.addFilter(self.rate_filter)
+        self.formatter = logging.Formatter(LOG_FORMAT)
+        self.console_handler = logging.StreamHandler(sys.stdout)
+        self.console_handler.setFormatter(self.formatter)
+        self.file_handler = None
+        self.file_settings = None  # (path, max bytes, backups) of file_handler
+        self.listener = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.listener is not None
+
+    def start(self, level=logging.INFO):
+        """Route the root logger through the queue (replacing its handlers) and start the listener"""
+        with self._lock:
+            if self.listener is not None:
+                return
+            root = logging.getLogger()
+            for handler in root.handlers[:]:
+                root.removeHandler(handler)
+            root.addHandler(self.queue_handler)
+            root.setLevel(level)
+            self._start_listener()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write out queued records and stop the listener"""
+        with self._lock:
+            if self.listener is None:
+                return
+            if self.rate_filter.suppressed:
+                logger.info(f"{self.rate_filter.suppressed} log records were dropped by the rate limit")
+            self.listener.stop()
+            self.listener = None
+            logging.getLogger().removeHandler(self.queue_handler)
+            if self.file_handler is not None:
+                self.file_handler.close()
+                self.file_handler = None
+                self.file_settings = None
+
+    def _start_listener(self):
+        handlers = [self.console_handler] + ([self.file_handler] if self.file_handler is not None else [])
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def configure(self, level='INFO', log_file=None, max_bytes=DEFAULT_LOG_FILE_MAX_BYTES,
+                  backups=DEFAULT_LOG_FILE_BACKUPS, rate_limit=DEFAULT_RATE_LIMIT):
+        """Apply logging settings; does nothing until start() has been called"""
+        with self._lock:
+            if self.listener is None:
+                return
+            logging.getLogger().setLevel(getattr(logging, str(level).upper(), logging.INFO))
+            self.rate_filter.rate = rate_limit
+            settings = (log_file, max_bytes, backups) if log_file else None
+            if settings == self.file_settings:
+                return
+            file_handler = None
+            if settings is not None:
+                try:
+                    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups,
+                                                       encoding='utf-8')
+                    file_handler.setFormatter(self.formatter)
+                except OSError as e:
+                    logger.error(f"Cannot open log file {log_file}: {e}")
+                    settings = None
+            # The listener's handlers are fixed when it starts: restart it around the swap
+            self.listener.stop()
+            if self.file_handler is not None:
+                self.file_handler.close()
+            self.file_handler = file_handler
+            self.file_settings = settings
+            self._start_listener()
+        if settings is not None:
+            logger.info(f"Logging to {log_file} (rotating at {max_bytes} bytes, {backups} backups)")
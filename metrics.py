@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import threading
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Phases of an arrangement run, in report order:
+#   enumerate - listing windows
+#   classify  - process lookups and rule matching
+#   placement - current monitor and show state queries
+#   plan      - building the move plan
+#   move      - restore/move/maximize calls
+#   wait      - waiting for windows to restore or land
+PHASES = ('enumerate', 'classify', 'placement', 'plan', 'move', 'wait')
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None if empty or beyond the last bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5), 'p95': self.quantile(0.95),
+                'buckets': {str(bound): count for bound, count in zip(self.buckets + ('+Inf',), self.counts)}}
+
+
+class RunMetrics:
+    """Timings and counters of one arrangement run
+
+    Phases are timed exclusively: entering a phase pauses the enclosing one,
+    so the phase times add up to (at most) the run time.
+    """
+
+    def __init__(self, kind, requested_at=None):
+        self.kind = kind  # 'arrange', 'rule', 'layout' or 'restore'
+        self.thread = threading.current_thread()
+        self.started = time.time()
+        self.seconds = None
+        self.requested_at = requested_at  # perf_counter() of the hotkey press that queued the run, if any
+        self.first_move_at = None  # perf_counter() when the run first touched a window
+        self.phases = {}
+        self.counters = {}
+        self.rule_hits = {}  # Rule label -> windows it classified
+        self.move_latencies = []
+        self._start = time.perf_counter()
+        self._stack = []  # [phase, resumed at]
+
+    @contextmanager
+    def phase(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.phases[parent[0]] = self.phases.get(parent[0], 0.0) + now - parent[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, since = self._stack.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + now - since
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def add_phase(self, name, seconds):
+        """Add time measured inline (for per-window work where a context manager costs too much)"""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def count_rule(self, label, n=1):
+        self.rule_hits[label] = self.rule_hits.get(label, 0) + n
+
+    def observe_move(self, seconds):
+        """Record how long one window took to reach its new position"""
+        self.move_latencies.append(seconds)
+
+    def mark_first_move(self):
+        if self.first_move_at is None:
+            self.first_move_at = time.perf_counter()
+
+    def first_move_seconds(self):
+        """Time from the start of the run to its first window change, None if it changed nothing"""
+        return self.first_move_at - self._start if self.first_move_at is not None else None
+
+    def hotkey_to_first_move(self):
+        """Time from the hotkey press to the first window change, None if either is missing"""
+        if self.first_move_at is None or self.requested_at is None:
+            return None
+        return self.first_move_at - self.requested_at
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+
+    def process_cache_hit_rate(self):
+        """Fraction of process lookups served from the process cache, None if there were none"""
+        hits = self.counters.get('process_cache_hits', 0)
+        lookups = hits + self.counters.get('process_cache_misses', 0)
+        return hits / lookups if lookups else None
+
+    def to_dict(self):
+        return {'time': self.started, 'kind': self.kind, 'seconds': self.seconds,
+                'phases': self.phases, 'counters': self.counters, 'rule_hits': self.rule_hits,
+                'moves': len(self.move_latencies),
+                'max_move_seconds': max(self.move_latencies, default=None),
+                'first_move_seconds': self.first_move_seconds(),
+                'hotkey_to_first_move_seconds': self.hotkey_to_first_move(),
+                'process_cache_hit_rate': self.process_cache_hit_rate()}
+
+    def summary(self):
+        """One-line phase breakdown for the log"""
+        phases = ', '.join(f"{name} {self.phases[name] * 1000:.1f} ms" for name in PHASES if name in self.phases)
+        counters = ', '.join(f"{name} {value}" for name, value in sorted(self.counters.items()))
+        hit_rate = self.process_cache_hit_rate()
+        if hit_rate is not None:
+            counters += f"; process cache hit rate {hit_rate:.0%}"
+        latency = self.hotkey_to_first_move()
+        if latency is not None:
+            counters += f"; hotkey to first move {latency * 1000:.1f} ms"
+        if self.rule_hits:
+            counters += "; rule hits " + ', '.join(
+                f"{label} {hits}" for label, hits in sorted(self.rule_hits.items(), key=lambda item: -item[1]))
+        return f"{self.kind} run {self.seconds * 1000:.1f} ms ({phases}); {counters}"
+
+
+class MetricsRegistry:
+    """Totals across runs, with JSON-lines and Prometheus text export"""
+
+    def __init__(self, export_file=None):
+        self.export_file = export_file  # Append one JSON line per run if set
+        self.runs = {}
+        self.phase_seconds = {}
+        self.counters = {}
+        self.rule_hits = {}
+        self.run_latency = Histogram()
+        self.move_latency = Histogram()
+        self.first_move_latency = Histogram()  # Hotkey press to first window move, hotkey-triggered runs only
+        self.last_run = None
+        self._lock = threading.Lock()
+
+    def record(self, run):
+        """Add a finished run to the totals and export it"""
+        with self._lock:
+            self.runs[run.kind] = self.runs.get(run.kind, 0) + 1
+            for name, seconds in run.phases.items():
+                self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+            for name, value in run.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for label, hits in run.rule_hits.items():
+                self.rule_hits[label] = self.rule_hits.get(label, 0) + hits
+            self.run_latency.observe(run.seconds)
+            for seconds in run.move_latencies:
+                self.move_latency.observe(seconds)
+            latency = run.hotkey_to_first_move()
+            if latency is not None:
+                self.first_move_latency.observe(latency)
+            self.last_run = run
+        if self.export_file:
+            try:
+                with open(self.export_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(run.to_dict(), separators=(',', ':')) + '\n')
+            except OSError as e:
+                logger.warning(f"Failed to write metrics to {self.export_file}: {e}")
+
+    def snapshot(self):
+        """Totals as a dict"""
+        with self._lock:
+            return {'runs': dict(self.runs), 'phase_seconds': dict(self.phase_seconds),
+                    'counters': dict(self.counters), 'rule_hits': dict(self.rule_hits),
+                    'run_seconds': self.run_latency.to_dict(),
+                    'window_move_seconds': self.move_latency.to_dict(),
+                    'hotkey_to_first_move_seconds': self.first_move_latency.to_dict(),
+                    'last_run': self.last_run.to_dict() if self.last_run is not None else None}
+
+    def prometheus_text(self):
+        """Totals in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines.append("# TYPE window_arranger_runs_total counter")
+            for kind, value in sorted(self.runs.items()):
+                lines.append(f'window_arranger_runs_total{{kind="{kind}"}} {value}')
+            lines.append("# TYPE window_arranger_phase_seconds_total counter")
+            for name, value in sorted(self.phase_seconds.items()):
+                lines.append(f'window_arranger_phase_seconds_total{{phase="{name}"}} {value:.6f}')
+            lines.append("# TYPE window_arranger_windows_total counter")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'window_arranger_windows_total{{outcome="{name}"}} {value}')
+            lines.append("# TYPE window_arranger_rule_hits_total counter")
+            for label, value in sorted(self.rule_hits.items()):
+                label = label.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                lines.append(f'window_arranger_rule_hits_total{{rule="{label}"}} {value}')
+            for metric, histogram in (('window_arranger_run_seconds', self.run_latency),
+                                      ('window_arranger_window_move_seconds', self.move_latency),
+                                      ('window_arranger_hotkey_to_first_move_seconds', self.first_move_latency)):
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum {histogram.sum:.6f}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serve /metrics (Prometheus text) and /metrics.json on localhost"""
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        # http.server pulls in the email and http.client packages: only import it when the server is enabled
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = registry.prometheus_text(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(registry.snapshot()), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics request: {format % args}")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+        host, port = self.server.server_address[:2]
+        logger.info(f"Metrics available at http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
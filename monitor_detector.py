@@ -4,7 +4,8 @@
 import win32api
 import win32con
 import win32gui
-from ctypes import windll
+from window_backend import enum_display_monitors
+from monitor_topology import MonitorTopology
 
 def get_monitor_info():
     """Get detailed monitor information"""
@@ -39,6 +40,13 @@ def get_monitor_info():
         
         win32gui.EnumDisplayMonitors(None, None, enum_monitor_proc, 0)
         
+        # Show the monitor numbers used by monitor_1_apps / monitor_2_apps (numbered left to right)
+        topology = MonitorTopology(enum_display_monitors())
+        print("Window Arranger monitor numbers:")
+        for monitor in topology.monitors:
+            print(f"  Monitor {monitor.number}: {monitor.device} {monitor.rect.as_tuple()}{' (primary)' if monitor.primary else ''}")
+        print()
+        
         return {
             'primary': (primary_width, primary_height),
             'virtual': (virtual_left, virtual_top, virtual_width, virtual_height),
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+from bisect import bisect_right
+
+logger = logging.getLogger(__name__)
+
+
+class Monitor:
+    """One display in the monitor topology"""
+    __slots__ = ('number', 'device', 'rect', 'work', 'primary')
+
+    def __init__(self, number, device, rect, work, primary):
+        self.number = number  # 1-based, numbered left to right (then top to bottom)
+        self.device = device
+        self.rect = rect  # Full monitor area
+        self.work = work  # Work area (monitor area minus taskbar)
+        self.primary = primary
+
+    def __repr__(self):
+        return f"Monitor({self.number}, {self.device!r}, {self.rect!r}, primary={self.primary})"
+
+
+class MonitorTopology:
+    """Snapshot of the monitor layout with a spatial index for point/rect lookups
+
+    Monitors are numbered 1..n from left to right, which matches the
+    configuration convention "monitor 1 = left, monitor 2 = right/primary"
+    on the usual two-monitor setup and extends to any number of monitors.
+
+    The virtual screen is split into vertical slabs at every monitor left and
+    right edge; each slab keeps its monitors sorted by top edge, so a point
+    lookup is two binary searches.
+    """
+
+    def __init__(self, monitors):
+        ordered = sorted(monitors, key=lambda m: (m['monitor'].left, m['monitor'].top))
+        self.monitors = [Monitor(i + 1, m['device'], m['monitor'], m['work'], m['primary'])
+                         for i, m in enumerate(ordered)]
+        self.primary = next((m for m in self.monitors if m.primary),
+                            self.monitors[0] if self.monitors else None)
+
+        edges = sorted({m.rect.left for m in self.monitors} | {m.rect.right for m in self.monitors})
+        self._edges = edges
+        self._slabs = []
+        for left, right in zip(edges, edges[1:]):
+            column = sorted((m for m in self.monitors if m.rect.left <= left and m.rect.right >= right),
+                            key=lambda m: m.rect.top)
+            self._slabs.append(([m.rect.top for m in column], column))
+
+    @classmethod
+    def from_backend(cls, backend):
+        """Build topology from the backend's EnumDisplayMonitors/GetMonitorInfo data"""
+        topology = cls(backend.get_monitors())
+        logger.info(f"Monitor topology: {len(topology.monitors)} monitors")
+        for monitor in topology.monitors:
+            logger.debug(f"  {monitor}")
+        return topology
+
+    def signature(self):
+        """Hashable description of the layout, used to key cached geometry"""
+        return tuple((m.rect.as_tuple(), m.work.as_tuple(), m.primary) for m in self.monitors)
+
+    def get(self, number):
+        """Return monitor by number, or None"""
+        if 1 <= number <= len(self.monitors):
+            return self.monitors[number - 1]
+        return None
+
+    def resolve(self, number):
+        """Return monitor by number, falling back to the primary monitor if it does not exist"""
+        monitor = self.get(number)
+        if monitor is None:
+            logger.debug(f"Monitor {number} not present, using primary monitor")
+            return self.primary
+        return monitor
+
+    def monitor_at(self, x, y):
+        """Return the monitor containing point (x, y), or None (O(log n))"""
+        i = bisect_right(self._edges, x) - 1
+        if i < 0 or i >= len(self._slabs):
+            return None
+        tops, column = self._slabs[i]
+        j = bisect_right(tops, y) - 1
+        if j >= 0 and y < column[j].rect.bottom:
+            return column[j]
+        return None
+
+    def monitor_for_rect(self, rect):
+        """Return the monitor a rect belongs to (containing its centre, else the nearest one)"""
+        cx = (rect.left + rect.right) // 2
+        cy = (rect.top + rect.bottom) // 2
+        monitor = self.monitor_at(cx, cy)
+        if monitor is not None or not self.monitors:
+            return monitor
+
+        # Centre is off-screen: pick the monitor with the largest overlap, then the closest one
+        def overlap(m):
+            w = min(rect.right, m.rect.right) - max(rect.left, m.rect.left)
+            h = min(rect.bottom, m.rect.bottom) - max(rect.top, m.rect.top)
+            return max(w, 0) * max(h, 0)
+
+        def distance(m):
+            dx = max(m.rect.left - cx, 0, cx - m.rect.right + 1)
+            dy = max(m.rect.top - cy, 0, cy - m.rect.bottom + 1)
+            return dx * dx + dy * dy
+
+        return min(self.monitors, key=lambda m: (-overlap(m), distance(m)))
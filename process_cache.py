@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESS_CACHE_SIZE = 256
+
+
+class ProcessEntry:
+    """Cached executable name of one process and the windows it has been seen owning"""
+    __slots__ = ('image', 'windows')
+
+    def __init__(self, image, hwnd):
+        self.image = image  # '' if the image name could not be read
+        self.windows = {hwnd}
+
+
+class ProcessCache:
+    """hwnd -> PID -> executable name, without opening a process per window per run
+
+    The PID of a window is a cheap in-process query and is read on every
+    lookup; the image name needs the process opened and is cached per PID.
+    A PID is only reused after its process has exited, and a process's
+    windows are destroyed with it, so a cached entry is trusted only while
+    a window it was seen owning still reports that PID. Otherwise the PID
+    is assumed to belong to a new process and the name is read again.
+    Entries whose windows are all gone are dropped by prune(), the least
+    recently used beyond max_size on insert.
+    """
+
+    def __init__(self, backend, max_size=DEFAULT_PROCESS_CACHE_SIZE):
+        self.backend = backend
+        self.max_size = max_size  # 0 disables caching
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0  # Entries dropped because their PID now belongs to another process
+        self.evictions = 0
+        self.failures = 0  # Image names that could not be read
+        self._entries = OrderedDict()  # pid -> ProcessEntry, least recently used first
+        self._lock = threading.Lock()
+
+    def lookup(self, hwnd):
+        """Return (pid, executable name, True if served from the cache) for a window
+
+        Raises OSError if the window no longer exists.
+        """
+        pid = self.backend.get_window_pid(hwnd)
+        if not pid:
+            raise OSError(f"Window {hwnd:#x} no longer exists")
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry is not None:
+                if hwnd in entry.windows or self._alive(pid, entry):
+                    entry.windows.add(hwnd)
+                    self._entries.move_to_end(pid)
+                    self.hits += 1
+                    return pid, entry.image, True
+                del self._entries[pid]
+                self.reused += 1
+                logger.debug(f"Process {pid} was replaced, looking up its image name again")
+            self.misses += 1
+        try:
+            image = self.backend.get_process_image(pid)
+        except Exception as e:
+            logger.debug(f"Cannot read image name of process {pid}: {e}")
+            self.failures += 1
+            image = ''
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[pid] = ProcessEntry(image, hwnd)
+                self._entries.move_to_end(pid)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return pid, image, False
+
+    def _alive(self, pid, entry):
+        """True if a window the entry was seen owning still belongs to pid (forgets windows that do not)"""
+        for hwnd in list(entry.windows):
+            try:
+                if self.backend.get_window_pid(hwnd) == pid:
+                    return True
+            except Exception:
+                pass
+            entry.windows.discard(hwnd)
+        return False
+
+    def prune(self, hwnds):
+        """Forget windows not in hwnds (the current window table) and processes left without windows"""
+        with self._lock:
+            for pid in list(self._entries):
+                entry = self._entries[pid]
+                entry.windows = {hwnd for hwnd in entry.windows if hwnd in hwnds}
+                if not entry.windows:
+                    del self._entries[pid]
+                    self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None, 'reused_pids': self.reused,
+                'evictions': self.evictions, 'failures': self.failures}
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import heapq
+import fnmatch
+import logging
+from collections import deque, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Rule types:
+#   substring - pattern appears in the window title or class name (case-insensitive)
+#   glob      - shell-style pattern matched against the whole title (case-insensitive)
+#   regex     - regular expression searched in the title (case-insensitive)
+#   class     - exact window class name (case-insensitive)
+#   process   - exact executable name, ".exe" optional (case-insensitive)
+#   title     - exact window title (case-insensitive)
+#   pid       - id of the owning process
+RULE_TYPES = ('substring', 'glob', 'regex', 'class', 'process', 'title', 'pid')
+
+# Default monitor for windows no rule matches, unless a "*" entry says otherwise
+DEFAULT_MONITOR = 2
+
+# Number of (title, class, process, pid) classifications remembered
+DEFAULT_CACHE_SIZE = 1024
+
+# A regex that is one literal run (escaped punctuation allowed), once anchors and \\b are removed
+LITERAL_REGEX = re.compile(r"(?:[^\\.^$*+?()\[\]{}|]|\\[^A-Za-z0-9])+")
+
+
+class Rule:
+    """One compiled classification rule"""
+    __slots__ = ('index', 'type', 'pattern', 'monitor', 'priority', 'hits', 'regex')
+
+    def __init__(self, index, rule_type, pattern, monitor, priority=0):
+        self.index = index  # Position in config order, breaks priority ties
+        self.type = rule_type
+        self.pattern = pattern
+        self.monitor = monitor
+        self.priority = priority
+        self.hits = 0
+        self.regex = None
+
+    def rank(self):
+        """Sort key: higher priority first, then earlier rules first"""
+        return (-self.priority, self.index)
+
+    def label(self):
+        """Short name for metrics, e.g. glob:*Chrome*"""
+        return f"{self.type}:{self.pattern}"
+
+    def __repr__(self):
+        return f"Rule({self.type}:{self.pattern!r} -> monitor {self.monitor}, priority {self.priority})"
+
+
+def normalize_process_name(name):
+    """Lowercase executable name without the .exe suffix"""
+    name = name.lower()
+    return name[:-4] if name.endswith('.exe') else name
+
+
+def parse_app_entry(entry):
+    """Split a monitor_N_apps entry like "process:opera.exe" into (type, pattern)
+
+    Entries without a known type prefix are substring patterns, as before.
+    """
+    prefix, sep, rest = entry.partition(':')
+    if sep:
+        prefix = prefix.strip().lower()
+        if prefix == 're':
+            prefix = 'regex'
+        if prefix in RULE_TYPES:
+            return prefix, rest
+    return 'substring', entry
+
+
+def required_literal(rule):
+    """Return a lowercase ASCII string every title matching a glob/regex rule contains, or None
+
+    Only simple patterns are analysed: globs without [...] sets and regexes
+    that are one literal run apart from ^/$ anchors and \\b. The literal is
+    ASCII so that case-insensitive matching cannot reach it through Unicode
+    case folding (the Kelvin sign matches "k").
+    """
+    pattern = rule.pattern
+    if rule.type == 'glob':
+        if '[' in pattern:
+            return None
+        literal = max(re.split(r'[*?]', pattern), key=len)
+    elif rule.type == 'regex':
+        if pattern.startswith('^'):
+            pattern = pattern[1:]
+        elif pattern.startswith('\\A'):
+            pattern = pattern[2:]
+        if pattern.endswith('\\Z') or (pattern.endswith('$') and not pattern.endswith('\\$')):
+            pattern = pattern[:-2] if pattern.endswith('\\Z') else pattern[:-1]
+        pattern = pattern.replace('\\b', '')
+        if not LITERAL_REGEX.fullmatch(pattern):
+            return None
+        literal = re.sub(r'\\(.)', r'\1', pattern)
+    else:
+        return None
+    return literal.lower() if literal and literal.isascii() else None
+
+
+class AhoCorasick:
+    """Multi-pattern substring automaton
+
+    Every node keeps the best-ranked rule among all patterns ending there
+    (including those reached through failure links), so a scan costs
+    O(len(text)) no matter how many patterns are loaded. Literals are
+    prefilter strings of glob/regex rules: scan() also returns every rule
+    whose literal occurs in the text.
+    """
+
+    def __init__(self, patterns, literals=()):
+        # patterns, literals: lists of (lowercase string, Rule)
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+        self.found = [()]
+        for pattern, rule in patterns:
+            node = self._insert(pattern)
+            if self.best[node] is None or rule.rank() < self.best[node].rank():
+                self.best[node] = rule
+        for literal, rule in literals:
+            node = self._insert(literal)
+            self.found[node] += (rule,)
+
+        # Breadth-first pass to set failure links and inherit outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                inherited = self.best[self.fail[nxt]]
+                if inherited is not None and (self.best[nxt] is None or inherited.rank() < self.best[nxt].rank()):
+                    self.best[nxt] = inherited
+                self.found[nxt] += self.found[self.fail[nxt]]
+
+    def _insert(self, pattern):
+        """Add the trie path of pattern, return its end node"""
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+                self.found.append(())
+            node = nxt
+        return node
+
+    def search(self, text):
+        """Return the best-ranked rule whose pattern occurs in text, or None"""
+        goto = self.goto
+        fail = self.fail
+        best_at = self.best
+        best = None
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found = best_at[node]
+            if found is not None and (best is None or found.rank() < best.rank()):
+                best = found
+        return best
+
+    def scan(self, text):
+        """Return (search(text), set of rules whose literal occurs in text)"""
+        goto = self.goto
+        fail = self.fail
+        best_at = self.best
+        found_at = self.found
+        best = None
+        candidates = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found = best_at[node]
+            if found is not None and (best is None or found.rank() < best.rank()):
+                best = found
+            if found_at[node]:
+                candidates.update(found_at[node])
+        return best, candidates
+
+
+class RuleEngine:
+    """Window classification rules compiled once at config load
+
+    Substring rules share one Aho-Corasick automaton, exact title/class/process
+    rules are dict lookups, and glob/regex rules are only evaluated while they
+    can still beat the best match found so far. Glob/regex rules with a
+    required literal are prefiltered by the same automaton, so only those
+    whose literal is in the title (plus the few without one) are tried.
+    Results are memoized per (title, class, process) with LRU eviction.
+    """
+
+    def __init__(self, rules, default_monitor=DEFAULT_MONITOR, cache_size=DEFAULT_CACHE_SIZE):
+        self.rules = rules
+        self.default_monitor = default_monitor
+        self.default_hits = 0
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache = OrderedDict()
+
+        self._exact = {'title': {}, 'class': {}, 'process': {}, 'pid': {}}
+        self._patterns = []  # glob/regex rules in rank order
+        self._unfiltered = []  # glob/regex rules without a prefilter literal, always tried
+        literals = []
+        for rule in rules:
+            if rule.type in self._exact:
+                key = normalize_process_name(rule.pattern) if rule.type == 'process' else \
+                    int(rule.pattern) if rule.type == 'pid' else rule.pattern.lower()
+                current = self._exact[rule.type].get(key)
+                if current is None or rule.rank() < current.rank():
+                    self._exact[rule.type][key] = rule
+            elif rule.type in ('glob', 'regex'):
+                self._patterns.append(rule)
+                literal = required_literal(rule)
+                if literal is not None:
+                    literals.append((literal, rule))
+                else:
+                    self._unfiltered.append(rule)
+        self._patterns.sort(key=Rule.rank)
+        self._unfiltered.sort(key=Rule.rank)
+        self._prefiltered = bool(literals)
+        self._automaton = AhoCorasick([(r.pattern.lower(), r) for r in rules
+                                       if r.type == 'substring' and r.pattern], literals)
+        self.uses_process = bool(self._exact['process'])
+        self.uses_pid = bool(self._exact['pid'])
+
+    @classmethod
+    def from_config(cls, config):
+        """Compile rules from "rules" and every "monitor_N_apps" list in config"""
+        entries = []
+        for entry in config.get("rules", []):
+            if not isinstance(entry, dict):
+                logger.error(f"Invalid rule {entry!r}: expected an object")
+                continue
+            entries.append((entry.get("type", "substring"), entry.get("pattern", ""),
+                            entry.get("monitor"), entry.get("priority", 0)))
+
+        default_monitor = None
+        app_lists = sorted((int(key[8:-5]), key) for key in config
+                           if re.fullmatch(r"monitor_\d+_apps", key))
+        for monitor, key in app_lists:
+            for app in config.get(key) or []:
+                if app == "*":
+                    # "*" means all other applications
+                    if default_monitor is None:
+                        default_monitor = monitor
+                    continue
+                rule_type, pattern = parse_app_entry(app)
+                entries.append((rule_type, pattern, monitor, 0))
+
+        rules = []
+        for rule_type, pattern, monitor, priority in entries:
+            rule = cls.compile_rule(len(rules), rule_type, pattern, monitor, priority)
+            if rule is not None:
+                rules.append(rule)
+
+        engine = cls(rules, default_monitor if default_monitor is not None else DEFAULT_MONITOR,
+                     config.get("classification_cache_size", DEFAULT_CACHE_SIZE))
+        logger.info(f"Compiled {len(rules)} window rules (default monitor {engine.default_monitor})")
+        return engine
+
+    @staticmethod
+    def compile_rule(index, rule_type, pattern, monitor, priority=0):
+        """Validate and compile one rule, return None (and log) if it is invalid"""
+        if rule_type not in RULE_TYPES:
+            logger.error(f"Unknown rule type '{rule_type}' for pattern '{pattern}', rule ignored")
+            return None
+        if rule_type == 'pid':
+            if isinstance(pattern, int) and not isinstance(pattern, bool):
+                pattern = str(pattern)
+            if not isinstance(pattern, str) or not pattern.strip().isdigit():
+                logger.error(f"Invalid process id {pattern!r} for pid rule, rule ignored")
+                return None
+            pattern = pattern.strip()
+        if not isinstance(pattern, str) or not pattern:
+            logger.error(f"Empty pattern for {rule_type} rule, rule ignored")
+            return None
+        if not isinstance(monitor, int) or isinstance(monitor, bool) or monitor < 1:
+            logger.error(f"Invalid monitor {monitor!r} for {rule_type} rule '{pattern}', rule ignored")
+            return None
+        if not isinstance(priority, (int, float)) or isinstance(priority, bool):
+            logger.error(f"Invalid priority {priority!r} for {rule_type} rule '{pattern}', rule ignored")
+            return None
+        rule = Rule(index, rule_type, pattern, monitor, priority)
+        try:
+            if rule_type == 'glob':
+                rule.regex = re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+            elif rule_type == 'regex':
+                rule.regex = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            logger.error(f"Invalid {rule_type} pattern '{pattern}': {e}, rule ignored")
+            return None
+        return rule
+
+    def match(self, title, class_name, process_name=None, pid=None):
+        """Return the winning Rule for a window, or None if no rule matches"""
+        # Title and class are scanned in one pass; patterns never contain the separator
+        text = f"{title.lower()}\0{class_name.lower()}"
+        patterns = self._patterns
+        if self._prefiltered and title.isascii():
+            # Glob/regex rules whose literal is missing from the title cannot match
+            best, candidates = self._automaton.scan(text)
+            patterns = heapq.merge(sorted(candidates, key=Rule.rank), self._unfiltered, key=Rule.rank)
+        else:
+            best = self._automaton.search(text)
+
+        for rule_type, key in (('title', title.lower()), ('class', class_name.lower()),
+                               ('process', normalize_process_name(process_name) if process_name else None),
+                               ('pid', pid)):
+            if key is None:
+                continue
+            rule = self._exact[rule_type].get(key)
+            if rule is not None and (best is None or rule.rank() < best.rank()):
+                best = rule
+
+        for rule in patterns:
+            if best is not None and rule.rank() > best.rank():
+                break  # Remaining rules rank lower
+            if (rule.regex.match(title) if rule.type == 'glob' else rule.regex.search(title)):
+                best = rule
+                break
+        return best
+
+    def classify(self, title, class_name, process_name=None, pid=None):
+        """Return (target monitor, matching Rule or None) and count the hit"""
+        key = (title, class_name, process_name, pid)
+        cache = self._cache
+        if key in cache:
+            cache.move_to_end(key)
+            rule = cache[key]
+            self.cache_hits += 1
+        else:
+            rule = self.match(title, class_name, process_name, pid)
+            self.cache_misses += 1
+            if self.cache_size > 0:
+                cache[key] = rule
+                if len(cache) > self.cache_size:
+                    cache.popitem(last=False)
+        if rule is None:
+            self.default_hits += 1
+            return self.default_monitor, None
+        rule.hits += 1
+        return rule.monitor, rule
+
+    def stats(self):
+        """Per-rule hit counts"""
+        stats = [{'type': r.type, 'pattern': r.pattern, 'monitor': r.monitor,
+                  'priority': r.priority, 'hits': r.hits} for r in self.rules]
+        stats.append({'type': 'default', 'pattern': '*', 'monitor': self.default_monitor,
+                      'priority': None, 'hits': self.default_hits})
+        return stats
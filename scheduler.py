@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import heapq
+import itertools
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledCall:
+    """Handle for a callback queued on the Scheduler"""
+    __slots__ = ('when', 'seq', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, seq, callback, args):
+        self.when = when
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __lt__(self, other):
+        return (self.when, self.seq) < (other.when, other.seq)
+
+
+class Scheduler:
+    """Main-loop timer heap with thread-safe wakeups
+
+    The loop sleeps until the next timer is due or until another thread
+    queues work with call_soon()/call_later() or calls wake(), so an idle
+    process does not wake up at all and exit requests take effect at once.
+    Callbacks run on the thread that called run().
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self.wakeups = 0  # Times the loop woke up, for idle-cost checks
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) after delay seconds; safe to call from any thread"""
+        call = ScheduledCall(time.monotonic() + delay, next(self._counter), callback, args)
+        with self._condition:
+            heapq.heappush(self._heap, call)
+            self._condition.notify()
+        return call
+
+    def call_soon(self, callback, *args):
+        """Run callback(*args) on the scheduler thread as soon as possible"""
+        return self.call_later(0, callback, *args)
+
+    def wake(self):
+        """Wake the loop so it re-checks its stop event"""
+        with self._condition:
+            self._condition.notify()
+
+    def pending(self):
+        """Number of queued calls that are not cancelled"""
+        with self._condition:
+            return sum(1 for call in self._heap if not call.cancelled)
+
+    def run(self, stop_event):
+        """Run due callbacks until stop_event is set (call wake() after setting it)"""
+        while not stop_event.is_set():
+            call = None
+            with self._condition:
+                while call is None and not stop_event.is_set():
+                    while self._heap and self._heap[0].cancelled:
+                        heapq.heappop(self._heap)
+                    now = time.monotonic()
+                    if self._heap and self._heap[0].when <= now:
+                        call = heapq.heappop(self._heap)
+                    else:
+                        timeout = self._heap[0].when - now if self._heap else None
+                        self._condition.wait(timeout)
+                        self.wakeups += 1
+            if call is not None:
+                try:
+                    call.callback(*call.args)
+                except Exception as e:
+                    logger.error(f"Scheduled task {getattr(call.callback, '__name__', call.callback)} failed: {e}")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# What each session event invalidates:
+#   hotkeys  - the keyboard hook (low-level hooks are dropped across session switches)
+#   topology - the monitor model (a Remote Desktop client brings its own monitors)
+#   windows  - remembered window positions and the live window table
+# Disconnect, lock and logoff invalidate nothing by themselves: the matching
+# connect or unlock rebuilds what is needed once the session is usable again.
+SESSION_REBUILDS = {
+    'console-connect': ('hotkeys', 'topology', 'windows'),
+    'remote-connect': ('hotkeys', 'topology', 'windows'),
+    'console-disconnect': (),
+    'remote-disconnect': (),
+    'logon': ('hotkeys',),
+    'logoff': (),
+    'lock': (),
+    'unlock': ('hotkeys',),
+    'remote-control': ('hotkeys',),
+}
+
+
+class SessionState:
+    """Connection and lock state of the session the arranger runs in
+
+    Each session runs its own arranger process and only receives the
+    notifications of its own session, so this tracks one session.
+    """
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        self.connection = None  # 'console' or 'remote' once a connect event has been seen
+        self.connected = True
+        self.locked = False
+        self.events = {}  # event name -> count
+        self.last_event = None
+        self.changed_at = None
+
+    @property
+    def active(self):
+        """True while the session is connected and unlocked, i.e. hotkeys can reach it"""
+        return self.connected and not self.locked
+
+    def apply(self, event, session_id=None):
+        """Update the state from a session event, return the set of state to rebuild"""
+        if event not in SESSION_REBUILDS:
+            logger.debug(f"Unknown session event '{event}' ignored")
+            return set()
+        if session_id is not None:
+            self.session_id = session_id
+        self.events[event] = self.events.get(event, 0) + 1
+        self.last_event = event
+        self.changed_at = time.time()
+        if event.endswith('-connect'):
+            self.connected = True
+            self.connection = event.split('-')[0]
+        elif event.endswith('-disconnect'):
+            self.connected = False
+        elif event == 'lock':
+            self.locked = True
+        elif event in ('unlock', 'logon'):
+            self.locked = False
+        return set(SESSION_REBUILDS[event])
+
+    def describe(self):
+        state = 'active' if self.active else 'locked' if self.locked else 'disconnected'
+        connection = f", {self.connection}" if self.connection else ''
+        return f"session {self.session_id if self.session_id is not None else '?'} {state}{connection}"
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import time
+import logging
+from collections import deque
+
+from window_backend import Rect, SW_SHOWMINIMIZED, SW_SHOWMAXIMIZED
+from rule_engine import normalize_process_name
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+_DIGITS = re.compile(r'\d+')
+
+
+def title_pattern(title):
+    """Title with case, spacing and numbers normalized, e.g. "Document 12 - Notepad" -> "document # - notepad"
+
+    Used to recognize a window whose title changed slightly (document
+    counters, unread counts, ...) since the snapshot was taken.
+    """
+    return _DIGITS.sub('#', ' '.join(title.lower().split()))
+
+
+class SnapshotEntry:
+    """Saved placement of one window"""
+    __slots__ = ('process', 'class_name', 'title', 'rect', 'show_state')
+
+    def __init__(self, process, class_name, title, rect, show_state):
+        self.process = process  # Normalized executable name ('' if unknown)
+        self.class_name = class_name
+        self.title = title
+        self.rect = rect
+        self.show_state = show_state
+
+    def __repr__(self):
+        return f"SnapshotEntry({self.process!r}, {self.class_name!r}, {self.title!r}, {self.rect!r})"
+
+
+class Snapshot:
+    """Positions, sizes and show states of all windows at one point in time
+
+    Stored as JSON lines: a header object followed by one compact array per
+    window, [process, class, title, left, top, right, bottom, show_state].
+    The rect is the normal (restored) placement, so a maximized window gets
+    its own size back when it is un-maximized after a restore.
+    Windows are matched back by identity (process, class, title) through
+    hash indexes, falling back to the normalized title pattern and then to
+    process + class alone, so a restore is linear in the number of windows.
+    """
+
+    def __init__(self, entries, monitors=None, created=None):
+        self.entries = entries
+        self.monitors = monitors  # Topology signature when the snapshot was taken
+        self.created = created if created is not None else time.time()
+
+    @classmethod
+    def capture(cls, windows, process_name, show_state, normal_rect, monitors=None):
+        """Build a snapshot from WindowRecords (minimized windows are skipped)
+
+        normal_rect(window_info) gives the restored rect of a maximized window.
+        """
+        entries = []
+        for window_info in windows:
+            state = show_state(window_info)
+            if state == SW_SHOWMINIMIZED:
+                continue  # Minimized windows have no meaningful position
+            rect = normal_rect(window_info) if state == SW_SHOWMAXIMIZED else window_info.rect
+            entries.append(SnapshotEntry(normalize_process_name(process_name(window_info) or ''),
+                                         window_info.class_name, window_info.title, rect, state))
+        return cls(entries, monitors)
+
+    def save(self, path):
+        """Write the snapshot to path atomically"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            header = {'version': SNAPSHOT_VERSION, 'created': self.created, 'monitors': self.monitors}
+            f.write(json.dumps(header, separators=(',', ':')) + '\n')
+            for e in self.entries:
+                f.write(json.dumps([e.process, e.class_name, e.title, e.rect.left, e.rect.top,
+                                    e.rect.right, e.rect.bottom, e.show_state],
+                                   ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot written by save()"""
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported snapshot version {header.get('version')!r}")
+            entries = []
+            for line in f:
+                if line.strip():
+                    process, class_name, title, left, top, right, bottom, show_state = json.loads(line)
+                    entries.append(SnapshotEntry(process, class_name, title,
+                                                 Rect(left, top, right, bottom), show_state))
+        return cls(entries, header.get('monitors'), header.get('created'))
+
+    def same_monitors(self, signature):
+        """True if the snapshot was taken with the monitor topology signature given (or has none)"""
+        return self.monitors is None or self.monitors == json.loads(json.dumps(signature))
+
+    def match(self, windows, process_name):
+        """Pair current windows with saved entries, return a list of (window_info, SnapshotEntry)
+
+        Each entry is used at most once. All windows are matched on the exact
+        identity first, so a looser match never takes an entry that another
+        window matches exactly.
+        """
+        key_functions = (
+            lambda process, class_name, title: (process, class_name, title),
+            lambda process, class_name, title: (process, class_name, title_pattern(title)),
+            lambda process, class_name, title: (process, class_name),
+        )
+        identities = [(normalize_process_name(process_name(w) or ''), w.class_name, w.title)
+                      for w in windows]
+        used = [False] * len(self.entries)
+        matched = [None] * len(windows)
+        for key_function in key_functions:
+            index = {}
+            for position, e in enumerate(self.entries):
+                if not used[position]:
+                    index.setdefault(key_function(e.process, e.class_name, e.title), deque()).append(position)
+            for i, identity in enumerate(identities):
+                if matched[i] is not None:
+                    continue
+                candidates = index.get(key_function(*identity))
+                if candidates:
+                    position = candidates.popleft()
+                    used[position] = True
+                    matched[i] = self.entries[position]
+        return [(window, entry) for window, entry in zip(windows, matched) if entry is not None]
@@ -0,0 +1,72 @@
+import pytest
+
+from layouts import LayoutProfile, compute_cells, split
+from monitor_topology import MonitorTopology
+from window_backend import Rect, SimulatedBackend
+
+
+@pytest.fixture
+def topology():
+    # Monitor 1 at x -1920..0, monitor 2 (primary) at 0..1920, both with a 40 px taskbar
+    return MonitorTopology.from_backend(SimulatedBackend())
+
+
+def make_layout(monitors, slots=(), unmatched='keep'):
+    layout = LayoutProfile.from_config('test', {'monitors': monitors, 'slots': list(slots),
+                                                'unmatched': unmatched}, 0)
+    assert layout is not None and layout.dropped == 0
+    return layout
+
+
+def test_split_spans_are_gap_apart_and_fill_the_length():
+    assert split(0, 1920, [1, 1], 10) == [(0, 955), (965, 1920)]
+    assert split(100, 1000, [1, 3], 0) == [(100, 350), (350, 1100)]
+
+
+def test_columns_with_weights_gap_and_margin(topology):
+    layout = make_layout({'2': {'type': 'columns', 'weights': [2, 1], 'gap': 20, 'margin': 10}})
+    assert layout.cells(topology, 2) == [Rect(10, 10, 1263, 1030), Rect(1283, 10, 1910, 1030)]
+
+
+def test_grid_cells_are_row_major_on_a_negative_origin_monitor(topology):
+    layout = make_layout({'1': {'type': 'grid', 'rows': 2, 'columns': 2}})
+    assert layout.cells(topology, 1) == [Rect(-1920, 0, -960, 520), Rect(-960, 0, 0, 520),
+                                         Rect(-1920, 520, -960, 1040), Rect(-960, 520, 0, 1040)]
+
+
+def test_rows_cells(topology):
+    layout = make_layout({'2': {'type': 'rows', 'count': 3}})
+    cells = layout.cells(topology, 2)
+    assert [(c.top, c.bottom) for c in cells] == [(0, 346), (346, 693), (693, 1040)]
+    assert all((c.left, c.right) == (0, 1920) for c in cells)
+
+
+@pytest.mark.parametrize('count,shape', [(1, (1, 1)), (2, (1, 2)), (3, (2, 2)), (5, (2, 3)), (9, (3, 3))])
+def test_tiles_grid_grows_with_the_window_count(count, shape):
+    cells = compute_cells({'type': 'tiles'}, Rect(0, 0, 1200, 600), count)
+    rows, columns = shape
+    assert len(cells) == rows * columns
+    assert len({c.left for c in cells}) == columns and len({c.top for c in cells}) == rows
+
+
+def test_cells_are_cached_per_topology(topology):
+    layout = make_layout({'2': {'type': 'columns', 'count': 2}})
+    layout.precompute(topology)
+    assert layout.cells(topology, 2) is layout.cells(topology, 2)
+    assert (layout.geometry_misses, layout.geometry_hits) == (1, 2)
+
+
+def test_plan_puts_windows_in_their_slots_and_fills_the_rest(topology):
+    backend = SimulatedBackend()
+    backend.add_window('Inbox - Outlook', 'rctrl_renwnd32', Rect(0, 0, 800, 600))
+    backend.add_window('Google Chrome', 'Chrome_WidgetWin_1', Rect(0, 0, 800, 600))
+    backend.add_window('Notes - Notepad', 'Notepad', Rect(0, 0, 800, 600))
+    backend.add_window('Calculator', 'ApplicationFrameWindow', Rect(0, 0, 300, 400))
+    layout = make_layout({'2': {'type': 'columns', 'count': 3}},
+                         [{'pattern': 'Outlook', 'monitor': 2, 'slot': 3},
+                          {'pattern': 'Chrome', 'monitor': 2},
+                          {'pattern': 'Notepad', 'monitor': 2}])
+    cells = layout.cells(topology, 2)
+    placements = {window.title: cell for window, monitor, cell in layout.plan(backend.list_windows(), topology)}
+    # Outlook takes its slot, the others fill the free cells in order; Calculator matches nothing and stays
+    assert placements == {'Inbox - Outlook': cells[2], 'Google Chrome': cells[0], 'Notes - Notepad': cells[1]}
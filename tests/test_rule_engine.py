@@ -0,0 +1,151 @@
+import random
+
+import pytest
+
+from rule_engine import RuleEngine
+
+KELVIN = '\u212a'  # Kelvin sign, lowercases to ASCII "k"
+DOTLESS_I = '\u0131'  # Case-insensitive regexes match it as "i", lower() keeps it
+LONG_S = '\u017f'  # Case-insensitive regexes match it as "s", lower() keeps it
+
+RULES = [
+    ('substring', 'chrome', 1, 0),
+    ('substring', 'Visual Studio', 2, 0),
+    ('substring', 'kelvin', 3, 5),
+    ('glob', '*Notepad*', 2, 0),
+    ('glob', 'Report ??? - Word', 1, 3),
+    ('glob', '*[0-9] - Excel', 2, 0),
+    ('glob', '*' + KELVIN + 'elvin*', 1, 1),
+    ('regex', 'Terminal', 1, 0),
+    ('regex', r'^Inbox\b', 2, 2),
+    ('regex', r'\d+ unread', 1, 0),
+    ('regex', 'k', 2, -1),
+    ('regex', 'stra(ss|ß)e', 3, 0),
+    ('title', 'Calculator', 3, 0),
+    ('title', 'Kelvin', 1, 6),
+    ('class', 'CabinetWClass', 2, 0),
+    ('class', 'ConsoleWindowClass', 1, 1),
+]
+
+WORDS = ['Chrome', 'chrome', 'CHROME', 'Visual', 'Studio', 'Notepad', 'Report', 'abc', 'Word', 'Excel', '42',
+         'Terminal', 'Inbox', 'Inboxes', '7 unread', 'Kelvin', KELVIN + 'elvin', 'KELVIN', 'k', 'K', KELVIN,
+         'Strasse', 'Straße', 'STRASSE', 'Stra' + LONG_S + LONG_S + 'e', DOTLESS_I + 'nbox', 'Calculator', '-', ' ',
+         'İstanbul', 'café']
+CLASSES = ['Chrome_WidgetWin_1', 'CabinetWClass', 'cabinetwclass', 'ConsoleWindowClass', 'Notepad', 'Kelvin']
+
+
+COMPILED = [RuleEngine.compile_rule(i, *entry) for i, entry in enumerate(RULES)]
+
+
+def make_engine(prefilter):
+    engine = RuleEngine(COMPILED, cache_size=0)
+    if not prefilter:
+        engine._prefiltered = False  # Try every glob/regex rule in rank order
+    return engine
+
+
+def random_titles(count, seed=1234):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(WORDS) + rng.choice(['', ' ', ' - ']) for _ in range(rng.randint(1, 4))), \
+            rng.choice(CLASSES)
+
+
+@pytest.mark.parametrize('title,class_name', [
+    ('Google Chrome', 'Chrome_WidgetWin_1'),
+    ('Untitled - Notepad', 'Notepad'),
+    ('Report 123 - Word', 'OpusApp'),
+    ('Budget 2024 - Excel', 'XLMAIN'),
+    ('Inbox - Outlook', 'rctrl_renwnd32'),
+    ('Inboxes', 'rctrl_renwnd32'),
+    ('12 unread messages', 'Mail'),
+    ('Windows Terminal', 'CASCADIA_HOSTING_WINDOW_CLASS'),
+    ('Calculator', 'ApplicationFrameWindow'),
+    ('calculator', 'ApplicationFrameWindow'),
+    ('Kelvin', 'Static'),
+    (KELVIN + 'elvin', 'Static'),
+    ('Temperature in ' + KELVIN, 'Static'),
+    (DOTLESS_I + 'nbox - Outlook', 'rctrl_renwnd32'),
+    ('Hauptstraße 1', 'Maps'),
+    ('Hauptstra' + LONG_S + LONG_S + 'e 1', 'Maps'),
+    ('HAUPTSTRASSE 1', 'Maps'),
+    ('Documents', 'CabinetWClass'),
+    ('cmd.exe', 'ConsoleWindowClass'),
+    ('', ''),
+])
+def test_prefilter_matches_full_scan(title, class_name):
+    assert make_engine(True).match(title, class_name) is make_engine(False).match(title, class_name)
+
+
+def test_prefilter_matches_full_scan_on_random_titles():
+    with_prefilter, without_prefilter = make_engine(True), make_engine(False)
+    for title, class_name in random_titles(2000):
+        assert with_prefilter.match(title, class_name) is without_prefilter.match(title, class_name), title
+
+
+def test_kelvin_sign_matches_ascii_rules():
+    engine = make_engine(True)
+    # Substring and title rules compare lowercased text, the Kelvin sign lowercases to "k"
+    assert engine.match(KELVIN + 'ELVIN', 'Static').pattern == 'Kelvin'
+    assert engine.match('Absolute ' + KELVIN + 'elvin scale', 'Static').pattern == 'kelvin'
+    # Case-insensitive regexes match it as "k" too
+    assert engine.match(KELVIN, 'Static').pattern == 'k'
+
+
+def test_regex_case_folding_beyond_lower():
+    engine = make_engine(True)
+    # re.IGNORECASE matches these letters although title.lower() does not turn them into ASCII
+    assert engine.match(DOTLESS_I + 'nbox - Outlook', 'Mail').pattern == r'^Inbox\b'
+    assert engine.match('Hauptstra' + LONG_S + LONG_S + 'e 1', 'Maps').pattern == 'stra(ss|ß)e'
+
+
+def engine_from(config):
+    return RuleEngine.from_config(config)
+
+
+def test_higher_priority_wins_over_config_order():
+    engine = engine_from({'rules': [
+        {'type': 'substring', 'pattern': 'chrome', 'monitor': 1},
+        {'type': 'glob', 'pattern': '*Chrome*', 'monitor': 2, 'priority': 10},
+        {'type': 'regex', 'pattern': 'Google', 'monitor': 3, 'priority': 5},
+    ]})
+    assert engine.classify('Google Chrome', 'Chrome_WidgetWin_1')[0] == 2
+    assert engine.classify('Google Search', 'Chrome_WidgetWin_1')[0] == 3
+    assert engine.classify('chrome://settings', 'Chrome_WidgetWin_1')[0] == 2
+
+
+def test_equal_priority_keeps_config_order_across_rule_types():
+    engine = engine_from({'rules': [
+        {'type': 'regex', 'pattern': 'Terminal', 'monitor': 1},
+        {'type': 'substring', 'pattern': 'terminal', 'monitor': 2},
+        {'type': 'title', 'pattern': 'Windows Terminal', 'monitor': 3},
+        {'type': 'class', 'pattern': 'CASCADIA_HOSTING_WINDOW_CLASS', 'monitor': 4},
+    ]})
+    assert engine.classify('Windows Terminal', 'CASCADIA_HOSTING_WINDOW_CLASS')[0] == 1
+    # Without the first rule the next one in config order wins
+    engine = engine_from({'rules': [
+        {'type': 'class', 'pattern': 'CASCADIA_HOSTING_WINDOW_CLASS', 'monitor': 4},
+        {'type': 'title', 'pattern': 'Windows Terminal', 'monitor': 3},
+        {'type': 'substring', 'pattern': 'terminal', 'monitor': 2},
+    ]})
+    assert engine.classify('Windows Terminal', 'CASCADIA_HOSTING_WINDOW_CLASS')[0] == 4
+
+
+def test_duplicate_substrings_keep_the_first_rule():
+    engine = engine_from({'rules': [
+        {'type': 'substring', 'pattern': 'code', 'monitor': 1},
+        {'type': 'substring', 'pattern': 'CODE', 'monitor': 2},
+        {'type': 'substring', 'pattern': 'code', 'monitor': 3, 'priority': -1},
+    ]})
+    assert engine.classify('Visual Studio Code', 'Chrome_WidgetWin_1')[0] == 1
+
+
+def test_monitor_apps_lists_and_default_monitor():
+    engine = engine_from({'monitor_1_apps': ['opera', 'process:mstsc.exe'], 'monitor_2_apps': ['*'],
+                          'monitor_3_apps': ['opera']})
+    # Lists are read in monitor order, so monitor 1's "opera" comes first
+    assert engine.classify('Opera', 'Chrome_WidgetWin_1')[0] == 1
+    assert engine.classify('Remote Desktop', 'TscShellContainerClass', 'MSTSC.EXE')[0] == 1
+    # "*" makes monitor 2 the default for everything else
+    assert engine.classify('Notepad', 'Notepad') == (2, None)
+    assert engine.default_hits == 1
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from scheduler import Scheduler
+
+
+def run_until_done(scheduler, stop_event, timeout=5):
+    thread = threading.Thread(target=scheduler.run, args=(stop_event,), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive()
+
+
+def test_timers_run_in_due_order_and_ties_in_call_order():
+    scheduler = Scheduler()
+    stop = threading.Event()
+    order = []
+    scheduler.call_later(0.06, order.append, 'late')
+    scheduler.call_later(0.02, order.append, 'early')
+    scheduler.call_soon(order.append, 'soon 1')
+    scheduler.call_soon(order.append, 'soon 2')
+    scheduler.call_later(0.04, order.append, 'middle')
+    scheduler.call_later(0.08, stop.set)
+    run_until_done(scheduler, stop)
+    assert order == ['soon 1', 'soon 2', 'early', 'middle', 'late']
+
+
+def test_cancelled_calls_do_not_run():
+    scheduler = Scheduler()
+    stop = threading.Event()
+    order = []
+    call = scheduler.call_later(0.01, order.append, 'cancelled')
+    scheduler.call_later(0.02, order.append, 'kept')
+    scheduler.call_later(0.03, stop.set)
+    call.cancel()
+    assert scheduler.pending() == 2
+    run_until_done(scheduler, stop)
+    assert order == ['kept']
+
+
+def test_call_soon_from_another_thread_wakes_the_idle_loop():
+    scheduler = Scheduler()
+    stop = threading.Event()
+    ran = []
+    thread = threading.Thread(target=scheduler.run, args=(stop,), daemon=True)
+    thread.start()
+    time.sleep(0.05)
+    wakeups = scheduler.wakeups
+    started = time.monotonic()
+    scheduler.call_soon(ran.append, time.monotonic())
+    scheduler.call_soon(stop.set)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert ran and ran[0] - started < 1.0
+    # An idle loop sleeps without waking up on its own
+    assert wakeups == 0
+
+
+def test_failing_callback_does_not_stop_the_loop():
+    scheduler = Scheduler()
+    stop = threading.Event()
+    scheduler.call_soon(lambda: 1 / 0)
+    scheduler.call_soon(stop.set)
+    run_until_done(scheduler, stop)
@@ -0,0 +1,90 @@
+import pytest
+
+from rule_engine import normalize_process_name
+from snapshots import Snapshot, SnapshotEntry, title_pattern
+from window_backend import Rect, WindowRecord, SimulatedBackend, SW_SHOWNORMAL, SW_SHOWMAXIMIZED
+from window_arranger import WindowArranger
+
+
+def entry(process, class_name, title, left=0):
+    return SnapshotEntry(normalize_process_name(process), class_name, title, Rect(left, 0, left + 800, 600), SW_SHOWNORMAL)
+
+
+def record(hwnd, class_name, title):
+    return WindowRecord(hwnd, title, class_name, Rect(0, 0, 100, 100))
+
+
+def test_title_pattern_ignores_case_spacing_and_numbers():
+    assert title_pattern("Document  12 - Notepad") == "document # - notepad"
+    assert title_pattern("(3) Inbox") == title_pattern("(17) inbox")
+
+
+def test_match_prefers_exact_then_pattern_then_process_and_class():
+    snapshot = Snapshot([entry('notepad.exe', 'Notepad', 'Document 1 - Notepad', 0),
+                         entry('notepad.exe', 'Notepad', 'Document 2 - Notepad', 100),
+                         entry('excel.exe', 'XLMAIN', 'Budget - Excel', 200)])
+    windows = [record(1, 'Notepad', 'Document 7 - Notepad'),  # Pattern match
+               record(2, 'Notepad', 'Document 2 - Notepad'),  # Exact match, claimed first
+               record(3, 'XLMAIN', 'Forecast - Excel'),  # Only process and class match
+               record(4, 'Notepad', 'Document 9 - Notepad')]  # Every notepad entry is taken
+    processes = {1: 'notepad.exe', 2: 'NOTEPAD.EXE', 3: 'excel.exe', 4: 'notepad.exe'}
+    matched = {window.hwnd: e.rect.left for window, e in snapshot.match(windows, lambda w: processes[w.hwnd])}
+    assert matched == {1: 0, 2: 100, 3: 200}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    snapshot = Snapshot([entry('code.exe', 'Chrome_WidgetWin_1', 'main.py — Visual Studio Code')],
+                        monitors=[[0, 0, 1920, 1080]])
+    path = tmp_path / 'snapshot.jsonl'
+    snapshot.save(str(path))
+    loaded = Snapshot.load(str(path))
+    assert [(e.process, e.class_name, e.title, e.rect, e.show_state) for e in loaded.entries] == \
+        [(e.process, e.class_name, e.title, e.rect, e.show_state) for e in snapshot.entries]
+    assert loaded.same_monitors([[0, 0, 1920, 1080]])
+
+
+@pytest.fixture
+def arranger(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Default config, no config.json
+    arranger = WindowArranger(backend=SimulatedBackend.generate(40, seed=7))
+    yield arranger
+    arranger.worker.stop()
+    arranger.placement_worker.stop()
+
+
+def placements(backend):
+    return {hwnd: (w.rect, w.show_state, w.restore_rect) for hwnd, w in backend.windows.items() if w.visible}
+
+
+def test_restore_returns_windows_to_their_saved_placement(arranger, tmp_path):
+    backend = arranger.backend
+    path = str(tmp_path / 'snapshot.jsonl')
+    saved = placements(backend)
+    assert arranger.save_snapshot(path) is not None
+
+    arranger.arrange_windows()  # Scramble the desktop
+    for hwnd in list(backend.windows)[:5]:
+        # A changed document number still matches the saved entry through the title pattern
+        backend.set_title(hwnd, backend.windows[hwnd].title.replace('Document ', 'Document 9'))
+    assert placements(backend) != saved
+
+    assert arranger.restore_snapshot(path)
+    restored = placements(backend)
+    for hwnd, (rect, show_state, restore_rect) in saved.items():
+        assert restored[hwnd][1] == show_state
+        assert restored[hwnd][0 if show_state == SW_SHOWNORMAL else 2] == \
+            (rect if show_state == SW_SHOWNORMAL else restore_rect)
+
+    # Everything is in place now: a second restore plans no moves
+    assert arranger.plan_restore(Snapshot.load(path), arranger.get_window_list()) == []
+
+
+def test_maximized_window_keeps_its_normal_rect(arranger, tmp_path):
+    backend = arranger.backend
+    hwnd = backend.add_window('Report - Word', 'OpusApp', Rect(100, 100, 900, 700), show_state=SW_SHOWMAXIMIZED,
+                              process_name='WINWORD.EXE')
+    path = str(tmp_path / 'snapshot.jsonl')
+    snapshot = arranger.save_snapshot(path)
+    saved = next(e for e in snapshot.entries if e.title == 'Report - Word')
+    assert (saved.rect, saved.show_state) == (Rect(100, 100, 900, 700), SW_SHOWMAXIMIZED)
+    assert backend.windows[hwnd].show_state == SW_SHOWMAXIMIZED
@@ -0,0 +1,71 @@
+import threading
+
+from work_queue import CoalescingWorker
+
+TIMEOUT = 5
+
+
+class BlockingJob:
+    """Job that records its runs and blocks until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, cancel_event, requested_at):
+        self.calls.append(requested_at)
+        self.started.set()
+        while not self.release.is_set() and not cancel_event.is_set():
+            self.release.wait(0.01)
+
+
+def test_requests_during_a_run_collapse_into_one_follow_up_run():
+    job = BlockingJob()
+    worker = CoalescingWorker(job, name="TestWorker")
+    try:
+        assert worker.request()
+        assert job.started.wait(TIMEOUT)
+        # The first request during the run queues a follow-up, the rest merge into it
+        assert worker.request()
+        assert [worker.request() for _ in range(5)] == [False] * 5
+        assert worker.is_busy()
+        job.release.set()
+        assert worker.wait_idle(TIMEOUT)
+        assert (worker.runs, worker.coalesced, len(job.calls)) == (2, 5, 2)
+        # The follow-up reports its earliest request
+        assert job.calls[0] < job.calls[1]
+        assert not worker.is_busy()
+    finally:
+        worker.stop()
+
+
+def test_cancel_stops_the_run_and_drops_the_pending_request():
+    job = BlockingJob()
+    worker = CoalescingWorker(job, name="TestWorker")
+    try:
+        worker.request()
+        assert job.started.wait(TIMEOUT)
+        worker.request()
+        worker.cancel()
+        assert worker.wait_idle(TIMEOUT)
+        assert worker.runs == 1 and worker.cancel_event.is_set()
+    finally:
+        worker.stop()
+
+
+def test_failing_job_does_not_stop_the_worker():
+    calls = []
+
+    def job(cancel_event, requested_at):
+        calls.append(requested_at)
+        raise RuntimeError("boom")
+
+    worker = CoalescingWorker(job, name="TestWorker")
+    try:
+        for _ in range(2):
+            worker.request()
+            assert worker.wait_idle(TIMEOUT)
+        assert len(calls) == 2
+    finally:
+        worker.stop()
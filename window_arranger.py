@@ -3,278 +3,979 @@
 
 import sys
 import time
-import json
 import os
+import argparse
 import threading
-from pywinauto import Desktop, Application
-from pywinauto.findwindows import find_windows
-import keyboard
 import logging
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from window_backend import Win32Backend, SW_SHOWMAXIMIZED, SW_RESTORE, SW_MAXIMIZE
+from monitor_topology import MonitorTopology
+from rule_engine import RuleEngine, normalize_process_name
+from window_tracker import WindowTracker
+from work_queue import CoalescingWorker
+from scheduler import Scheduler
+from hotkey_recovery import KeyHistory, HotkeySequenceMatcher, BackoffLimiter
+from session_state import SessionState
+from process_cache import ProcessCache, DEFAULT_PROCESS_CACHE_SIZE
+from layouts import load_layouts
+from snapshots import Snapshot
+from window_table import WindowTable
+from metrics import RunMetrics, MetricsRegistry, MetricsServer
+from log_pipeline import (LogPipeline, DEFAULT_RATE_LIMIT, DEFAULT_LOG_FILE_MAX_BYTES,
+                          DEFAULT_LOG_FILE_BACKUPS)
+from config_loader import (CONFIG_FILE, RESTART_KEYS, ConfigError, ConfigWatcher, CompiledConfig,
+                           load_config_file, read_config, compile_config)
 
-# Configure logging to output to terminal
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stdout)
+try:
+    import keyboard
+except ImportError:
+    # keyboard is only needed for hotkeys; the arranger itself can run without it
+    keyboard = None
+
+# Last-known state of a window known to be in place, keyed by hwnd: rect is a (left, top, right, bottom) tuple
+WindowState = namedtuple('WindowState', 'title class_name rect')
+
+# Set by the exit hotkey; the main loop exits as soon as it is set
+exit_event = threading.Event()
+
+# Log records are queued and written to the terminal (and optional log file) by a background thread
+log_pipeline = LogPipeline()
 logger = logging.getLogger(__name__)
 
 class WindowArranger:
-    def __init__(self):
-        self.desktop = Desktop(backend="uia")
-        self.config = self.load_config()
-        self.monitor_1_apps = self.config.get("monitor_1_apps", ["opera", "RD Tabs"])
-        self.monitor_2_apps = self.config.get("monitor_2_apps", ["*"])
-        self.hotkey = self.config.get("hotkey", "ctrl+alt+i")
-        self.exit_hotkey = self.config.get("exit_hotkey", "ctrl+alt+q")
-        self.reload_hotkey = self.config.get("reload_hotkey", "ctrl+alt+u")  # Manual reload hotkey
+    def __init__(self, backend=None, trace_file=None):
+        self.config_file = CONFIG_FILE
+        config = self.load_config()
+        # Window system backend (live desktop by default, SimulatedBackend for profiling/tests)
+        if backend is None:
+            backend = Win32Backend(enumeration=config.get("window_enumeration", "win32"),
+                                   fetch_workers=config.get("fetch_workers", 8),
+                                   fetch_timeout=config.get("window_fetch_timeout", 2.0))
+        if trace_file:
+            # Record every backend call for offline replay (desktop_trace.py)
+            from desktop_trace import TracingBackend
+            backend = TracingBackend(backend, trace_file)
+        self.backend = backend
+        self.process_cache = ProcessCache(backend)  # hwnd -> PID -> executable name, kept across runs
+        
+        # Monitor topology, built on first use and kept until the display configuration changes
+        self.topology = None
+        if not self.backend.watch_display_changes(self.on_display_change):
+            logger.warning("Display change notifications unavailable, monitor layout is only read once")
+        
+        # Session connect/disconnect and lock/unlock events; without them hotkeys are health-checked periodically
+        self.session = SessionState()
+        self.pending_rebuild = set()  # State invalidated by session events, rebuilt once they settle
+        self.rebuild_scheduled = False
+        self.session_rebuilds = 0
+        self.session_events = self.backend.watch_session_changes(self.on_session_change)
+        
+        # Hotkey registration state
         self.hotkey_registered = False
         self.exit_hotkey_registered = False
         self.reload_hotkey_registered = False
+        self.extra_hotkeys_registered = []  # Layout and snapshot hotkeys currently registered
+        self.hotkeys_enabled = False  # Set by the first register_hotkeys(); reloads and session rebuilds re-register
         self.last_hotkey_test = 0
-        self.hotkey_test_interval = self.config.get("hotkey_test_interval", 1800)  # Configurable interval
-        self.enable_auto_restart = self.config.get("enable_auto_restart", True)
-        self.max_restart_attempts = self.config.get("max_restart_attempts", 3)
+        
+        # Window moves
+        self.move_poll_interval = 0.01  # Readiness check interval
+        self.last_batch = None  # Latency report of the last applied move batch
+        
+        # Incremental arrangement: windows unchanged since the last run are left alone
+        self.window_states = {}  # hwnd -> WindowState of windows known to be in place
+        self.states_generation = 0  # Bumped whenever window_states is invalidated
+        self._states_lock = threading.Lock()
+        self.arrange_lock = threading.RLock()  # One arrangement at a time
+        
+        # Daemon mode: keep a live window table from window events instead of scanning on demand
+        self.daemon_mode = config.get("daemon_mode", False)
+        self.tracker = None
+        
+        # Hotkey presses are queued to a worker thread; presses during a run collapse into one follow-up run
+        self.worker = CoalescingWorker(self._run_arrangement, name="ArrangementWorker")
+        
+        # Layout and snapshot hotkeys share one worker; the most recent request wins
+        self.placement_worker = CoalescingWorker(self._run_placement, name="PlacementWorker")
+        self.requested_placement = None  # (description, function, args)
+        
+        # Main-loop scheduler (set by main); hotkey callbacks post work to it instead of running it inline
+        self.scheduler = None
+        
+        # Remote Desktop detection
+        self.rd_key_history = KeyHistory(32)  # Ring buffer of recent console key presses
+        self.rd_reregister_limiter = None
+        
+        # Run metrics: per-phase timings, window counters and move latency histograms
+        self.metrics = MetricsRegistry()
+        self.current_run = None  # RunMetrics of the arrangement in progress
+        self.metrics_server = None
+        self.control_server = None  # Local command API, started by main if control_port is set
+        
+        # Config hot reload
+        self.config_watcher = None
+        self.config_reloads = 0
+        self.config_reload_failures = 0
+        
+        # Everything else comes from the config file and is replaced on reload
+        self.config = None
+        self.layouts = {}
+        self.apply_config(CompiledConfig(config, RuleEngine.from_config(config), load_layouts(config)))
+    
+    def apply_config(self, compiled):
+        """Install a compiled config (rules, layouts, hotkeys and settings)
+
+        Arrangements read the rule engine and layouts once when they start, so
+        swapping the attributes never disturbs an arrangement in progress.
+        Returns False if changed hotkeys could not be registered.
+        """
+        config = compiled.config
+        hotkeys_changed = self.config is None or \
+            self.hotkey_bindings(self.config, self.layouts) != self.hotkey_bindings(config, compiled.layouts)
+        reregister = hotkeys_changed and self.hotkeys_enabled
+        if reregister:
+            self.unregister_hotkeys()
+        
+        self.config = config
+        self.backend.mark('config', config=config)
+        # Log level, log file and rate limit (only once main() has started the log pipeline)
+        log_pipeline.configure(config.get("log_level", "INFO"), config.get("log_file"),
+                               config.get("log_file_max_bytes", DEFAULT_LOG_FILE_MAX_BYTES),
+                               config.get("log_file_backups", DEFAULT_LOG_FILE_BACKUPS),
+                               config.get("log_rate_limit", DEFAULT_RATE_LIMIT))
+        self.monitor_1_apps = config.get("monitor_1_apps", ["opera", "RD Tabs"])
+        self.monitor_2_apps = config.get("monitor_2_apps", ["*"])
+        self.rule_engine = compiled.rule_engine  # Compiled monitor_N_apps / rules matching
+        self.process_cache.max_size = config.get("process_cache_size", DEFAULT_PROCESS_CACHE_SIZE)
+        self.layouts = compiled.layouts  # Named layout profiles, each with an optional hotkey
+        topology = self.topology
+        if topology is not None:
+            for layout in self.layouts.values():
+                layout.precompute(topology)
+        self.hotkey = config.get("hotkey", "ctrl+alt+i")
+        self.exit_hotkey = config.get("exit_hotkey", "ctrl+alt+q")
+        self.reload_hotkey = config.get("reload_hotkey", "ctrl+alt+u")  # Manual reload hotkey
+        self.snapshot_hotkey = config.get("snapshot_hotkey")  # Optional: save window snapshot
+        self.restore_hotkey = config.get("restore_hotkey")  # Optional: restore window snapshot
+        self.hotkey_test_interval = config.get("hotkey_test_interval", 1800)  # Configurable interval
+        self.enable_auto_restart = config.get("enable_auto_restart", True)
+        self.max_restart_attempts = config.get("max_restart_attempts", 3)
+        
+        # Window moves
+        self.batch_moves = config.get("batch_moves", True)  # Apply all moves in one deferred-positioning batch
+        self.move_settle_timeout = config.get("move_settle_timeout", 0.5)  # Max wait for restore/move to land
+        
+        # Incremental arrangement; new rules may classify unchanged windows differently
+        self.incremental = config.get("incremental", True)
+        self.reset_window_states()
+        
+        # Daemon mode
+        self.auto_arrange = config.get("auto_arrange", False)  # Place new windows as they appear
+        self.event_debounce = config.get("event_debounce", 0.1)
+        self.event_max_delay = config.get("event_max_delay", 1.0)
+        tracker = self.tracker
+        if tracker is not None:
+            tracker.debounce = self.event_debounce
+            tracker.max_delay = self.event_max_delay
+            tracker.on_new_window = self.on_new_window if self.auto_arrange else None
+        
+        # Window snapshots
+        self.snapshot_file = config.get("snapshot_file", "window_snapshot.jsonl")
+        
+        # Metrics export
+        self.metrics.export_file = config.get("metrics_file")  # JSON line per run, off if not set
         
         # Remote Desktop detection
-        self.rd_key_history = []  # Track recent key presses
-        self.rd_key_timeout = self.config.get("auto_recovery_timeout", 5.0)  # Timeout for key sequence detection
-        self.enable_auto_recovery = self.config.get("enable_auto_recovery", True)  # Enable/disable auto-recovery
+        self.rd_key_timeout = config.get("auto_recovery_timeout", 5.0)  # Timeout for key sequence detection
+        self.enable_auto_recovery = config.get("enable_auto_recovery", True)  # Enable/disable auto-recovery
+        self.rd_key_matcher = HotkeySequenceMatcher([self.hotkey, self.exit_hotkey, self.reload_hotkey,
+                                                     self.snapshot_hotkey, self.restore_hotkey] +
+                                                    [layout.hotkey for layout in self.layouts.values()])
+        # Re-registration is rate-limited with exponential backoff
+        backoff = config.get("auto_recovery_backoff", 10.0)
+        max_backoff = config.get("auto_recovery_max_backoff", 600.0)
+        limiter = self.rd_reregister_limiter
+        if limiter is None or (limiter.min_interval, limiter.max_interval) != (backoff, max(max_backoff, backoff)):
+            self.rd_reregister_limiter = BackoffLimiter(backoff, max_backoff)
+        
+        # Session events
+        self.session_settle_delay = config.get("session_settle_delay", 0.5)  # Wait for event bursts to end
         
-        # Set log level from config
-        log_level = getattr(logging, self.config.get("log_level", "INFO").upper(), logging.INFO)
-        logging.getLogger().setLevel(logging.DEBUG)  # Temporarily set to DEBUG for testing
-        logger.setLevel(logging.DEBUG)
+        if reregister:
+            return self.register_hotkeys()
+        return True
+    
+    @staticmethod
+    def hotkey_bindings(config, layouts):
+        """Every configured hotkey and what it triggers, to detect hotkey changes on reload"""
+        return (tuple(config.get(key) for key in ("hotkey", "exit_hotkey", "reload_hotkey",
+                                                  "snapshot_hotkey", "restore_hotkey")),
+                tuple((name, layout.hotkey) for name, layout in layouts.items()))
     
     def load_config(self):
         """Load configuration file"""
-        config_file = "config.json"
-        default_config = {
-            "hotkey": "ctrl+alt+i",
-            "exit_hotkey": "ctrl+alt+q",
-            "monitor_1_apps": ["opera", "RD Tabs"],
-            "monitor_2_apps": ["*"],
-            "hotkey_test_interval": 1800,
-            "log_level": "INFO"
-        }
-        
+        return load_config_file(self.config_file)
+    
+    def reload_config(self):
+        """Re-read the config file and swap it in; an invalid file leaves the current config running"""
+        start = time.perf_counter()
         try:
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    logger.info(f"Successfully loaded config file: {config_file}")
-                    return {**default_config, **config}  # Merge default config and user config
-            else:
-                logger.info(f"Config file {config_file} not found, using default config")
-                return default_config
+            compiled = compile_config(read_config(self.config_file))
+        except ConfigError as e:
+            self.config_reload_failures += 1
+            logger.error(f"Config reload rejected after {(time.perf_counter() - start) * 1000:.1f} ms, "
+                         f"keeping previous config: {'; '.join(e.errors)}")
+            return False
         except Exception as e:
-            logger.error(f"Failed to load config file: {e}, using default config")
-            return default_config
+            self.config_reload_failures += 1
+            logger.error(f"Config reload failed after {(time.perf_counter() - start) * 1000:.1f} ms, "
+                         f"keeping previous config: {e}")
+            return False
+        
+        changed = sorted(key for key in set(self.config) | set(compiled.config)
+                         if self.config.get(key) != compiled.config.get(key))
+        if not changed:
+            logger.info(f"Config file unchanged ({(time.perf_counter() - start) * 1000:.1f} ms)")
+            return True
+        restart = [key for key in changed if key in RESTART_KEYS]
+        if restart:
+            logger.warning(f"Config keys {', '.join(restart)} only take effect after a restart")
+        previous = CompiledConfig(self.config, self.rule_engine, self.layouts)
+        hotkeys_changed = self.hotkey_bindings(self.config, self.layouts) != \
+            self.hotkey_bindings(compiled.config, compiled.layouts)
+        if not self.apply_config(compiled):
+            # The new hotkeys are not registered: put the previous config and its bindings back
+            self.config_reload_failures += 1
+            restored = self.apply_config(previous)
+            logger.error(f"Config reload failed after {(time.perf_counter() - start) * 1000:.1f} ms: "
+                         f"new hotkeys could not be registered, previous config "
+                         f"{'restored' if restored else 'restored but its hotkeys could not be registered'}")
+            return False
+        self.config_reloads += 1
+        logger.info(f"Config reloaded in {(time.perf_counter() - start) * 1000:.1f} ms: changed {', '.join(changed)}; "
+                    f"{len(compiled.rule_engine.rules)} rules, {len(compiled.layouts)} layouts, "
+                    f"hotkeys {'changed' if hotkeys_changed else 'unchanged'}")
+        return True
+    
+    def on_config_change(self):
+        """Config watcher callback: reload the config from the main loop"""
+        logger.info(f"Config file {self.config_file} changed, reloading...")
+        if self.scheduler is not None:
+            self.scheduler.call_soon(self.reload_config)
+        else:
+            self.reload_config()
+    
+    def start_config_watch(self):
+        """Watch the config file and reload it when it changes"""
+        self.config_watcher = ConfigWatcher(self.config_file, self.on_config_change,
+                                            debounce=self.config.get("config_reload_debounce", 0.3))
+        self.config_watcher.start()
+    
+    def stop_config_watch(self):
+        """Stop watching the config file"""
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+            self.config_watcher = None
         
     def get_monitor_info(self):
         """Get monitor information"""
         try:
-            import win32api
-            import win32con
-            
-            # Get primary monitor information
-            primary_monitor = win32api.GetSystemMetrics(win32con.SM_CXSCREEN), win32api.GetSystemMetrics(win32con.SM_CYSCREEN)
-            
-            # Get all monitor information
-            monitors = []
-            for i in range(win32api.GetSystemMetrics(win32con.SM_CMONITORS)):
-                monitor_info = win32api.EnumDisplayMonitors()[i]
-                monitors.append(monitor_info)
+            monitors = self.get_topology().monitors
             
-            logger.info(f"Primary monitor resolution: {primary_monitor}")
             logger.info(f"Detected {len(monitors)} monitors")
+            for monitor in monitors:
+                logger.info(f"Monitor {monitor.number}: {monitor.device} {monitor.rect.as_tuple()}"
+                            f"{' (primary)' if monitor.primary else ''}")
             
             return monitors
         except ImportError:
             logger.error("pywin32 is required to get monitor information")
             return []
     
+    def get_topology(self):
+        """Get the cached monitor topology, building it if needed"""
+        topology = self.topology
+        if topology is None:
+            topology = MonitorTopology.from_backend(self.backend)
+            self.topology = topology
+            # Compute layout cell geometry for the new topology up front
+            for layout in self.layouts.values():
+                layout.precompute(topology)
+        return topology
+    
+    def on_display_change(self):
+        """Display change notification: drop the cached monitor topology"""
+        logger.info("Display configuration changed, monitor topology will be rebuilt")
+        self.topology = None
+        self.reset_window_states()
+    
+    def reset_window_states(self):
+        """Forget which windows are in place, including states an arrangement in progress is building"""
+        with self._states_lock:
+            self.states_generation += 1
+            self.window_states = {}
+    
+    def on_session_change(self, event, session_id):
+        """Session change notification (backend thread): handle it on the main loop"""
+        if self.scheduler is not None:
+            self.scheduler.call_soon(self.handle_session_event, event, session_id)
+        else:
+            self.handle_session_event(event, session_id)
+    
+    def handle_session_event(self, event, session_id=None):
+        """Record a session event and schedule a rebuild of the state it invalidates"""
+        rebuild = self.session.apply(event, session_id)
+        logger.info(f"Session event '{event}': {self.session.describe()}"
+                    f"{', will rebuild ' + ', '.join(sorted(rebuild)) if rebuild else ''}")
+        if not rebuild:
+            return
+        self.pending_rebuild |= rebuild
+        # Connect, logon and unlock arrive in bursts: rebuild once after they settle
+        if self.scheduler is None:
+            self.rebuild_session_state()
+        elif not self.rebuild_scheduled:
+            self.rebuild_scheduled = True
+            self.scheduler.call_later(self.session_settle_delay, self.rebuild_session_state)
+    
+    def rebuild_session_state(self):
+        """Rebuild the hooks, monitor model and window cache invalidated by session events"""
+        self.rebuild_scheduled = False
+        if not self.session.active:
+            # Keyboard hooks cannot be restored on a locked or disconnected session: wait for unlock/connect
+            logger.info(f"Session not active, rebuild of {', '.join(sorted(self.pending_rebuild))} postponed")
+            return
+        rebuild, self.pending_rebuild = self.pending_rebuild, set()
+        start = time.perf_counter()
+        if 'topology' in rebuild:
+            self.topology = None  # Rebuilt from the new monitors on next use
+        if 'windows' in rebuild:
+            self.reset_window_states()
+            if self.tracker is not None and self.tracker.running:
+                self.tracker.resync()
+        # Re-register even if the session change left no hotkey registered (e.g. a registration failed)
+        if 'hotkeys' in rebuild and self.hotkeys_enabled:
+            if self.register_hotkeys():
+                self.last_hotkey_test = time.time()
+            else:
+                logger.error("Failed to re-register hotkeys after session change")
+        self.session_rebuilds += 1
+        logger.info(f"Rebuilt {', '.join(sorted(rebuild))} after session change "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    
+    def start_tracking(self):
+        """Start event-driven window tracking (daemon mode)"""
+        on_new_window = self.on_new_window if self.auto_arrange else None
+        tracker = WindowTracker(self.backend, self.event_debounce, self.event_max_delay, on_new_window)
+        if tracker.start():
+            self.tracker = tracker
+            if self.auto_arrange:
+                logger.info("Auto-arrange enabled: new windows are placed as they appear")
+            return True
+        return False
+    
+    def stop_tracking(self):
+        """Stop event-driven window tracking"""
+        if self.tracker is not None:
+            self.tracker.stop()
+            self.tracker = None
+    
     def get_window_list(self):
-        """Get all visible windows"""
+        """Get all visible windows as a WindowTable"""
         try:
-            windows = []
-            for window in self.desktop.windows():
-                try:
-                    if window.is_visible() and window.window_text():
-                        window_info = {
-                            'title': window.window_text(),
-                            'class_name': window.class_name(),
-                            'hwnd': window.handle,
-                            'rect': window.rectangle()
-                        }
-                        windows.append(window_info)
-                        logger.debug(f"Window: {window_info['title']} - {window_info['class_name']}")
-                except Exception as e:
-                    continue
-            
+            tracker = self.tracker
+            if tracker is not None and tracker.running:
+                # Read the live table, refreshing only windows with pending events
+                tracker.flush(notify=False)
+                windows = WindowTable(tracker.windows())
+            else:
+                windows = WindowTable(self.backend.list_windows())
+            # Processes without a window left may have exited, and their ids may be reused
+            self.process_cache.prune(windows.by_hwnd)
             logger.info(f"Found {len(windows)} visible windows")
             return windows
         except Exception as e:
             logger.error(f"Failed to get window list: {e}")
-            return []
+            return WindowTable([])
+    
+    def get_process_name(self, window_info):
+        """Get the executable name of the window's process ('' if unavailable), looked up once per record"""
+        process = window_info.process
+        if process is None:
+            self._lookup_process(window_info)
+            process = window_info.process
+        return process
+    
+    def get_process_id(self, window_info):
+        """Get the id of the window's process (0 if unavailable), looked up once per record"""
+        if window_info.pid is None:
+            self._lookup_process(window_info)
+        return window_info.pid
+    
+    def _lookup_process(self, window_info):
+        try:
+            pid, process, cached = self.process_cache.lookup(window_info.hwnd)
+            self.count_metric('process_cache_hits' if cached else 'process_cache_misses')
+        except Exception:
+            pid, process = 0, ''
+        if not process:
+            self.count_metric('process_lookup_failures')
+        window_info.pid = pid
+        window_info.process = process
     
     def get_window_monitor(self, window_info):
-        """Get the monitor where the window is currently located"""
+        """Get the monitor where the window is currently located, looked up once per record and topology"""
         try:
-            import win32api
-            import win32con
-            
-            # Get current window position
-            rect = window_info['rect']
-            window_center_x = (rect.left + rect.right) // 2
-            
-            # Get primary monitor width
-            primary_width = win32api.GetSystemMetrics(win32con.SM_CXSCREEN)
-            
-            # Get virtual screen information
-            virtual_left = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
-            
-            logger.debug(f"Window '{window_info['title']}' center X: {window_center_x}, primary width: {primary_width}, virtual left: {virtual_left}")
-            
-            # Determine which monitor the window is on
-            # If window center X < 0 (negative), it's on monitor 1 (left)
-            # If window center X is between 0 and primary width, it's on monitor 2 (primary)
-            # If window center X > primary width, it's on monitor 1 (right extension)
-            if window_center_x < 0:
-                return 1  # Monitor 1 (left)
-            elif window_center_x < primary_width:
-                return 2  # Monitor 2 (primary)
-            else:
-                return 1  # Monitor 1 (right extension)
-                
+            topology = self.get_topology()
+            if window_info.topology is not topology:
+                # Monitor containing the window centre (nearest monitor if off-screen)
+                monitor = topology.monitor_for_rect(window_info.rect)
+                window_info.monitor = monitor.number if monitor is not None else None
+                window_info.topology = topology
+            return window_info.monitor
         except Exception as e:
             logger.error(f"Failed to get window monitor information: {e}")
             return None
     
+    def get_show_state(self, window_info):
+        """Get the window's show state (SW_SHOWNORMAL, SW_SHOWMINIMIZED or SW_SHOWMAXIMIZED)"""
+        # Use the placement collected during enumeration, or GetWindowPlacement once
+        show_state = window_info.placement
+        if show_state is None:
+            show_state = self.backend.get_show_state(window_info.hwnd)
+            window_info.placement = show_state
+        return show_state
+    
+    def get_normal_rect(self, window_info):
+        """Get the rect a maximized window returns to when restored (its current rect if unknown)"""
+        try:
+            return self.backend.get_normal_rect(window_info.hwnd)
+        except Exception as e:
+            logger.warning(f"Failed to read normal placement of '{window_info.title}': {e}")
+            return window_info.rect
+    
+    def is_window_maximized(self, window_info):
+        """Check if window is maximized"""
+        try:
+            return self.get_show_state(window_info) == SW_SHOWMAXIMIZED
+        except Exception as e:
+            logger.warning(f"Failed to detect window state: {e}")
+            return False
+    
+    def wait_until(self, condition, timeout=None):
+        """Poll condition until it is true or timeout expires, return whether it became true"""
+        if timeout is None:
+            timeout = self.move_settle_timeout
+        # The deadline includes the time spent in condition(), which can be a slow cross-process call;
+        # requested sleep time is counted too since the simulated backend does not really sleep
+        deadline = time.perf_counter() + timeout
+        waited = 0.0
+        with self.phase('wait'):
+            while True:
+                try:
+                    if condition():
+                        return True
+                except Exception as e:
+                    logger.debug(f"Readiness check failed: {e}")
+                if waited >= timeout or time.perf_counter() >= deadline:
+                    self.count_metric('settle_timeouts')
+                    return False
+                self.backend.sleep(self.move_poll_interval)
+                waited += self.move_poll_interval
+    
+    def is_window_restored(self, hwnd):
+        """Check if window has left the maximized state"""
+        return self.backend.get_show_state(hwnd) != SW_SHOWMAXIMIZED
+    
+    def is_window_on_monitor(self, window_info, target_monitor):
+        """Check if window's current position is on the target monitor"""
+        monitor = self.get_topology().monitor_for_rect(self.backend.get_window_rect(window_info.hwnd))
+        return monitor is not None and monitor.number == target_monitor
+    
+    def get_target_position(self, window_info, target_monitor):
+        """Get (x, y, width, height) for window on the target monitor"""
+        # Place the window 100 pixels into the target monitor's work area
+        work = self.get_topology().resolve(target_monitor).work
+        new_x = work.left + 100
+        new_y = work.top + 100
+        
+        # Keep current window size
+        current_rect = window_info.rect
+        current_width = current_rect.right - current_rect.left
+        current_height = current_rect.bottom - current_rect.top
+        return new_x, new_y, current_width, current_height
+    
     def move_window_to_monitor(self, window_info, target_monitor):
         """Move window to specified monitor"""
         try:
-            import win32gui
-            import win32con
-            import win32api
-            
-            hwnd = window_info['hwnd']
+            hwnd = window_info.hwnd
+            target_monitor = self.get_topology().resolve(target_monitor).number
             
             # Check if window is already on target monitor
             current_monitor = self.get_window_monitor(window_info)
             if current_monitor == target_monitor:
-                logger.info(f"Window '{window_info['title']}' is already on monitor {target_monitor}, skipping")
+                self.count_metric('in_place')
                 return True
             
-            # Check if window is maximized
-            try:
-                # Use GetWindowPlacement to detect window state
-                placement = win32gui.GetWindowPlacement(hwnd)
-                is_maximized = (placement[1] == win32con.SW_SHOWMAXIMIZED)
+            # Restore maximized windows first
+            self.mark_first_move()
+            start = time.perf_counter()
+            with self.phase('move'):
+                is_maximized = self.is_window_maximized(window_info)
                 if is_maximized:
-                    logger.info(f"Window '{window_info['title']}' is maximized, restoring first")
-                    win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-                    time.sleep(0.1)  # Wait for window to restore
-            except Exception as e:
-                logger.warning(f"Failed to detect window state: {e}")
-                is_maximized = False
-            
-            # Get monitor information
-            primary_width = win32api.GetSystemMetrics(win32con.SM_CXSCREEN)
-            virtual_left = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
-            
-            # Get target monitor coordinates
-            if target_monitor == 1:  # Monitor 1 (left)
-                # Monitor 1 is on the left, use virtual screen left coordinates
-                new_x = virtual_left + 100
-                new_y = 100
-            else:  # Monitor 2 (right, primary)
-                # Primary monitor coordinates
-                new_x = 100
-                new_y = 100
-            
-            # Get current window size
-            current_rect = window_info['rect']
-            current_width = current_rect.right - current_rect.left
-            current_height = current_rect.bottom - current_rect.top
-            
-            # Move window and maintain original size
-            win32gui.SetWindowPos(hwnd, win32con.HWND_TOP, new_x, new_y, 
-                                current_width, current_height, 
-                                win32con.SWP_SHOWWINDOW)
-            
-            # If it was maximized before, maximize again after moving
-            if is_maximized:
-                time.sleep(0.2)  # Wait for move to complete
-                logger.info(f"Re-maximizing window '{window_info['title']}'")
-                win32gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
+                    self.backend.show_window(hwnd, SW_RESTORE)
+                    self.count_metric('maximized_restored')
+                    if not self.wait_until(lambda: self.is_window_restored(hwnd)):
+                        logger.warning(f"Window '{window_info.title}' did not restore in time")
+                
+                # Move window and maintain original size
+                new_x, new_y, width, height = self.get_target_position(window_info, target_monitor)
+                self.backend.move_window(hwnd, new_x, new_y, width, height)
+                
+                # If it was maximized before, maximize again once the move has landed
+                if is_maximized:
+                    if not self.wait_until(lambda: self.is_window_on_monitor(window_info, target_monitor)):
+                        logger.warning(f"Window '{window_info.title}' did not reach monitor {target_monitor} in time")
+                    self.backend.show_window(hwnd, SW_MAXIMIZE)
             
-            logger.info(f"Moved window '{window_info['title']}' to monitor {target_monitor} (coordinates: {new_x}, {new_y})")
+            self.observe_move(time.perf_counter() - start)
+            self.count_metric('moved')
+            logger.debug(f"Moved window '{window_info.title}' to monitor {target_monitor} "
+                         f"(coordinates: {new_x}, {new_y})")
             return True
             
         except Exception as e:
+            self.count_metric('failed')
             logger.error(f"Failed to move window: {e}")
             return False
     
-    def arrange_windows(self):
-        """Arrange all windows"""
+    def mark_first_move(self):
+        """Record when the current run first touches a window (no-op outside a run or on another thread)"""
+        run = self.current_run
+        if run is not None and run.thread is threading.current_thread():
+            run.mark_first_move()
+    
+    @contextmanager
+    def metrics_run(self, kind, requested_at=None, **details):
+        """Collect phase timings and window counters of one arrangement run (details go to the trace)
+
+        requested_at is the perf_counter() time of the hotkey press that queued
+        the run; the run then reports its hotkey-to-first-move latency.
+        """
+        self.backend.mark('run', kind=kind, **details)
+        run = RunMetrics(kind, requested_at)
+        self.current_run = run
+        try:
+            yield run
+        finally:
+            self.current_run = None
+            run.finish()
+            self.backend.mark('run_end', kind=kind, seconds=run.seconds)
+            self.metrics.record(run)
+            logger.info(f"Run metrics: {run.summary()}")
+    
+    def phase(self, name):
+        """Time a phase of the current run (no-op outside a run or on another thread)"""
+        run = self.current_run
+        if run is None or run.thread is not threading.current_thread():
+            return nullcontext()
+        return run.phase(name)
+    
+    def count_metric(self, name, n=1):
+        """Count windows by outcome in the current run"""
+        run = self.current_run
+        if run is not None and run.thread is threading.current_thread():
+            run.count(name, n)
+    
+    def observe_move(self, seconds):
+        """Record one window's move latency in the current run"""
+        run = self.current_run
+        if run is not None and run.thread is threading.current_thread():
+            run.observe_move(seconds)
+    
+    def plan_moves(self, assignments):
+        """Build move plan for (window_info, target_monitor) pairs, skipping windows already in place"""
+        with self.phase('plan'):
+            return self._plan_moves(assignments)
+    
+    def _plan_moves(self, assignments):
+        plan = []
+        topology = self.get_topology()
+        for window_info, target_monitor in assignments:
+            try:
+                target_monitor = topology.resolve(target_monitor).number
+                current_monitor = self.get_window_monitor(window_info)
+                if current_monitor == target_monitor:
+                    self.count_metric('in_place')
+                    continue
+                x, y, width, height = self.get_target_position(window_info, target_monitor)
+                maximized = self.is_window_maximized(window_info)
+                plan.append({
+                    'window': window_info,
+                    'monitor': target_monitor,
+                    'x': x,
+                    'y': y,
+                    'width': width,
+                    'height': height,
+                    'maximized': maximized,
+                    'remaximize': maximized
+                })
+            except Exception as e:
+                self.count_metric('failed')
+                logger.error(f"Failed to plan move for window '{window_info.title}': {e}")
+        return plan
+    
+    def apply_move_plan(self, plan):
+        """Apply move plan as one deferred-positioning batch, return batch latency in seconds"""
+        with self.phase('move'):
+            return self._apply_move_plan(plan)
+    
+    def _apply_move_plan(self, plan):
+        start = time.perf_counter()
+        self.mark_first_move()
+        maximized = [move for move in plan if move['maximized']]
+        
+        # Restore all maximized windows, then wait until they have all left the maximized state
+        for move in maximized:
+            try:
+                self.backend.show_window(move['window'].hwnd, SW_RESTORE)
+                self.count_metric('maximized_restored')
+            except Exception as e:
+                self.count_metric('failed')
+                logger.warning(f"Failed to restore window '{move['window'].title}': {e}")
+        if maximized and not self.wait_until(
+                lambda: all(self.is_window_restored(move['window'].hwnd) for move in maximized)):
+            logger.warning("Some maximized windows did not restore in time")
+        
+        # Move every window in one transaction
+        self.backend.move_windows([(move['window'].hwnd, move['x'], move['y'], move['width'], move['height'])
+                                   for move in plan])
+        
+        # Re-maximize once the moves have landed (windows placed into layout cells stay restored)
+        remaximize = [move for move in plan if move['remaximize']]
+        if remaximize:
+            if not self.wait_until(
+                    lambda: all(self.is_window_on_monitor(move['window'], move['monitor']) for move in remaximize)):
+                logger.warning("Some windows did not reach their target monitor in time")
+            for move in remaximize:
+                try:
+                    self.backend.show_window(move['window'].hwnd, SW_MAXIMIZE)
+                except Exception as e:
+                    self.count_metric('failed')
+                    logger.warning(f"Failed to re-maximize window '{move['window'].title}': {e}")
+        
+        elapsed = time.perf_counter() - start
+        self.last_batch = {'moves': len(plan), 'maximized': len(maximized), 'seconds': elapsed}
+        # Every window in the batch lands when the batch completes
+        for _ in plan:
+            self.observe_move(elapsed)
+        self.count_metric('moved', len(plan))
+        if logger.isEnabledFor(logging.DEBUG):
+            for move in plan:
+                logger.debug(f"Moved window '{move['window'].title}' to monitor {move['monitor']} "
+                             f"(coordinates: {move['x']}, {move['y']})")
+        logger.info(f"Applied batch of {len(plan)} moves ({len(maximized)} maximized) in {elapsed * 1000:.1f} ms")
+        return elapsed
+    
+    def on_new_window(self, window_info):
+        """Window tracker callback: place a window that just appeared"""
+        logger.info(f"New window detected: '{window_info.title}'")
+        self.arrange_window(window_info)
+    
+    def arrange_window(self, window_info):
+        """Move a single window to its target monitor"""
+        with self.arrange_lock:
+            rule_engine = self.rule_engine
+            process_name = self.get_process_name(window_info) if rule_engine.uses_process else None
+            pid = self.get_process_id(window_info) if rule_engine.uses_pid else None
+            target_monitor, _ = rule_engine.classify(window_info.title, window_info.class_name, process_name, pid)
+            return self.move_window_to_monitor(window_info, target_monitor)
+    
+    def arrange_windows(self, cancel_event=None, requested_at=None):
+        """Arrange all windows, stopping early if cancel_event is set"""
+        with self.arrange_lock, self.metrics_run('arrange', requested_at):
+            self._arrange_windows(cancel_event)
+    
+    def _arrange_windows(self, cancel_event):
         logger.info("Starting window arrangement...")
         
         # Get all windows
-        windows = self.get_window_list()
+        with self.phase('enumerate'):
+            windows = self.get_window_list()
         if not windows:
             logger.warning("No visible windows found")
             return
+        self.count_metric('windows', len(windows))
+        if cancel_event is not None and cancel_event.is_set():
+            self.count_metric('cancelled')
+            logger.info("Window arrangement cancelled")
+            return
         
-        # Categorize windows
-        target_monitor_1 = []  # Monitor 1
-        target_monitor_2 = []  # Monitor 2
-        
+        # Categorize windows by target monitor, skipping windows unchanged since the last run
+        # States built from rules or monitors replaced during the run are stale: generation tells
+        generation = self.states_generation
+        rule_engine = self.rule_engine
+        topology = self.get_topology()
+        previous_states = self.window_states if self.incremental else {}
+        states = {}
+        assignments = []
+        counts = {}
+        rule_hits = {}  # Winning rule (None for the default monitor) -> windows it classified this run
+        unchanged = 0
+        in_place = 0
+        classify_seconds = 0.0
+        placement_seconds = 0.0
         for window in windows:
-            title = window['title'].lower()
-            class_name = window['class_name'].lower()
+            if cancel_event is not None and cancel_event.is_set():
+                self.count_metric('cancelled')
+                logger.info("Window arrangement cancelled")
+                return
+            hwnd = window.hwnd
+            rect = window.rect.as_tuple()
+            state = previous_states.get(hwnd)
+            if state is not None and state.rect == rect and state.title == window.title \
+                    and state.class_name == window.class_name:
+                states[hwnd] = state
+                unchanged += 1
+                continue
             
-            # Check if it's a monitor 1 application
-            is_monitor_1 = False
-            for app in self.monitor_1_apps:
-                if app.lower() in title or app.lower() in class_name:
-                    is_monitor_1 = True
-                    break
+            # Phase times are accumulated inline, a context manager per window would cost more than the work
+            started = time.perf_counter()
+            process_name = self.get_process_name(window) if rule_engine.uses_process else None
+            pid = self.get_process_id(window) if rule_engine.uses_pid else None
+            target_monitor, rule = rule_engine.classify(window.title, window.class_name, process_name, pid)
+            target_monitor = topology.resolve(target_monitor).number
+            counts[target_monitor] = counts.get(target_monitor, 0) + 1
+            rule_hits[rule] = rule_hits.get(rule, 0) + 1
             
-            if is_monitor_1:
-                target_monitor_1.append(window)
-            else:
-                target_monitor_2.append(window)
-        
-        logger.info(f"Monitor 1 target apps: {len(target_monitor_1)}")
-        logger.info(f"Monitor 2 other apps: {len(target_monitor_2)}")
-        
-        # Show current monitor information for target apps
-        for window in target_monitor_1:
+            classified = time.perf_counter()
             current_monitor = self.get_window_monitor(window)
-            logger.info(f"Target app '{window['title']}' is currently on monitor {current_monitor}")
+            placement_seconds += time.perf_counter() - classified
+            classify_seconds += classified - started
+            if current_monitor == target_monitor:
+                states[hwnd] = WindowState(window.title, window.class_name, rect)
+                in_place += 1
+                continue
+            assignments.append((window, target_monitor))
         
-        # Move windows to monitor 1
-        for window in target_monitor_1:
-            self.move_window_to_monitor(window, 1)
-            time.sleep(0.1)  # Brief delay to avoid conflicts
+        run = self.current_run
+        if run is not None:
+            run.add_phase('classify', classify_seconds)
+            run.add_phase('placement', placement_seconds)
+            for rule, hits in rule_hits.items():
+                run.count_rule(rule.label() if rule is not None else 'default', hits)
+        self.count_metric('unchanged', unchanged)
+        self.count_metric('in_place', in_place)
+        logger.info(f"Windows per target monitor: "
+                    f"{', '.join(f'{monitor}: {counts[monitor]}' for monitor in sorted(counts)) or 'none'}")
+        logger.info(f"{unchanged} windows unchanged since last run, {in_place} already in place, "
+                    f"{len(assignments)} to move")
         
-        # Move windows to monitor 2
-        for window in target_monitor_2:
-            self.move_window_to_monitor(window, 2)
-            time.sleep(0.1)  # Brief delay to avoid conflicts
+        if self.batch_moves:
+            # Build the full plan first, then apply it as one transaction
+            plan = self.plan_moves(assignments)
+            if cancel_event is not None and cancel_event.is_set():
+                self.count_metric('cancelled')
+                logger.info("Window arrangement cancelled")
+                return
+            if plan:
+                self.apply_move_plan(plan)
+            # Remember where moved windows landed (maximized ones are re-read next run)
+            for move in plan:
+                if not move['maximized']:
+                    window = move['window']
+                    rect = (move['x'], move['y'], move['x'] + move['width'], move['y'] + move['height'])
+                    states[window.hwnd] = WindowState(window.title, window.class_name, rect)
+        else:
+            for window, target_monitor in assignments:
+                if cancel_event is not None and cancel_event.is_set():
+                    self.count_metric('cancelled')
+                    logger.info("Window arrangement cancelled")
+                    break
+                self.move_window_to_monitor(window, target_monitor)
         
+        with self._states_lock:
+            if self.states_generation == generation:
+                self.window_states = states
+            else:
+                logger.debug("Config or displays changed during the arrangement, window states discarded")
         logger.info("Window arrangement completed!")
 
+    def arrange_by_rule(self, rule_type, pattern, monitor, cancel_event=None):
+        """Move the windows matching one ad-hoc rule to a monitor, leaving every other window alone"""
+        rule = RuleEngine.compile_rule(0, rule_type, pattern, monitor)
+        if rule is None:
+            return False
+        rule_engine = RuleEngine([rule], cache_size=0)
+        with self.arrange_lock, self.metrics_run('rule', rule_type=rule_type, pattern=pattern, monitor=monitor):
+            logger.info(f"Moving windows matching {rule_type} rule '{pattern}' to monitor {monitor}...")
+            with self.phase('enumerate'):
+                windows = self.get_window_list()
+            self.count_metric('windows', len(windows))
+            with self.phase('classify'):
+                if rule.type == 'process':
+                    # Windows grouped by executable: one comparison per process instead of per window
+                    wanted = normalize_process_name(rule.pattern)
+                    matched = [window for name, records in windows.by_process(self.get_process_name).items()
+                               if normalize_process_name(name) == wanted for window in records]
+                else:
+                    matched = [window for window in windows
+                               if rule_engine.match(window.title, window.class_name, None,
+                                                    self.get_process_id(window) if rule_engine.uses_pid else None)
+                               is not None]
+            self.count_metric('matched', len(matched))
+            plan = self.plan_moves([(window, monitor) for window in matched])
+            if cancel_event is not None and cancel_event.is_set():
+                self.count_metric('cancelled')
+                logger.info(f"Rule '{pattern}' cancelled")
+                return False
+            if plan:
+                self.apply_move_plan(plan)
+            logger.info(f"Rule '{pattern}': {len(matched)} windows matched, {len(plan)} moved")
+            return True
+
+    def plan_layout(self, layout, windows):
+        """Build move plan placing windows into the layout's cells, skipping windows already there"""
+        rule_engine = self.rule_engine
+        
+        def default_target(window_info):
+            process_name = self.get_process_name(window_info) if rule_engine.uses_process else None
+            pid = self.get_process_id(window_info) if rule_engine.uses_pid else None
+            return rule_engine.classify(window_info.title, window_info.class_name, process_name, pid)[0]
+        
+        plan = []
+        topology = self.get_topology()
+        for window_info, monitor, cell in layout.plan(windows, topology, default_target, self.get_process_name,
+                                                     self.get_process_id):
+            maximized = self.is_window_maximized(window_info)
+            if window_info.rect == cell and not maximized:
+                self.count_metric('in_place')
+                continue
+            plan.append({
+                'window': window_info,
+                'monitor': monitor,
+                'x': cell.left,
+                'y': cell.top,
+                'width': cell.width(),
+                'height': cell.height(),
+                'maximized': maximized,
+                'remaximize': False
+            })
+        return plan
+    
+    def apply_layout(self, name, cancel_event=None, requested_at=None):
+        """Place all windows according to the named layout profile"""
+        layout = self.layouts.get(name)
+        if layout is None:
+            logger.error(f"Unknown layout '{name}'")
+            return False
+        with self.arrange_lock, self.metrics_run('layout', requested_at, name=name):
+            logger.info(f"Applying layout '{name}'...")
+            with self.phase('enumerate'):
+                windows = self.get_window_list()
+            self.count_metric('windows', len(windows))
+            start = time.perf_counter()
+            with self.phase('plan'):
+                plan = self.plan_layout(layout, windows)
+            logger.info(f"Layout '{name}' plan: {len(plan)} moves in {(time.perf_counter() - start) * 1000:.1f} ms "
+                        f"(geometry cache {layout.geometry_hits} hits, {layout.geometry_misses} misses)")
+            if cancel_event is not None and cancel_event.is_set():
+                self.count_metric('cancelled')
+                logger.info(f"Layout '{name}' cancelled")
+                return False
+            if plan:
+                self.apply_move_plan(plan)
+            logger.info(f"Layout '{name}' applied")
+            return True
+
+    def save_snapshot(self, path=None, cancel_event=None, requested_at=None):
+        """Save position, size and maximized state of every window
+
+        Runs under arrange_lock, so the snapshot never catches an arrangement,
+        layout or restore halfway through.
+        """
+        path = path or self.snapshot_file
+        try:
+            with self.arrange_lock:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info("Snapshot save cancelled")
+                    return None
+                start = time.perf_counter()
+                windows = self.get_window_list()
+                snapshot = Snapshot.capture(windows, self.get_process_name, self.get_show_state,
+                                            self.get_normal_rect, self.get_topology().signature())
+                snapshot.save(path)
+            logger.info(f"Saved snapshot of {len(snapshot.entries)} windows to {path} "
+                        f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return snapshot
+        except Exception as e:
+            logger.error(f"Failed to save window snapshot: {e}")
+            return None
+    
+    def plan_restore(self, snapshot, windows):
+        """Build move plan returning windows to their snapshot placement, skipping windows already there"""
+        plan = []
+        topology = self.get_topology()
+        for window_info, entry in snapshot.match(windows, self.get_process_name):
+            maximized = self.is_window_maximized(window_info)
+            remaximize = entry.show_state == SW_SHOWMAXIMIZED
+            # Entries hold the normal rect, so compare a maximized window's normal rect too
+            current = self.get_normal_rect(window_info) if maximized else window_info.rect
+            if current == entry.rect and maximized == remaximize:
+                continue
+            monitor = topology.monitor_for_rect(entry.rect)
+            plan.append({
+                'window': window_info,
+                'monitor': monitor.number if monitor is not None else None,
+                'x': entry.rect.left,
+                'y': entry.rect.top,
+                'width': entry.rect.width(),
+                'height': entry.rect.height(),
+                'maximized': maximized,
+                'remaximize': remaximize
+            })
+        return plan
+    
+    def restore_snapshot(self, path=None, cancel_event=None, requested_at=None):
+        """Return every window matching the saved snapshot to its saved placement"""
+        path = path or self.snapshot_file
+        try:
+            snapshot = Snapshot.load(path)
+        except FileNotFoundError:
+            logger.error(f"No window snapshot found at {path}")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to load window snapshot {path}: {e}")
+            return False
+        with self.arrange_lock, self.metrics_run('restore', requested_at, path=path):
+            logger.info(f"Restoring snapshot of {len(snapshot.entries)} windows from {path}...")
+            if not snapshot.same_monitors(self.get_topology().signature()):
+                logger.warning("Monitor configuration changed since the snapshot was taken, "
+                               "windows may be placed off-screen")
+            with self.phase('enumerate'):
+                windows = self.get_window_list()
+            self.count_metric('windows', len(windows))
+            start = time.perf_counter()
+            with self.phase('plan'):
+                plan = self.plan_restore(snapshot, windows)
+            logger.info(f"Snapshot restore plan: {len(plan)} moves in {(time.perf_counter() - start) * 1000:.1f} ms")
+            if cancel_event is not None and cancel_event.is_set():
+                self.count_metric('cancelled')
+                logger.info("Snapshot restore cancelled")
+                return False
+            if plan:
+                self.apply_move_plan(plan)
+            # Restored windows may no longer be where the arrangement left them
+            self.reset_window_states()
+            logger.info("Snapshot restored")
+            return True
+
     def register_hotkeys(self):
         """Register hotkeys with error handling and retry logic"""
+        self.hotkeys_enabled = True
         try:
             # Clear existing hotkeys first
-            if self.hotkey_registered:
-                keyboard.remove_hotkey(self.hotkey)
-                self.hotkey_registered = False
-            if self.exit_hotkey_registered:
-                keyboard.remove_hotkey(self.exit_hotkey)
-                self.exit_hotkey_registered = False
-            if self.reload_hotkey_registered:
-                keyboard.remove_hotkey(self.reload_hotkey)
-                self.reload_hotkey_registered = False
+            self.unregister_hotkeys()
             
             # Register main hotkey
             keyboard.add_hotkey(self.hotkey, self.on_hotkey)
@@ -291,6 +992,21 @@ class WindowArranger:
             self.reload_hotkey_registered = True
             logger.info(f"Successfully registered reload hotkey: {self.reload_hotkey}")
             
+            # Register layout hotkeys
+            for name, layout in self.layouts.items():
+                if layout.hotkey:
+                    keyboard.add_hotkey(layout.hotkey, self.on_layout_hotkey, args=(name,))
+                    self.extra_hotkeys_registered.append(layout.hotkey)
+                    logger.info(f"Successfully registered layout hotkey: {layout.hotkey} ({name})")
+            
+            # Register snapshot hotkeys
+            for hotkey, callback in ((self.snapshot_hotkey, self.on_snapshot_hotkey),
+                                     (self.restore_hotkey, self.on_restore_hotkey)):
+                if hotkey:
+                    keyboard.add_hotkey(hotkey, callback)
+                    self.extra_hotkeys_registered.append(hotkey)
+                    logger.info(f"Successfully registered snapshot hotkey: {hotkey}")
+            
             # Verify hotkeys are working by checking registration status
             logger.debug("Verifying hotkey registration...")
             if self.hotkey_registered and self.exit_hotkey_registered and self.reload_hotkey_registered:
@@ -302,11 +1018,31 @@ class WindowArranger:
             
         except Exception as e:
             logger.error(f"Failed to register hotkeys: {e}")
+            # Remove the hotkeys registered before the failure so a retry starts clean
+            try:
+                self.unregister_hotkeys()
+            except Exception as e:
+                logger.debug(f"Failed to remove partially registered hotkeys: {e}")
             self.hotkey_registered = False
             self.exit_hotkey_registered = False
             self.reload_hotkey_registered = False
+            self.extra_hotkeys_registered = []
             return False
     
+    def unregister_hotkeys(self):
+        """Remove every registered hotkey"""
+        if self.hotkey_registered:
+            keyboard.remove_hotkey(self.hotkey)
+            self.hotkey_registered = False
+        if self.exit_hotkey_registered:
+            keyboard.remove_hotkey(self.exit_hotkey)
+            self.exit_hotkey_registered = False
+        if self.reload_hotkey_registered:
+            keyboard.remove_hotkey(self.reload_hotkey)
+            self.reload_hotkey_registered = False
+        while self.extra_hotkeys_registered:
+            keyboard.remove_hotkey(self.extra_hotkeys_registered.pop())
+    
     def test_hotkey_response(self):
         """Test if hotkeys are still responsive"""
         try:
@@ -318,109 +1054,346 @@ class WindowArranger:
             return False
     
     def on_hotkey(self):
-        """Hotkey callback function"""
-        logger.info("Hotkey detected, starting window arrangement...")
+        """Hotkey callback function: queue an arrangement and return immediately"""
         logger.debug(f"Hotkey callback triggered for: {self.hotkey}")
+        if self.worker.request():
+            logger.info("Hotkey detected, window arrangement queued...")
+        else:
+            logger.info("Hotkey detected, arrangement already pending")
+    
+    def request_placement(self, description, function, *args):
+        """Queue a layout, snapshot save or restore on the placement worker, replacing any pending one"""
+        self.requested_placement = (description, function, args)
+        if self.placement_worker.request():
+            logger.info(f"{description} queued...")
+        else:
+            logger.info(f"{description} replaces pending placement")
+    
+    def on_layout_hotkey(self, name):
+        """Layout hotkey callback: queue the layout and return immediately"""
+        logger.debug(f"Layout hotkey callback triggered for: {name}")
+        self.request_placement(f"Layout '{name}'", self.apply_layout, name)
+    
+    def on_snapshot_hotkey(self):
+        """Snapshot hotkey callback: queue the snapshot save and return immediately"""
+        self.request_placement("Snapshot save", self.save_snapshot, None)
+    
+    def on_restore_hotkey(self):
+        """Restore hotkey callback: queue the snapshot restore and return immediately"""
+        self.request_placement("Snapshot restore", self.restore_snapshot, None)
+    
+    def cancel_arrangement(self):
+        """Cancel the arrangement or layout in progress, if any"""
+        self.worker.cancel()
+        self.placement_worker.cancel()
+    
+    def _run_arrangement(self, cancel_event, requested_at):
+        """Worker job: run one arrangement (its run metrics record keypress-to-first-move latency)"""
         try:
-            self.arrange_windows()
+            self.arrange_windows(cancel_event, requested_at)
             # Update last test time after successful execution
             self.last_hotkey_test = time.time()
             logger.info("Window arrangement completed successfully")
         except Exception as e:
             logger.error(f"Error during window arrangement: {e}")
     
+    def _run_placement(self, cancel_event, requested_at):
+        """Placement worker job: run the most recently requested layout, snapshot save or restore"""
+        description, function, args = self.requested_placement
+        try:
+            function(*args, cancel_event=cancel_event, requested_at=requested_at)
+        except Exception as e:
+            logger.error(f"Error during {description}: {e}")
+    
     def on_exit(self):
         """Exit hotkey callback function"""
         logger.info("Exit hotkey detected, exiting...")
         logger.debug(f"Exit hotkey callback triggered for: {self.exit_hotkey}")
-        # Set exit flag to be handled in main loop
-        global exit_flag
-        exit_flag = True
+        self.cancel_arrangement()
+        # Wake the main loop so it exits immediately
+        exit_event.set()
+        if self.scheduler is not None:
+            self.scheduler.wake()
 
     def on_reload_hotkey(self):
         """Reload hotkey callback function"""
         logger.info("Reload hotkey detected, re-registering hotkeys...")
         logger.debug(f"Reload hotkey callback triggered for: {self.reload_hotkey}")
+        # Re-register from the main loop rather than from inside the keyboard hook callback
+        if self.scheduler is not None:
+            self.scheduler.call_soon(self.reload_hotkeys)
+        else:
+            self.reload_hotkeys()
+
+    def reload_hotkeys(self):
+        """Re-register all hotkeys"""
         if self.register_hotkeys():
             logger.info("Hotkeys re-registered successfully")
         else:
             logger.error("Failed to re-register hotkeys")
 
-    def test_hotkey_immediately(self):
-        """Test if the main hotkey works immediately after registration"""
-        try:
-            logger.debug("Testing main hotkey immediately after registration...")
-            # Try to trigger the hotkey manually to test if it's working
-            # This is a safety check to ensure the callback is properly bound
-            logger.info("Testing hotkey functionality - you should see window arrangement start...")
-            
-            # Check if the hotkey is registered before testing
-            if not self.hotkey_registered:
-                logger.warning("Main hotkey not registered, cannot test")
-                return False
+    def periodic_health_check(self):
+        """Scheduled hotkey health check; reschedules itself"""
+        current_time = time.time()
+        
+        # Check if it's time to test hotkeys
+        if current_time - self.last_hotkey_test >= self.hotkey_test_interval:
+            logger.info("Performing periodic hotkey health check...")
             
-            # Test the callback function directly
-            self.on_hotkey()
-            logger.info("Hotkey test completed successfully")
+            # Test hotkey responsiveness
+            if not self.test_hotkey_response():
+                logger.warning("Hotkey test failed, re-registering hotkeys...")
+                if self.register_hotkeys():
+                    logger.info("Hotkeys re-registered successfully")
+                    self.last_hotkey_test = current_time
+                else:
+                    logger.error("Failed to re-register hotkeys")
+                    # Continue running but log the issue
+            else:
+                logger.info("Hotkey health check passed")
+                self.last_hotkey_test = current_time
+        
+        # Next check is due one interval after the last successful test
+        delay = max(self.last_hotkey_test + self.hotkey_test_interval - time.time(), 1)
+        self.scheduler.call_later(delay, self.periodic_health_check)
+
+    def start_console_input(self):
+        """Read console keys (Ctrl+R reload, Remote Desktop detection) on a background thread"""
+        try:
+            import msvcrt
+        except ImportError:
+            # msvcrt not available on all systems, skip CMD input detection
+            return False
+        
+        def read_console():
+            while not exit_event.is_set():
+                try:
+                    key = msvcrt.getch()  # Blocks until a key is pressed
+                except Exception as e:
+                    logger.debug(f"CMD input detection error: {e}")
+                    return
+                self.scheduler.call_soon(self.on_console_key, key)
+        
+        threading.Thread(target=read_console, name="ConsoleInput", daemon=True).start()
+        return True
+
+    def install_console_ctrl_handler(self):
+        """Exit on Ctrl+C/Ctrl+Break in the CMD window
+
+        The main loop blocks in an unbounded wait, which KeyboardInterrupt does
+        not interrupt on Windows; the handler sets the exit event and wakes it.
+        """
+        try:
+            import win32api
+            import win32con
+        except ImportError:
+            return False
+        
+        def on_ctrl(ctrl_type):
+            if ctrl_type not in (win32con.CTRL_C_EVENT, win32con.CTRL_BREAK_EVENT):
+                return False  # Close/logoff/shutdown: default handling
+            logger.info("Ctrl+C detected in CMD window, exiting...")
+            self.cancel_arrangement()
+            exit_event.set()
+            if self.scheduler is not None:
+                self.scheduler.wake()
             return True
-            
+        
+        try:
+            win32api.SetConsoleCtrlHandler(on_ctrl, True)
         except Exception as e:
-            logger.error(f"Immediate hotkey test failed: {e}")
+            logger.warning(f"Failed to install console Ctrl+C handler: {e}")
             return False
+        self.console_ctrl_handler = on_ctrl  # Keep the callback alive while it is installed
+        return True
+
+    def on_console_key(self, key):
+        """Handle a key typed in the CMD window"""
+        current_time = time.time()
+        # Log the key for debugging
+        logger.debug(f"Key pressed: {key} (hex: {key.hex()})")
+        
+        # Check for Ctrl+R (0x12 = 18)
+        if key == b'\x12':
+            logger.info("Ctrl+R detected in CMD window, re-registering hotkeys...")
+            if self.register_hotkeys():
+                logger.info("Hotkeys re-registered successfully via CMD input")
+                self.last_hotkey_test = current_time
+            else:
+                logger.error("Failed to re-register hotkeys via CMD input")
+        # Check for 'r' or 'R' key with Ctrl modifier
+        elif key in [b'r', b'R']:
+            if keyboard.is_pressed('ctrl'):
+                logger.info("Ctrl+R detected in CMD window, re-registering hotkeys...")
+                if self.register_hotkeys():
+                    logger.info("Hotkeys re-registered successfully via CMD input")
+                    self.last_hotkey_test = current_time
+                else:
+                    logger.error("Failed to re-register hotkeys via CMD input")
+        # Check for Remote Desktop special key codes that indicate hotkey usage
+        elif self.detect_remote_desktop_keys(key):
+            # If detect_remote_desktop_keys returns True, it means hotkeys were re-registered
+            # No need to log here, as the method already logs the re-registration attempt
+            pass
 
     def detect_remote_desktop_keys(self, key):
-        """Detect any key input that might indicate hotkey usage and handle re-registration"""
+        """Detect console input matching a configured hotkey and handle re-registration"""
         # Check if auto-recovery is enabled
         if not self.enable_auto_recovery:
             return False
             
-        current_time = time.time()
+        current_time = time.monotonic()
         
-        # Add current key to history
-        self.rd_key_history.append((key, current_time))
+        # Add current key to the ring buffer and keep only keys within the timeout period
+        self.rd_key_history.add(key, current_time)
+        recent_keys = self.rd_key_history.recent(current_time, self.rd_key_timeout)
         
-        # Keep only recent keys within timeout period
-        self.rd_key_history = [(k, t) for k, t in self.rd_key_history if current_time - t < self.rd_key_timeout]
+        # A hotkey combination reaching the console means the global hook has lost it
+        # Ctrl+letter reaches the console as a control character (Ctrl+Alt+I as Tab): check the modifiers are down
+        combo = self.rd_key_matcher.match(recent_keys, keyboard.is_pressed if keyboard is not None else None)
+        if combo is None:
+            return False
+        logger.info(f"Hotkey '{combo}' typed in console ({[k.hex() for k in recent_keys]}), hotkeys may be lost")
         
-        # Check for any key input that might indicate hotkey usage
-        # Instead of hardcoding specific keys, we'll detect any key sequence
-        if len(self.rd_key_history) >= 2:
-            # If we have multiple keys in sequence within the timeout period,
-            # it might indicate that someone is trying to use hotkeys
-            logger.info(f"Key sequence detected: {[k.hex() for k, _ in self.rd_key_history]}")
-            
-            # Check if any of the recent keys might be part of a hotkey combination
-            # This is a more flexible approach that works with any configured hotkey
-            recent_keys = [k for k, _ in self.rd_key_history]
-            
-            # If we detect multiple key presses in sequence, it might indicate hotkey usage
-            # We'll re-register hotkeys to ensure they work
-            logger.info("Potential hotkey usage detected, re-registering hotkeys...")
-            if self.register_hotkeys():
-                logger.info("Hotkeys re-registered after key sequence detection")
-                self.last_hotkey_test = current_time
-                # Clear history after successful re-registration
-                self.rd_key_history.clear()
-                
-                # Test the hotkey immediately to ensure it's working
-                logger.info("Testing hotkey functionality after re-registration...")
-                self.test_hotkey_immediately()
-                
-                return True
-            else:
-                logger.error("Failed to re-register hotkeys after key sequence detection")
+        if not self.rd_reregister_limiter.allow(current_time):
+            logger.debug(f"Hotkey re-registration rate-limited (next interval {self.rd_reregister_limiter.interval:.0f}s)")
+            return False
+        
+        logger.info("Re-registering hotkeys...")
+        if self.register_hotkeys():
+            logger.info("Hotkeys re-registered after key sequence detection")
+            self.last_hotkey_test = time.time()
+            # Clear history after successful re-registration
+            self.rd_key_history.clear()
+            return True
+        else:
+            logger.error("Failed to re-register hotkeys after key sequence detection")
         
         return False
 
-def main():
+def profile_arrangement(arranger, path):
+    """Run one arrangement under cProfile and write the stats to path"""
+    import cProfile
+    import pstats
+    
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        arranger.arrange_windows()
+    finally:
+        profiler.disable()
+    profiler.dump_stats(path)
+    logger.info(f"Profile of one arrangement written to {path}")
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(20)
+
+def import_times(module='window_arranger'):
+    """Import module in a fresh interpreter with -X importtime, return [(package, cumulative seconds)]
+
+    Only the packages module imports directly are listed, most expensive
+    first, followed by ('total', seconds) for the module itself.
+    """
+    import subprocess
+    
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    times = []
+    total = None
+    # Lines look like "import time:  self [us] | cumulative | <indent>package", children before their parent
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2][1:].rstrip()  # Drop the space after the separator, keep the nesting indent
+        seconds = int(fields[1]) / 1e6
+        if not name.startswith(' '):
+            if name == module:
+                total = seconds
+                break
+            times = []  # Interpreter startup imports, not ours
+        elif not name.startswith('   '):
+            times.append((name.strip(), seconds))
+    times.sort(key=lambda item: -item[1])
+    if total is not None:
+        times.append(('total', total))
+    return times
+
+def measure_startup(backend=None):
+    """Print the import cost and the initialization cost of each component, return them as dicts
+
+    Imports are timed in a fresh interpreter; initialization steps run in
+    this process in startup order, followed by the lazily loaded parts
+    (UIA desktop, metrics endpoint) that are only paid for on first use.
+    """
+    import importlib
+    
+    init = {}
+    
+    def step(name, function):
+        start = time.perf_counter()
+        try:
+            result = function()
+        except Exception as e:
+            logger.warning(f"Startup step '{name}' failed: {e}")
+            init[name] = None
+            return None
+        init[name] = time.perf_counter() - start
+        return result
+    
+    imports = dict(import_times())
+    config = step('config file', lambda: load_config_file(CONFIG_FILE)) or {}
+    step('rules and layouts', lambda: (RuleEngine.from_config(config), load_layouts(config)))
+    if backend is None:
+        backend = step('backend', lambda: Win32Backend(enumeration=config.get("window_enumeration", "win32"),
+                                                       fetch_workers=config.get("fetch_workers", 8),
+                                                       fetch_timeout=config.get("window_fetch_timeout", 2.0)))
+    if backend is not None:
+        arranger = step('arranger', lambda: WindowArranger(backend=backend))
+        if arranger is not None:
+            step('monitor topology', arranger.get_topology)
+        step('window enumeration', backend.list_windows)
+        if isinstance(backend, Win32Backend):
+            step('UIA desktop (lazy)', lambda: backend.desktop)
+    if 'http.server' not in sys.modules:
+        step('metrics endpoint (lazy)', lambda: importlib.import_module('http.server'))
+    
+    def report(title, times):
+        print(title)
+        for name, seconds in times.items():
+            print(f"  {name:<28} {'failed' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
+    
+    report("Import cost (fresh interpreter, cumulative per package):", imports)
+    report("Initialization cost:", init)
+    return {'imports': imports, 'init': init}
+
+def main(argv=None):
     """Main function"""
-    global exit_flag
-    exit_flag = False
+    parser = argparse.ArgumentParser(description="Move windows to monitors with a hotkey")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="arrange windows once under cProfile, write the stats to FILE and exit")
+    parser.add_argument('--startup-time', action='store_true',
+                        help="report the import and initialization cost of each component and exit")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="record every window system call with its latency to FILE (.gz to compress) "
+                             "for replay with desktop_trace.py")
+    args = parser.parse_args(argv)
+    exit_event.clear()
+    log_pipeline.start()
+    
+    if args.startup_time:
+        measure_startup()
+        sys.exit(0)
     
     logger.info("Window Arranger starting...")
     
     # Create window arranger instance
-    arranger = WindowArranger()
+    arranger = WindowArranger(trace_file=args.trace)
+    if args.profile:
+        profile_arrangement(arranger, args.profile)
+        sys.exit(0)
+    scheduler = Scheduler()
+    arranger.scheduler = scheduler
     
     # Initial hotkey registration
     if not arranger.register_hotkeys():
@@ -430,88 +1403,78 @@ def main():
     # Set initial test time
     arranger.last_hotkey_test = time.time()
     
+    # Daemon mode: track windows from events in the background
+    if arranger.daemon_mode:
+        arranger.start_tracking()
+    
     logger.info(f"Program started, waiting for hotkeys...")
     logger.info(f"Press {arranger.hotkey} to arrange windows")
     logger.info(f"Press {arranger.exit_hotkey} to exit program")
     logger.info(f"Press {arranger.reload_hotkey} to re-register hotkeys")
+    for name, layout in arranger.layouts.items():
+        if layout.hotkey:
+            logger.info(f"Press {layout.hotkey} to apply layout '{name}'")
+    if arranger.snapshot_hotkey:
+        logger.info(f"Press {arranger.snapshot_hotkey} to save window positions")
+    if arranger.restore_hotkey:
+        logger.info(f"Press {arranger.restore_hotkey} to restore saved window positions")
     logger.info("To test CMD input: Press Ctrl+R in this window")
     logger.info("Auto-recovery: Automatically re-registers hotkeys when key sequences are detected")
     logger.info("Tip: After Remote Desktop, try pressing your hotkey to test if it works")
     
+    # Reload the config file when it is edited
+    if arranger.config.get("config_watch", True):
+        arranger.start_config_watch()
+    
+    # Optional Prometheus/JSON metrics endpoint on localhost
+    metrics_port = arranger.config.get("metrics_port")
+    if metrics_port:
+        try:
+            arranger.metrics_server = MetricsServer(arranger.metrics, metrics_port)
+            arranger.metrics_server.start()
+        except OSError as e:
+            logger.error(f"Failed to start metrics endpoint on port {metrics_port}: {e}")
+    
+    # Optional line-delimited JSON command API on localhost
+    control_port = arranger.config.get("control_port")
+    if control_port and not arranger.config.get("control_token"):
+        logger.error("control_port is set without a control_token, control API not started")
+    elif control_port:
+        from control_server import ControlServer
+        try:
+            arranger.control_server = ControlServer(arranger, control_port, arranger.config["control_token"])
+            arranger.control_server.start()
+        except OSError as e:
+            logger.error(f"Failed to start control API on port {control_port}: {e}")
+    
     try:
-        # Main loop with hotkey monitoring
-        while not exit_flag:
-            current_time = time.time()
-            
-            # Check if it's time to test hotkeys
-            if current_time - arranger.last_hotkey_test > arranger.hotkey_test_interval:
-                logger.info("Performing periodic hotkey health check...")
-                
-                # Test hotkey responsiveness
-                if not arranger.test_hotkey_response():
-                    logger.warning("Hotkey test failed, re-registering hotkeys...")
-                    if arranger.register_hotkeys():
-                        logger.info("Hotkeys re-registered successfully")
-                        arranger.last_hotkey_test = current_time
-                    else:
-                        logger.error("Failed to re-register hotkeys")
-                        # Continue running but log the issue
-                else:
-                    logger.info("Hotkey health check passed")
-                    arranger.last_hotkey_test = current_time
-            
-            # Check for Ctrl+R input in CMD window for manual hotkey reload
-            try:
-                import msvcrt
-                if msvcrt.kbhit():
-                    key = msvcrt.getch()
-                    # Log the key for debugging
-                    logger.debug(f"Key pressed: {key} (hex: {key.hex()})")
-                    
-                    # Check for Ctrl+R (0x12 = 18)
-                    if key == b'\x12':
-                        logger.info("Ctrl+R detected in CMD window, re-registering hotkeys...")
-                        if arranger.register_hotkeys():
-                            logger.info("Hotkeys re-registered successfully via CMD input")
-                            arranger.last_hotkey_test = current_time
-                        else:
-                            logger.error("Failed to re-register hotkeys via CMD input")
-                    # Check for 'r' or 'R' key with Ctrl modifier
-                    elif key in [b'r', b'R']:
-                        if keyboard.is_pressed('ctrl'):
-                            logger.info("Ctrl+R detected in CMD window, re-registering hotkeys...")
-                            if arranger.register_hotkeys():
-                                logger.info("Hotkeys re-registered successfully via CMD input")
-                                arranger.last_hotkey_test = current_time
-                            else:
-                                logger.error("Failed to re-register hotkeys via CMD input")
-                    # Check for Remote Desktop special key codes that indicate hotkey usage
-                    elif arranger.detect_remote_desktop_keys(key):
-                        # If detect_remote_desktop_keys returns True, it means hotkeys were re-registered
-                        # No need to log here, as the method already logs the re-registration attempt
-                        pass
-            except ImportError:
-                # msvcrt not available on all systems, skip CMD input detection
-                pass
-            except Exception as e:
-                # Log any errors in CMD input detection for debugging
-                logger.debug(f"CMD input detection error: {e}")
-                pass
-            
-            # Brief sleep to prevent high CPU usage
-            time.sleep(1)
+        # Session events re-register hotkeys when a session switch drops them; without them, check periodically
+        if not arranger.session_events:
+            logger.info("Session change notifications unavailable, checking hotkeys periodically")
+            scheduler.call_later(arranger.hotkey_test_interval, arranger.periodic_health_check)
+        
+        # Check for Ctrl+R input in CMD window for manual hotkey reload
+        arranger.start_console_input()
+        # Ctrl+C sets the exit event; the scheduler wait below is not interrupted by KeyboardInterrupt on Windows
+        arranger.install_console_ctrl_handler()
+        
+        # Sleep until a timer is due or a hotkey/console event arrives; exit hotkey wakes it immediately
+        scheduler.run(exit_event)
             
     except Exception as e:
         logger.error(f"Program error: {e}")
     finally:
         # Cleanup
+        if arranger.control_server is not None:
+            arranger.control_server.stop()
+        arranger.worker.stop()
+        arranger.placement_worker.stop()
+        arranger.stop_tracking()
+        arranger.stop_config_watch()
+        if arranger.metrics_server is not None:
+            arranger.metrics_server.stop()
         try:
-            if arranger.hotkey_registered:
-                keyboard.remove_hotkey(arranger.hotkey)
-            if arranger.exit_hotkey_registered:
-                keyboard.remove_hotkey(arranger.exit_hotkey)
-            if arranger.reload_hotkey_registered:
-                keyboard.remove_hotkey(arranger.reload_hotkey)
+            arranger.unregister_hotkeys()
             logger.info("Hotkeys unregistered")
         except Exception as e:
             logger.warning(f"Warning when unregistering hotkeys: {e}")
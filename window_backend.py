@@ -0,0 +1,1021 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import queue
+import ntpath
+import ctypes
+import random
+import threading
+import logging
+from ctypes import wintypes
+from collections import Counter
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# Window show states (same values as win32con.SW_*)
+SW_SHOWNORMAL = 1
+SW_SHOWMINIMIZED = 2
+SW_SHOWMAXIMIZED = 3
+SW_MAXIMIZE = 3
+SW_RESTORE = 9
+
+
+class Rect:
+    """Rectangle in virtual screen coordinates (compatible with pywinauto RECT)"""
+    __slots__ = ('left', 'top', 'right', 'bottom')
+
+    def __init__(self, left=0, top=0, right=0, bottom=0):
+        self.left = left
+        self.top = top
+        self.right = right
+        self.bottom = bottom
+
+    def width(self):
+        return self.right - self.left
+
+    def height(self):
+        return self.bottom - self.top
+
+    def as_tuple(self):
+        return (self.left, self.top, self.right, self.bottom)
+
+    def __eq__(self, other):
+        if not isinstance(other, Rect):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        return f"Rect({self.left}, {self.top}, {self.right}, {self.bottom})"
+
+
+class WindowRecord:
+    """One top-level window as read during enumeration
+
+    pid, process and monitor start out unknown and are filled in by the
+    arranger on first use, so every stage of a run shares one lookup per window.
+    """
+    __slots__ = ('hwnd', 'title', 'class_name', 'rect', 'placement', 'pid', 'process', 'monitor', 'topology')
+
+    def __init__(self, hwnd, title, class_name, rect, placement=None):
+        self.hwnd = hwnd
+        self.title = title
+        self.class_name = class_name
+        self.rect = rect
+        self.placement = placement  # Show state if the enumeration path collected it, else None
+        self.pid = None  # Owning process id, None until looked up
+        self.process = None  # Executable name ('' if it could not be read), None until looked up
+        self.monitor = None  # Current monitor number, valid for `topology`
+        self.topology = None
+
+    def __repr__(self):
+        return f"WindowRecord({self.hwnd:#x}, {self.title!r}, {self.class_name!r}, {self.rect!r})"
+
+
+class FetchPool:
+    """Fixed set of daemon worker threads running submitted calls, for ConcurrentFetcher
+
+    ThreadPoolExecutor joins its threads at interpreter exit, so one fetch
+    hung on an unresponsive window would keep the process from exiting.
+    """
+
+    def __init__(self, workers, initializer=None):
+        self.workers = workers
+        self._tasks = queue.SimpleQueue()
+        for i in range(workers):
+            threading.Thread(target=self._work, args=(initializer,), name=f"WindowFetch_{i}",
+                             daemon=True).start()
+
+    def submit(self, function, *args):
+        """Queue function(*args) and return a Future for its result"""
+        future = Future()
+        self._tasks.put((future, function, args))
+        return future
+
+    def shutdown(self):
+        """Let idle workers exit; a worker stuck in a call exits once the call returns"""
+        for _ in range(self.workers):
+            self._tasks.put(None)
+
+    def _work(self, initializer):
+        if initializer is not None:
+            try:
+                initializer()
+            except Exception as e:
+                logger.error(f"Fetch worker initialization failed: {e}")
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            future, function, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class ConcurrentFetcher:
+    """Run per-window property fetches on a bounded worker pool
+
+    Results come back in input order, so output matches the serial path.
+    A fetch that runs longer than `timeout` seconds is skipped and logged
+    instead of blocking the rest; if every worker is stuck on a hung window
+    the pool is replaced so the remaining windows still get fetched.
+    Workers are daemon threads, so a fetch that never returns is abandoned
+    at exit instead of keeping the interpreter alive.
+    """
+
+    def __init__(self, workers=8, timeout=2.0, initializer=None):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.initializer = initializer
+        self.timeouts = 0
+        self._executor = None
+        self._stuck = set()  # Futures still running after their timeout, on the current executor
+
+    def _new_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._executor = FetchPool(self.workers, self.initializer)
+        self._stuck = set()
+
+    def map(self, fetch, items):
+        """Return [fetch(item) for item in items], with None for failed or timed out items"""
+        items = list(items)
+        results = [None] * len(items)
+        if not items:
+            return results
+        self._stuck = {f for f in self._stuck if not f.done()}
+        if self._executor is None or len(self._stuck) >= self.workers:
+            self._new_executor()
+
+        started = {}
+
+        def run(index):
+            started[index] = time.monotonic()
+            return fetch(items[index])
+
+        futures = {self._executor.submit(run, i): i for i in range(len(items))}
+        pending = set(futures)
+        poll = min(self.timeout / 4, 0.05)
+        while pending:
+            done, pending = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.debug(f"Fetch failed for item {index}: {e}")
+
+            now = time.monotonic()
+            for future in [f for f in pending if futures[f] in started and now - started[futures[f]] > self.timeout]:
+                pending.discard(future)
+                self._stuck.add(future)
+                self.timeouts += 1
+                logger.warning(f"Window fetch timed out after {self.timeout}s, skipping window {items[futures[future]]!r}")
+
+            # Every worker is stuck on a hung window: move the rest to a fresh pool
+            self._stuck = {f for f in self._stuck if not f.done()}
+            if pending and len(self._stuck) >= self.workers:
+                queued = [f for f in pending if f.cancel()]
+                self._new_executor()
+                for future in queued:
+                    pending.discard(future)
+                    index = futures.pop(future)
+                    replacement = self._executor.submit(run, index)
+                    futures[replacement] = index
+                    pending.add(replacement)
+        return results
+
+
+class WindowBackend:
+    """Interface between WindowArranger and the window system
+
+    A backend covers window enumeration, placement queries, moves and
+    monitor geometry. Windows are returned as WindowRecord objects, with
+    the show state in `placement` when the enumeration path collects it.
+    """
+
+    def list_windows(self):
+        """Return WindowRecords for all visible top-level windows with a title"""
+        raise NotImplementedError
+
+    def get_show_state(self, hwnd):
+        """Return the window show state (SW_SHOWNORMAL, SW_SHOWMAXIMIZED, ...)"""
+        raise NotImplementedError
+
+    def show_window(self, hwnd, command):
+        """Change the window show state (SW_RESTORE, SW_MAXIMIZE, ...)"""
+        raise NotImplementedError
+
+    def move_window(self, hwnd, x, y, width, height):
+        """Move and resize a window"""
+        raise NotImplementedError
+
+    def move_windows(self, moves):
+        """Move and resize several windows given as (hwnd, x, y, width, height) tuples"""
+        for move in moves:
+            self.move_window(*move)
+
+    def get_window_rect(self, hwnd):
+        """Return the current window Rect"""
+        raise NotImplementedError
+
+    def get_normal_rect(self, hwnd):
+        """Return the Rect the window takes when restored, which differs from its current Rect while maximized"""
+        return self.get_window_rect(hwnd)
+
+    def get_process_name(self, hwnd):
+        """Return the executable name (e.g. 'opera.exe') of the process owning the window"""
+        return self.get_process_image(self.get_window_pid(hwnd))
+
+    def get_window_pid(self, hwnd):
+        """Return the id of the process owning the window (0 if the window is gone)"""
+        raise NotImplementedError
+
+    def get_process_image(self, pid):
+        """Return the executable name of a process; this opens the process, so callers should cache it"""
+        raise NotImplementedError
+
+    def get_window_info(self, hwnd):
+        """Return the WindowRecord of one window, or None if it is gone, hidden or untitled"""
+        raise NotImplementedError
+
+    def watch_window_events(self, callback):
+        """Call callback(event, hwnd) for top-level window events, return False if unsupported
+
+        Events are 'create', 'destroy', 'show', 'hide', 'move' and 'name'.
+        Callbacks run on the backend's event thread and must return quickly.
+        """
+        return False
+
+    def get_screen_metrics(self):
+        """Return primary and virtual screen geometry as a dict"""
+        raise NotImplementedError
+
+    def get_monitors(self):
+        """Return a list of monitor dicts with 'device', 'monitor', 'work' and 'primary'"""
+        raise NotImplementedError
+
+    def watch_display_changes(self, callback):
+        """Call callback whenever the display configuration changes, return False if unsupported"""
+        return False
+
+    def watch_session_changes(self, callback):
+        """Call callback(event, session_id) for changes of the session, return False if unsupported
+
+        Events are the SESSION_EVENTS names: console/remote connect and
+        disconnect, logon, logoff, lock, unlock and remote control. Callbacks
+        run on the backend's notification thread and must return quickly.
+        """
+        return False
+
+    def sleep(self, seconds):
+        """Wait for the window system to settle"""
+        time.sleep(seconds)
+
+    def mark(self, event, **fields):
+        """Note an arranger event (config load, run start or end); only trace-recording backends use it"""
+
+
+# Window enumeration engines: one-pass EnumWindows, or the UIA tree walk
+ENUMERATION_METHODS = ('win32', 'uia')
+
+# DwmGetWindowAttribute attribute for cloaked (hidden UWP / other virtual desktop) windows
+DWMWA_CLOAKED = 14
+
+# WinEvent hook events for top-level window tracking
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+EVENT_OBJECT_CLOAKED = 0x8017
+EVENT_OBJECT_UNCLOAKED = 0x8018
+WIN_EVENT_NAMES = {
+    EVENT_OBJECT_CREATE: 'create',
+    EVENT_OBJECT_DESTROY: 'destroy',
+    EVENT_OBJECT_SHOW: 'show',
+    EVENT_OBJECT_HIDE: 'hide',
+    EVENT_OBJECT_LOCATIONCHANGE: 'move',
+    EVENT_OBJECT_NAMECHANGE: 'name',
+    # Switching virtual desktops cloaks the windows of the old desktop and uncloaks the new ones
+    EVENT_OBJECT_CLOAKED: 'hide',
+    EVENT_OBJECT_UNCLOAKED: 'show',
+}
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+GA_ROOT = 2
+
+# OpenProcess access right that is enough to query the image name, even of elevated processes
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+# Broadcast messages that signal a monitor layout or work area change
+WM_DISPLAYCHANGE = 0x007E
+WM_SETTINGCHANGE = 0x001A
+SPI_SETWORKAREA = 0x002F
+
+# Session change notifications (WTSRegisterSessionNotification), wparam of WM_WTSSESSION_CHANGE
+WM_WTSSESSION_CHANGE = 0x02B1
+NOTIFY_FOR_THIS_SESSION = 0
+MONITOR_DEFAULTTONEAREST = 2
+NOTIFY_WINDOW_TIMEOUT = 5.0  # Max wait for the notification thread to report its registrations
+SESSION_EVENTS = {
+    0x1: 'console-connect',
+    0x2: 'console-disconnect',
+    0x3: 'remote-connect',
+    0x4: 'remote-disconnect',
+    0x5: 'logon',
+    0x6: 'logoff',
+    0x7: 'lock',
+    0x8: 'unlock',
+    0x9: 'remote-control',
+}
+
+
+def enum_display_monitors():
+    """Return monitor dicts for all displays from EnumDisplayMonitors/GetMonitorInfo"""
+    import win32api
+    import win32con
+    monitors = []
+    for hmonitor, _, _ in win32api.EnumDisplayMonitors():
+        info = win32api.GetMonitorInfo(hmonitor)
+        monitors.append({
+            'device': info['Device'],
+            'monitor': Rect(*info['Monitor']),
+            'work': Rect(*info['Work']),
+            'primary': info['Flags'] & win32con.MONITORINFOF_PRIMARY != 0
+        })
+    return monitors
+
+
+class Win32Backend(WindowBackend):
+    """Live Windows desktop accessed through pywinauto and pywin32"""
+
+    def __init__(self, enumeration='win32', fetch_workers=8, fetch_timeout=2.0):
+        if enumeration not in ENUMERATION_METHODS:
+            logger.warning(f"Unknown window enumeration method '{enumeration}', using 'win32'")
+            enumeration = 'win32'
+        self.enumeration = enumeration
+        # pywin32 modules and DLL handles are resolved once here instead of on every call
+        import win32api
+        import win32con
+        import win32gui
+        import win32process
+        self.win32api = win32api
+        self.win32con = win32con
+        self.win32gui = win32gui
+        self.win32process = win32process
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+        self.dwmapi = ctypes.windll.dwmapi
+        # pywinauto and the UIA COM objects are only needed for 'uia' enumeration: created on first use
+        self._desktop = None
+        self._desktop_lock = threading.Lock()
+        # UIA property reads are cross-process round trips: spread them over a worker pool
+        self.fetcher = ConcurrentFetcher(fetch_workers, fetch_timeout, initializer=self._init_worker_thread) \
+            if fetch_workers > 1 else None
+        self._display_callbacks = []
+        self._session_callbacks = []
+        self._notify_thread = None
+        self._notify_ready = threading.Event()  # Set once the notification thread has registered (or failed to)
+        self._notify_window = False  # Hidden notification window created (display changes delivered)
+        self._session_notifications = False  # WTSRegisterSessionNotification succeeded
+        self._event_callbacks = []
+        self._event_thread = None
+
+    @staticmethod
+    def _init_worker_thread():
+        """Join the COM multithreaded apartment so UIA elements can be used from pool threads"""
+        import pythoncom
+        pythoncom.CoInitializeEx(pythoncom.COINIT_MULTITHREADED)
+
+    @property
+    def desktop(self):
+        """pywinauto UIA desktop, created on first use"""
+        if self._desktop is None:
+            with self._desktop_lock:
+                if self._desktop is None:
+                    from pywinauto import Desktop
+                    self._desktop = Desktop(backend="uia")
+        return self._desktop
+
+    def list_windows(self):
+        if self.enumeration == 'win32':
+            try:
+                return self._list_windows_win32()
+            except Exception as e:
+                logger.warning(f"EnumWindows enumeration failed: {e}, falling back to UIA")
+        return self._list_windows_uia()
+
+    def _list_windows_win32(self):
+        """Collect title, class, rect and placement of all top-level windows in one EnumWindows pass"""
+
+        windows = []
+
+        def enum_window_proc(hwnd, _):
+            window = self._read_window(hwnd)
+            if window is not None:
+                windows.append(window)
+            return True
+
+        self.win32gui.EnumWindows(enum_window_proc, None)
+        return windows
+
+    def _read_window(self, hwnd):
+        """Read one top-level window with user32 calls, None if it is hidden, untitled or cloaked"""
+        win32gui = self.win32gui
+        if not win32gui.IsWindowVisible(hwnd):
+            return None
+        title = win32gui.GetWindowText(hwnd)
+        if not title:
+            return None
+        # Skip cloaked windows, which UIA does not report either
+        cloaked = ctypes.c_int(0)
+        self.dwmapi.DwmGetWindowAttribute(hwnd, DWMWA_CLOAKED, ctypes.byref(cloaked), ctypes.sizeof(cloaked))
+        if cloaked.value:
+            return None
+        return WindowRecord(hwnd, title, win32gui.GetClassName(hwnd), Rect(*win32gui.GetWindowRect(hwnd)),
+                            win32gui.GetWindowPlacement(hwnd)[1])
+
+    def get_window_info(self, hwnd):
+        if not self.win32gui.IsWindow(hwnd):
+            return None
+        return self._read_window(hwnd)
+
+    def watch_window_events(self, callback):
+        """Subscribe to object events with SetWinEventHook on a background message loop thread"""
+        self._event_callbacks.append(callback)
+        if self._event_thread is None:
+            self._event_thread = threading.Thread(target=self._run_event_hook, name="WinEventHook", daemon=True)
+            self._event_thread.start()
+        return True
+
+    def _run_event_hook(self):
+        user32 = self.user32
+        user32.GetAncestor.argtypes = [wintypes.HWND, wintypes.UINT]
+        user32.GetAncestor.restype = wintypes.HWND
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+        def win_event_proc(hook, event, hwnd, id_object, id_child, thread_id, timestamp):
+            # Only whole-window events for top-level windows
+            if id_object != OBJID_WINDOW or id_child != 0 or not hwnd:
+                return
+            name = WIN_EVENT_NAMES.get(event)
+            if name is None:
+                return
+            if name != 'destroy' and user32.GetAncestor(hwnd, GA_ROOT) != hwnd:
+                return
+            for callback in self._event_callbacks:
+                try:
+                    callback(name, hwnd)
+                except Exception as e:
+                    logger.error(f"Window event callback failed: {e}")
+
+        # Keep a reference so the callback is not garbage collected while the hook is active
+        self._win_event_proc = WinEventProc(win_event_proc)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        # One hook per contiguous run of handled events: a single range would also subscribe to the
+        # frequent reorder, focus, selection and state change events (0x8004-0x800A) in between
+        ranges = ((EVENT_OBJECT_CREATE, EVENT_OBJECT_HIDE),
+                  (EVENT_OBJECT_LOCATIONCHANGE, EVENT_OBJECT_NAMECHANGE),
+                  (EVENT_OBJECT_CLOAKED, EVENT_OBJECT_UNCLOAKED))
+        hooks = [user32.SetWinEventHook(first, last, None, self._win_event_proc, 0, 0,
+                                        WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+                 for first, last in ranges]
+        if not all(hooks[:2]):
+            for hook in hooks:
+                if hook:
+                    user32.UnhookWinEvent(hook)
+            logger.error("SetWinEventHook failed, window events unavailable")
+            return
+        if not hooks[2]:
+            logger.warning("Cloak event hook failed, virtual desktop switches are not tracked")
+        self.win32gui.PumpMessages()
+
+    def _list_windows_uia(self):
+        """Walk the UIA desktop tree (four cross-process calls per window)"""
+        windows = self.desktop.windows()
+        if self.fetcher is not None:
+            results = self.fetcher.map(self._read_uia_window, windows)
+        else:
+            results = [self._read_uia_window(window) for window in windows]
+        return [window for window in results if window is not None]
+
+    @staticmethod
+    def _read_uia_window(window):
+        try:
+            if window.is_visible() and window.window_text():
+                rect = window.rectangle()
+                return WindowRecord(window.handle, window.window_text(), window.class_name(),
+                                    Rect(rect.left, rect.top, rect.right, rect.bottom))
+        except Exception:
+            pass
+        return None
+
+    def get_show_state(self, hwnd):
+        # GetWindowPlacement returns (flags, showCmd, ptMin, ptMax, rcNormal)
+        return self.win32gui.GetWindowPlacement(hwnd)[1]
+
+    def show_window(self, hwnd, command):
+        self.win32gui.ShowWindow(hwnd, command)
+
+    def move_window(self, hwnd, x, y, width, height):
+        self.win32gui.SetWindowPos(hwnd, self.win32con.HWND_TOP, x, y, width, height,
+                                   self.win32con.SWP_SHOWWINDOW)
+
+    def move_windows(self, moves):
+        """Apply all moves in one BeginDeferWindowPos/EndDeferWindowPos transaction"""
+        try:
+            win32gui, win32con = self.win32gui, self.win32con
+            hdwp = win32gui.BeginDeferWindowPos(len(moves))
+            for hwnd, x, y, width, height in moves:
+                hdwp = win32gui.DeferWindowPos(hdwp, hwnd, win32con.HWND_TOP, x, y, width, height,
+                                               win32con.SWP_SHOWWINDOW)
+            win32gui.EndDeferWindowPos(hdwp)
+        except Exception as e:
+            # One bad handle aborts the whole transaction, move windows one by one instead
+            logger.warning(f"Deferred window positioning failed: {e}, moving windows individually")
+            for move in moves:
+                try:
+                    self.move_window(*move)
+                except Exception as move_error:
+                    logger.error(f"Failed to move window {move[0]}: {move_error}")
+
+    def get_window_rect(self, hwnd):
+        return Rect(*self.win32gui.GetWindowRect(hwnd))
+
+    def get_normal_rect(self, hwnd):
+        left, top, right, bottom = self.win32gui.GetWindowPlacement(hwnd)[4]
+        # rcNormalPosition is in workspace coordinates: shift by the work area offset of the window's monitor
+        info = self.win32api.GetMonitorInfo(self.win32api.MonitorFromWindow(hwnd, MONITOR_DEFAULTTONEAREST))
+        dx = info['Work'][0] - info['Monitor'][0]
+        dy = info['Work'][1] - info['Monitor'][1]
+        return Rect(left + dx, top + dy, right + dx, bottom + dy)
+
+    def get_window_pid(self, hwnd):
+        try:
+            return self.win32process.GetWindowThreadProcessId(hwnd)[1]
+        except self.win32gui.error:
+            return 0
+
+    def get_process_image(self, pid):
+        kernel32 = self.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            raise OSError(f"Cannot open process {pid}")
+        try:
+            buffer = ctypes.create_unicode_buffer(1024)
+            size = ctypes.c_ulong(len(buffer))
+            if not kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+                raise OSError(f"Cannot query image name of process {pid}")
+            return ntpath.basename(buffer.value)
+        finally:
+            kernel32.CloseHandle(handle)
+
+    def get_screen_metrics(self):
+        metric, win32con = self.win32api.GetSystemMetrics, self.win32con
+        return {
+            'primary_width': metric(win32con.SM_CXSCREEN),
+            'primary_height': metric(win32con.SM_CYSCREEN),
+            'virtual_left': metric(win32con.SM_XVIRTUALSCREEN),
+            'virtual_top': metric(win32con.SM_YVIRTUALSCREEN),
+            'virtual_width': metric(win32con.SM_CXVIRTUALSCREEN),
+            'virtual_height': metric(win32con.SM_CYVIRTUALSCREEN),
+            'monitor_count': metric(win32con.SM_CMONITORS)
+        }
+
+    def watch_display_changes(self, callback):
+        """Listen for WM_DISPLAYCHANGE on a hidden top-level window in a background thread"""
+        self._display_callbacks.append(callback)
+        self._start_notify_window()
+        return self._notify_window
+
+    def watch_session_changes(self, callback):
+        """Listen for WM_WTSSESSION_CHANGE on the hidden notification window"""
+        self._session_callbacks.append(callback)
+        self._start_notify_window()
+        return self._session_notifications
+
+    def _start_notify_window(self):
+        """Start the notification thread if needed and wait until it has registered its notifications"""
+        if self._notify_thread is None:
+            self._notify_thread = threading.Thread(target=self._run_notify_window,
+                                                   name="NotificationWindow", daemon=True)
+            self._notify_thread.start()
+        if not self._notify_ready.wait(NOTIFY_WINDOW_TIMEOUT):
+            logger.warning(f"Notification window not ready after {NOTIFY_WINDOW_TIMEOUT:.0f}s")
+
+    def _run_notify_window(self):
+        """Create the hidden notification window and pump its messages"""
+        try:
+            wc = self.win32gui.WNDCLASS()
+            wc.lpszClassName = "WindowArrangerNotify"
+            wc.hInstance = self.win32api.GetModuleHandle(None)
+            wc.lpfnWndProc = self._notify_wnd_proc
+            class_atom = self.win32gui.RegisterClass(wc)
+            # Broadcast messages are not delivered to message-only windows, so use a hidden top-level one
+            hwnd = self.win32gui.CreateWindow(class_atom, "Window Arranger", 0, 0, 0, 0, 0, 0, 0,
+                                              wc.hInstance, None)
+        except Exception as e:
+            logger.error(f"Notification window failed: {e}")
+            self._notify_ready.set()
+            return
+        self._notify_window = True
+        try:
+            import win32ts
+            win32ts.WTSRegisterSessionNotification(hwnd, NOTIFY_FOR_THIS_SESSION)
+            self._session_notifications = True
+        except Exception as e:
+            logger.warning(f"Session change notifications unavailable: {e}")
+        self._notify_ready.set()
+        self.win32gui.PumpMessages()
+
+    def _notify_wnd_proc(self, hwnd, msg, wparam, lparam):
+        if msg == WM_DISPLAYCHANGE or (msg == WM_SETTINGCHANGE and wparam == SPI_SETWORKAREA):
+            for callback in self._display_callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Display change callback failed: {e}")
+            return 0
+        if msg == WM_WTSSESSION_CHANGE:
+            event = SESSION_EVENTS.get(wparam)
+            if event is not None:
+                for callback in self._session_callbacks:
+                    try:
+                        callback(event, lparam)
+                    except Exception as e:
+                        logger.error(f"Session change callback failed: {e}")
+            return 0
+        return self.win32gui.DefWindowProc(hwnd, msg, wparam, lparam)
+
+    def get_monitors(self):
+        return enum_display_monitors()
+
+
+class SimulatedWindow:
+    """Fake top-level window held by SimulatedBackend"""
+    __slots__ = ('hwnd', 'title', 'class_name', 'rect', 'visible', 'show_state',
+                 'restore_rect', 'pid')
+
+    def __init__(self, hwnd, title, class_name, rect, visible=True,
+                 show_state=SW_SHOWNORMAL, pid=0):
+        self.hwnd = hwnd
+        self.title = title
+        self.class_name = class_name
+        self.rect = rect
+        self.visible = visible
+        self.show_state = show_state
+        self.restore_rect = Rect(*rect.as_tuple())
+        self.pid = pid
+
+
+# Sample applications used by SimulatedBackend.generate: (title, class name, process)
+SIMULATED_APPS = [
+    ("Opera", "Chrome_WidgetWin_1", "opera.exe"),
+    ("RD Tabs", "WindowsForms10.Window.8.app.0.141b42a_r8_ad1", "RDTabs.exe"),
+    ("Visual Studio Code", "Chrome_WidgetWin_1", "Code.exe"),
+    ("Notepad", "Notepad", "notepad.exe"),
+    ("File Explorer", "CabinetWClass", "explorer.exe"),
+    ("Windows PowerShell", "ConsoleWindowClass", "powershell.exe"),
+    ("Microsoft Outlook", "rctrl_renwnd32", "OUTLOOK.EXE"),
+    ("Slack", "Chrome_WidgetWin_1", "slack.exe"),
+    ("Excel", "XLMAIN", "EXCEL.EXE"),
+    ("Calculator", "ApplicationFrameWindow", "ApplicationFrameHost.exe"),
+]
+
+
+class SimulatedBackend(WindowBackend):
+    """Deterministic in-memory desktop for profiling and testing on any platform
+
+    Every backend call is counted in call_counts and can be slowed down with
+    a per-call latency (seconds) to mimic cross-process round trips, e.g.
+    SimulatedBackend(latency={'move_window': 0.002}). Sleeps requested by the
+    arranger are accounted in slept and only really performed when
+    sleep_scale is non-zero.
+
+    list_windows models the cost of the configured enumeration engine: the
+    'uia' path charges one 'uia_call' per property round trip, the 'win32'
+    path one 'win32_call' per in-process user32 query. With fetch_workers > 1
+    the UIA property reads run on a ConcurrentFetcher pool, as on Win32Backend.
+    """
+
+    def __init__(self, monitors=None, latency=None, sleep_scale=0.0, enumeration='win32',
+                 fetch_workers=1, fetch_timeout=2.0):
+        if monitors is None:
+            # Default setup: monitor 1 on the left, primary monitor on the right
+            monitors = [
+                {'device': '\\\\.\\DISPLAY2', 'monitor': Rect(-1920, 0, 0, 1080),
+                 'work': Rect(-1920, 0, 0, 1040), 'primary': False},
+                {'device': '\\\\.\\DISPLAY1', 'monitor': Rect(0, 0, 1920, 1080),
+                 'work': Rect(0, 0, 1920, 1040), 'primary': True},
+            ]
+        self.monitors = monitors
+        self.latency = dict(latency or {})
+        self.sleep_scale = sleep_scale
+        self.enumeration = enumeration
+        self.fetcher = ConcurrentFetcher(fetch_workers, fetch_timeout) if fetch_workers > 1 else None
+        self.hung = {}  # hwnd -> seconds a UIA property read blocks, to simulate hung applications
+        self.windows = {}  # hwnd -> SimulatedWindow, in z-order
+        self.processes = {}  # pid -> executable name of running processes
+        self._app_pids = {}  # executable name -> pid of its running process
+        self._next_pid = 1000
+        self.call_counts = Counter()
+        self.slept = 0.0
+        self.moves = []  # (hwnd, x, y, width, height) for every move_window call
+        self._display_callbacks = []
+        self._session_callbacks = []
+        self._event_callbacks = []
+        self._next_hwnd = 0x10010
+        self._lock = threading.RLock()
+
+    @classmethod
+    def generate(cls, window_count=100, monitor_count=2, seed=0, **kwargs):
+        """Build a desktop with window_count random windows spread over monitor_count monitors"""
+        rng = random.Random(seed)
+        monitors = []
+        width, height = 1920, 1080
+        for i in range(monitor_count):
+            # Lay monitors out left to right with the primary one second (or only)
+            left = (i - min(1, monitor_count - 1)) * width
+            monitors.append({
+                'device': f'\\\\.\\DISPLAY{i + 1}',
+                'monitor': Rect(left, 0, left + width, height),
+                'work': Rect(left, 0, left + width, height - 40),
+                'primary': left == 0
+            })
+        backend = cls(monitors=monitors, **kwargs)
+        for i in range(window_count):
+            title, class_name, process_name = SIMULATED_APPS[rng.randrange(len(SIMULATED_APPS))]
+            monitor = monitors[rng.randrange(monitor_count)]['work']
+            w = rng.randint(400, 1600)
+            h = rng.randint(300, 900)
+            x = rng.randint(monitor.left, monitor.right - w)
+            y = rng.randint(monitor.top, monitor.bottom - h)
+            backend.add_window(
+                f"{title} - Document {i}", class_name, Rect(x, y, x + w, y + h),
+                visible=rng.random() > 0.05,
+                show_state=SW_SHOWMAXIMIZED if rng.random() < 0.2 else SW_SHOWNORMAL,
+                process_name=process_name)
+        return backend
+
+    def add_window(self, title, class_name, rect, visible=True,
+                   show_state=SW_SHOWNORMAL, process_name='', pid=None):
+        """Create a fake window and return its handle
+
+        Windows of one executable share a process unless pid is given; giving
+        the pid of an ended process simulates the PID being reused.
+        """
+        with self._lock:
+            if pid is None:
+                pid = self._app_pids.get(process_name)
+                if pid is None:
+                    pid = self._next_pid
+                    self._next_pid += 4
+            self.processes[pid] = process_name
+            self._app_pids[process_name] = pid
+            hwnd = self._next_hwnd
+            self._next_hwnd += 0x10
+            window = SimulatedWindow(hwnd, title, class_name, rect, visible,
+                                     SW_SHOWNORMAL, pid)
+            self.windows[hwnd] = window
+            if show_state == SW_SHOWMAXIMIZED:
+                self._maximize(window)
+            else:
+                window.show_state = show_state
+        self._emit('create', hwnd)
+        if visible:
+            self._emit('show', hwnd)
+        return hwnd
+
+    def remove_window(self, hwnd):
+        """Destroy a fake window"""
+        with self._lock:
+            self.windows.pop(hwnd, None)
+        self._emit('destroy', hwnd)
+
+    def end_process(self, pid):
+        """Terminate a fake process, destroying its windows"""
+        with self._lock:
+            hwnds = [hwnd for hwnd, window in self.windows.items() if window.pid == pid]
+            for hwnd in hwnds:
+                del self.windows[hwnd]
+            process_name = self.processes.pop(pid, None)
+            if self._app_pids.get(process_name) == pid:
+                del self._app_pids[process_name]
+        for hwnd in hwnds:
+            self._emit('destroy', hwnd)
+
+    def set_title(self, hwnd, title):
+        """Rename a fake window"""
+        with self._lock:
+            self._window(hwnd).title = title
+        self._emit('name', hwnd)
+
+    def _emit(self, event, hwnd):
+        for callback in self._event_callbacks:
+            callback(event, hwnd)
+
+    def set_monitors(self, monitors):
+        """Replace the monitor layout and send a display change notification"""
+        with self._lock:
+            self.monitors = monitors
+        for callback in self._display_callbacks:
+            callback()
+
+    def session_change(self, event, session_id=1):
+        """Send a session change notification (one of the SESSION_EVENTS names)"""
+        for callback in self._session_callbacks:
+            callback(event, session_id)
+
+    def monitor_for_rect(self, rect):
+        """Return the monitor dict containing the centre of rect (nearest if none)"""
+        cx = (rect.left + rect.right) // 2
+        cy = (rect.top + rect.bottom) // 2
+        for monitor in self.monitors:
+            m = monitor['monitor']
+            if m.left <= cx < m.right and m.top <= cy < m.bottom:
+                return monitor
+        return min(self.monitors, key=lambda mon: abs(cx - (mon['monitor'].left + mon['monitor'].right) // 2))
+
+    def _call(self, name):
+        with self._lock:
+            self.call_counts[name] += 1
+        delay = self.latency.get(name)
+        if delay:
+            time.sleep(delay)
+
+    def _window(self, hwnd):
+        window = self.windows.get(hwnd)
+        if window is None:
+            raise OSError(f"Invalid window handle: {hwnd:#x}")
+        return window
+
+    def _maximize(self, window):
+        if window.show_state != SW_SHOWMAXIMIZED:
+            window.restore_rect = window.rect
+        work = self.monitor_for_rect(window.rect)['work']
+        window.rect = Rect(*work.as_tuple())
+        window.show_state = SW_SHOWMAXIMIZED
+
+    def list_windows(self):
+        self._call('list_windows')
+        with self._lock:
+            snapshot = list(self.windows.values())
+        if self.enumeration == 'uia':
+            return self._list_windows_uia(snapshot)
+        return self._list_windows_win32(snapshot)
+
+    def _list_windows_win32(self, snapshot):
+        windows = []
+        for w in snapshot:
+            self._call('win32_call')  # IsWindowVisible
+            if not w.visible:
+                continue
+            self._call('win32_call')  # GetWindowText
+            if not w.title:
+                continue
+            for _ in range(3):  # GetClassName, GetWindowRect, GetWindowPlacement
+                self._call('win32_call')
+            windows.append(WindowRecord(w.hwnd, w.title, w.class_name, Rect(*w.rect.as_tuple()), w.show_state))
+        return windows
+
+    def _list_windows_uia(self, snapshot):
+        if self.fetcher is not None:
+            results = self.fetcher.map(self._read_uia_window, snapshot)
+        else:
+            results = [self._read_uia_window(w) for w in snapshot]
+        return [window for window in results if window is not None]
+
+    def _read_uia_window(self, w):
+        self._call('uia_call')  # is_visible
+        if w.hwnd in self.hung:
+            time.sleep(self.hung[w.hwnd])
+        if not w.visible:
+            return None
+        self._call('uia_call')  # window_text
+        if not w.title:
+            return None
+        for _ in range(3):  # window_text, class_name, rectangle
+            self._call('uia_call')
+        return WindowRecord(w.hwnd, w.title, w.class_name, Rect(*w.rect.as_tuple()))
+
+    def get_show_state(self, hwnd):
+        self._call('get_show_state')
+        with self._lock:
+            return self._window(hwnd).show_state
+
+    def show_window(self, hwnd, command):
+        self._call('show_window')
+        with self._lock:
+            window = self._window(hwnd)
+            if command == SW_MAXIMIZE:
+                self._maximize(window)
+            elif command == SW_RESTORE and window.show_state != SW_SHOWNORMAL:
+                window.rect = window.restore_rect
+                window.show_state = SW_SHOWNORMAL
+        self._emit('move', hwnd)
+
+    def move_window(self, hwnd, x, y, width, height):
+        self._call('move_window')
+        with self._lock:
+            window = self._window(hwnd)
+            window.rect = Rect(x, y, x + width, y + height)
+            window.visible = True
+            self.moves.append((hwnd, x, y, width, height))
+        self._emit('move', hwnd)
+
+    def move_windows(self, moves):
+        self._call('move_windows')
+        with self._lock:
+            for hwnd, x, y, width, height in moves:
+                window = self._window(hwnd)
+                window.rect = Rect(x, y, x + width, y + height)
+                window.visible = True
+                self.moves.append((hwnd, x, y, width, height))
+        for move in moves:
+            self._emit('move', move[0])
+
+    def get_window_rect(self, hwnd):
+        self._call('get_window_rect')
+        with self._lock:
+            return Rect(*self._window(hwnd).rect.as_tuple())
+
+    def get_normal_rect(self, hwnd):
+        self._call('get_normal_rect')
+        with self._lock:
+            window = self._window(hwnd)
+            rect = window.restore_rect if window.show_state == SW_SHOWMAXIMIZED else window.rect
+            return Rect(*rect.as_tuple())
+
+    def get_window_pid(self, hwnd):
+        self._call('get_window_pid')
+        with self._lock:
+            window = self.windows.get(hwnd)
+            return window.pid if window is not None else 0
+
+    def get_process_image(self, pid):
+        self._call('get_process_image')
+        with self._lock:
+            image = self.processes.get(pid)
+        if image is None:
+            raise OSError(f"Cannot open process {pid}")
+        return image
+
+    def get_window_info(self, hwnd):
+        self._call('get_window_info')
+        with self._lock:
+            w = self.windows.get(hwnd)
+            if w is None or not w.visible or not w.title:
+                return None
+            return WindowRecord(w.hwnd, w.title, w.class_name, Rect(*w.rect.as_tuple()), w.show_state)
+
+    def watch_window_events(self, callback):
+        self._event_callbacks.append(callback)
+        return True
+
+    def get_screen_metrics(self):
+        self._call('get_screen_metrics')
+        primary = next((m['monitor'] for m in self.monitors if m['primary']), self.monitors[0]['monitor'])
+        left = min(m['monitor'].left for m in self.monitors)
+        top = min(m['monitor'].top for m in self.monitors)
+        right = max(m['monitor'].right for m in self.monitors)
+        bottom = max(m['monitor'].bottom for m in self.monitors)
+        return {
+            'primary_width': primary.width(),
+            'primary_height': primary.height(),
+            'virtual_left': left,
+            'virtual_top': top,
+            'virtual_width': right - left,
+            'virtual_height': bottom - top,
+            'monitor_count': len(self.monitors)
+        }
+
+    def get_monitors(self):
+        self._call('get_monitors')
+        return [dict(m) for m in self.monitors]
+
+    def watch_display_changes(self, callback):
+        self._display_callbacks.append(callback)
+        return True
+
+    def watch_session_changes(self, callback):
+        self._session_callbacks.append(callback)
+        return True
+
+    def sleep(self, seconds):
+        self.call_counts['sleep'] += 1
+        self.slept += seconds
+        if self.sleep_scale:
+            time.sleep(seconds * self.sleep_scale)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+class WindowTable:
+    """WindowRecords of one enumeration, in z-order, indexed by hwnd
+
+    The process index is built on first use from the process cached on
+    each record, so it costs nothing unless asked for and never queries a
+    window twice.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.by_hwnd = {record.hwnd: record for record in records}
+        self._by_process = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __bool__(self):
+        return bool(self.records)
+
+    def by_process(self, process_name):
+        """Index of records by executable name; process_name(record) fills in records not looked up yet"""
+        if self._by_process is None:
+            index = {}
+            for record in self.records:
+                index.setdefault(process_name(record) or '', []).append(record)
+            self._by_process = index
+        return self._by_process
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Window events delivered by backends to the tracker
+WINDOW_EVENTS = ('create', 'destroy', 'show', 'hide', 'move', 'name')
+
+
+class WindowTracker:
+    """Live table of top-level windows kept up to date from window events
+
+    Event callbacks only record the hwnd in a pending set, so a burst of
+    events for the same window (e.g. LOCATIONCHANGE while dragging) collapses
+    into a single property fetch. Pending windows are refreshed once events
+    have been quiet for `debounce` seconds, or at the latest `max_delay`
+    seconds after the first pending event.
+    """
+
+    def __init__(self, backend, debounce=0.1, max_delay=1.0, on_new_window=None):
+        self.backend = backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_new_window = on_new_window  # Called with the WindowRecord when a window first appears
+        self.running = False
+        self.events_received = 0
+        self.refreshes = 0
+        self._windows = {}  # hwnd -> WindowRecord
+        self._pending = {}  # hwnd -> True if destroyed
+        self._first_event = None
+        self._last_event = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Serializes flushes so refreshes apply in order
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Subscribe to window events and load the initial window table"""
+        if not self.backend.watch_window_events(self._on_event):
+            logger.warning("Window events are not supported by this backend, tracking disabled")
+            return False
+        self.running = True
+        self.resync()
+        self._thread = threading.Thread(target=self._run, name="WindowTracker", daemon=True)
+        self._thread.start()
+        logger.info(f"Window tracking started ({len(self._windows)} windows)")
+        return True
+
+    def stop(self):
+        """Stop processing events"""
+        self.running = False
+        self._wake.set()
+
+    def resync(self):
+        """Rebuild the window table with a full enumeration"""
+        windows = self.backend.list_windows()
+        with self._lock:
+            self._windows = {w.hwnd: w for w in windows}
+            self._pending.clear()
+            self._first_event = None
+
+    def windows(self):
+        """Return the current window table as a list of WindowRecords"""
+        with self._lock:
+            return list(self._windows.values())
+
+    def _on_event(self, event, hwnd):
+        """Backend event callback: record the window and return immediately"""
+        now = time.monotonic()
+        with self._lock:
+            self.events_received += 1
+            if event in ('destroy', 'hide') and hwnd not in self._windows and hwnd not in self._pending:
+                return  # Not a window we track
+            if event == 'destroy':
+                self._pending[hwnd] = True
+            else:
+                self._pending.setdefault(hwnd, False)
+            if self._first_event is None:
+                self._first_event = now
+            self._last_event = now
+        self._wake.set()
+
+    def _run(self):
+        while self.running:
+            self._wake.wait()
+            self._wake.clear()
+            # Debounce: wait for a quiet period, bounded by max_delay since the first event
+            while self.running:
+                with self._lock:
+                    if self._first_event is None:
+                        break
+                    now = time.monotonic()
+                    deadline = min(self._last_event + self.debounce, self._first_event + self.max_delay)
+                if now >= deadline:
+                    break
+                time.sleep(deadline - now)
+            if self.running:
+                self.flush()
+
+    def flush(self, notify=True):
+        """Refresh every pending window once (also called before reading the table for an arrangement)
+
+        on_new_window is called after the flush lock is released, so a
+        handler that waits for an arrangement never blocks one that is
+        flushing. An arrangement flushes with notify=False: it places the
+        new windows itself.
+        """
+        with self._flush_lock:
+            new_windows = self._flush()
+        if notify and self.on_new_window is not None:
+            for info in new_windows:
+                try:
+                    self.on_new_window(info)
+                except Exception as e:
+                    logger.error(f"New window handler failed for '{info.title}': {e}")
+
+    def _flush(self):
+        """Refresh pending windows, return the WindowRecords of windows seen for the first time"""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._first_event = None
+        if not pending:
+            return []
+
+        new_windows = []
+        for hwnd, destroyed in pending.items():
+            info = None
+            if not destroyed:
+                try:
+                    info = self.backend.get_window_info(hwnd)
+                except Exception as e:
+                    logger.debug(f"Failed to refresh window {hwnd}: {e}")
+            with self._lock:
+                if info is None:
+                    self._windows.pop(hwnd, None)
+                else:
+                    previous = self._windows.get(hwnd)
+                    if previous is None:
+                        new_windows.append(info)
+                    else:
+                        # A live window handle keeps its process
+                        info.pid = previous.pid
+                        info.process = previous.process
+                    self._windows[hwnd] = info
+        self.refreshes += len(pending)
+        logger.debug(f"Window tracker refreshed {len(pending)} windows")
+        return new_windows
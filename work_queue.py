@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingWorker:
+    """Run a job on a dedicated thread, collapsing repeated requests
+
+    request() returns immediately. Requests that arrive while the job is
+    running collapse into a single follow-up run, so a burst of hotkey
+    presses never queues several full arrangements back to back. The job
+    is called as job(cancel_event, requested_at), where requested_at is the
+    time.perf_counter() of the earliest request served by that run; it
+    should stop early once cancel_event is set.
+    """
+
+    def __init__(self, job, name="Worker"):
+        self.job = job
+        self.name = name
+        self.cancel_event = threading.Event()
+        self.runs = 0
+        self.coalesced = 0  # Requests absorbed by an already pending run
+        self._condition = threading.Condition()
+        self._requested_at = None  # Earliest pending request, None if nothing is pending
+        self._running = False
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (done automatically by the first request)"""
+        with self._condition:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def request(self):
+        """Ask for a run and return at once; returns False if it was merged into a pending run"""
+        self.start()
+        with self._condition:
+            if self._requested_at is not None:
+                self.coalesced += 1
+                return False
+            self._requested_at = time.perf_counter()
+            self._condition.notify_all()
+            return True
+
+    def cancel(self):
+        """Cancel the run in progress and drop any pending request"""
+        with self._condition:
+            self._requested_at = None
+            if self._running:
+                self.cancel_event.set()
+
+    def is_busy(self):
+        """True while a run is in progress or pending"""
+        with self._condition:
+            return self._running or self._requested_at is not None
+
+    def wait_idle(self, timeout=None):
+        """Wait until no run is in progress or pending, return False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._running or self._requested_at is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def stop(self):
+        """Cancel any run and stop the worker thread"""
+        with self._condition:
+            self._stopped = True
+            self._requested_at = None
+            self.cancel_event.set()
+            self._condition.notify_all()
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._requested_at is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                requested_at = self._requested_at
+                self._requested_at = None
+                self._running = True
+                self.cancel_event.clear()
+            try:
+                self.runs += 1
+                self.job(self.cancel_event, requested_at)
+            except Exception as e:
+                logger.error(f"{self.name} job failed: {e}")
+            finally:
+                with self._condition:
+                    self._running = False
+                    self._condition.notify_all()
+
+
+class PendingCommand:
+    """A queued CommandQueue job and its outcome, shared by every request merged into it"""
+    __slots__ = ('key', 'function', 'args', 'requests', 'submitted_at', 'started_at', 'finished_at',
+                 'result', 'error', 'done')
+
+    def __init__(self, key, function, args):
+        self.key = key
+        self.function = function
+        self.args = args
+        self.requests = 1
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class CommandQueue:
+    """Run submitted jobs one at a time, in order, on a dedicated thread
+
+    A job submitted while an identical one (same key) is still waiting to
+    start joins it instead of queueing again, so a burst of identical
+    commands costs one run and every submitter gets the same outcome.
+    """
+
+    def __init__(self, name="CommandQueue"):
+        self.name = name
+        self.runs = 0
+        self.coalesced = 0  # Submissions merged into a waiting job
+        self._condition = threading.Condition()
+        self._queue = []  # PendingCommands not started yet, in submission order
+        self._waiting = {}  # key -> PendingCommand in _queue
+        self._stopped = False
+        self._thread = None
+
+    def submit(self, key, function, *args):
+        """Queue function(*args) unless a job with the same key is waiting, return its PendingCommand"""
+        with self._condition:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            pending = self._waiting.get(key)
+            if pending is not None:
+                pending.requests += 1
+                self.coalesced += 1
+                return pending
+            pending = PendingCommand(key, function, args)
+            self._queue.append(pending)
+            self._waiting[key] = pending
+            self._condition.notify_all()
+            return pending
+
+    def depth(self):
+        """Number of jobs waiting to start"""
+        with self._condition:
+            return len(self._queue)
+
+    def stop(self):
+        """Stop after the job in progress; jobs not started yet fail"""
+        with self._condition:
+            self._stopped = True
+            dropped, self._queue = self._queue, []
+            self._waiting.clear()
+            self._condition.notify_all()
+            thread = self._thread
+            self._thread = None
+        for pending in dropped:
+            pending.error = "stopped"
+            pending.done.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                pending = self._queue.pop(0)
+                del self._waiting[pending.key]
+            pending.started_at = time.perf_counter()
+            try:
+                self.runs += 1
+                pending.result = pending.function(*pending.args)
+            except Exception as e:
+                logger.error(f"{self.name} job {pending.key!r} failed: {e}")
+                pending.error = str(e)
+            finally:
+                pending.finished_at = time.perf_counter()
+                pending.done.set()